@@ -0,0 +1,136 @@
+from functools import wraps
+from typing import Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import crud
+import models
+import passwords
+import refcache
+import schemas
+
+# Асинхронные CRUD-функции для обработчиков запросов (AsyncSession).
+# Операции с пользователями записаны через select(), справочники читаются
+# из refcache;
+# запросы книг, аналитики и статистики зависят от диалекта и переиспользуют
+# синхронные функции crud через AsyncSession.run_sync - они выполняются на
+# том же асинхронном соединении без отдельного потока.
+
+
+def _run_sync(func):
+    @wraps(func)
+    async def wrapper(db: AsyncSession, *args, **kwargs):
+        return await db.run_sync(lambda session: func(session, *args, **kwargs))
+    return wrapper
+
+
+async def _first(db: AsyncSession, statement):
+    return (await db.execute(statement)).scalars().first()
+
+
+async def _all(db: AsyncSession, statement):
+    return (await db.execute(statement)).scalars().all()
+
+
+async def _add(db: AsyncSession, obj):
+    db.add(obj)
+    await db.commit()
+    await db.refresh(obj)
+    return obj
+
+
+
+# User CRUD
+async def get_user(db: AsyncSession, user_id: int):
+    return await db.get(models.User, user_id)
+
+async def get_user_by_login(db: AsyncSession, login: str):
+    return await _first(db, select(models.User).where(models.User.login == login))
+
+async def get_users(db: AsyncSession, skip: int = 0, limit: int = 100):
+    return await _all(db, select(models.User).offset(skip).limit(limit))
+
+async def create_user(db: AsyncSession, user: schemas.UserCreate, is_admin: bool = False,
+                      password_hash: Optional[str] = None):
+    if password_hash is None:
+        password_hash = await passwords.hash_password(user.password)
+    return await _add(db, models.User(
+        login=user.login,
+        password_hash=password_hash,
+        name=user.name,
+        is_admin=is_admin
+    ))
+
+# Изменение и удаление пользователя сбрасывают кэш аутентификации
+update_user = _run_sync(crud.update_user)
+delete_user = _run_sync(crud.delete_user)
+
+# Справочники: чтение через refcache, изменения - через crud (сброс кэша)
+async def get_author(db: AsyncSession, author_id: int):
+    return await refcache.authors.aget(db, author_id)
+
+async def get_authors(db: AsyncSession, skip: int = 0, limit: int = 100):
+    return await _all(db, select(models.Author).order_by(models.Author.author_id).offset(skip).limit(limit))
+
+async def get_authors_by_ids(db: AsyncSession, author_ids):
+    return await refcache.authors.aget_many(db, author_ids)
+
+create_author = _run_sync(crud.create_author)
+update_author = _run_sync(crud.update_author)
+delete_author = _run_sync(crud.delete_author)
+
+async def get_genre(db: AsyncSession, genre_id: int):
+    return await refcache.genres.aget(db, genre_id)
+
+async def get_genres(db: AsyncSession, skip: int = 0, limit: int = 100):
+    return (await refcache.genres.aall(db))[skip:skip + limit]
+
+async def get_genres_by_ids(db: AsyncSession, genre_ids):
+    return await refcache.genres.aget_many(db, genre_ids)
+
+create_genre = _run_sync(crud.create_genre)
+update_genre = _run_sync(crud.update_genre)
+delete_genre = _run_sync(crud.delete_genre)
+
+async def get_publisher(db: AsyncSession, publisher_id: int):
+    return await refcache.publishers.aget(db, publisher_id)
+
+async def get_publishers(db: AsyncSession, skip: int = 0, limit: int = 100):
+    return (await refcache.publishers.aall(db))[skip:skip + limit]
+
+create_publisher = _run_sync(crud.create_publisher)
+update_publisher = _run_sync(crud.update_publisher)
+delete_publisher = _run_sync(crud.delete_publisher)
+
+async def get_book_statuses(db: AsyncSession):
+    return await refcache.statuses.aall(db)
+
+async def get_book_status_by_name(db: AsyncSession, status_name: str):
+    return await refcache.statuses.aby_name(db, status_name)
+
+async def get_book_status_by_id(db: AsyncSession, status_id: int):
+    return await refcache.statuses.aget(db, status_id)
+
+create_book_status = _run_sync(crud.create_book_status)
+update_book_status = _run_sync(crud.update_book_status)
+delete_book_status = _run_sync(crud.delete_book_status)
+
+async def count_status_usage(db: AsyncSession, status_id: int) -> int:
+    return await db.scalar(
+        select(func.count()).select_from(models.Analytics).where(models.Analytics.status_id == status_id)
+    )
+
+# Книги, аналитика и статистика
+get_book = _run_sync(crud.get_book)
+create_book = _run_sync(crud.create_book)
+update_book = _run_sync(crud.update_book)
+search_user_books = _run_sync(crud.search_user_books)
+get_user_books_page = _run_sync(crud.get_user_books_page)
+get_user_book_by_id = _run_sync(crud.get_user_book_by_id)
+user_owns_book = _run_sync(crud.user_owns_book)
+delete_user_book = _run_sync(crud.delete_user_book)
+get_current_book_status = _run_sync(crud.get_current_book_status)
+get_book_status_history = _run_sync(crud.get_book_status_history)
+create_analytics = _run_sync(crud.create_analytics)
+get_user_reading_stats = _run_sync(crud.get_user_reading_stats)
@@ -1,21 +1,62 @@
+import time
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import get_db
 import models
 import schemas
 from config import settings
+from cache import TTLCache
+import cache_bus
+import passwords
+
+# Используем SHA256 вместо bcrypt для простоты (параметры - в passwords.py)
+pwd_context = passwords.pwd_context
+
+# Кэш аутентификации: токен -> (user_id, exp) позволяет не проверять
+# подпись JWT повторно, user_id -> CurrentUser - не читать пользователя из БД.
+# Изменения пользователей приходят через cache_bus (в том числе из других
+# процессов); AUTH_CACHE_TTL_SECONDS ограничивает устаревание, если событие
+# все же потеряно.
+token_cache = TTLCache(settings.AUTH_CACHE_MAX_ENTRIES, settings.AUTH_CACHE_TTL_SECONDS)
+user_cache = TTLCache(settings.AUTH_CACHE_MAX_ENTRIES, settings.AUTH_CACHE_TTL_SECONDS)
+
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """Данные аутентифицированного пользователя, не привязанные к сессии БД"""
+    user_id: int
+    login: str
+    name: Optional[str]
+    is_admin: bool
+
+    @classmethod
+    def from_model(cls, user: models.User) -> "CurrentUser":
+        return cls(user_id=user.user_id, login=user.login, name=user.name, is_admin=bool(user.is_admin))
+
+
+def invalidate_user(user_id: int):
+    """Сброс закэшированных данных пользователя (после изменения или удаления)"""
+    user_cache.pop(user_id)
 
-# Используем SHA256 вместо bcrypt для простоты
-pwd_context = CryptContext(
-    schemes=["sha256_crypt"],
-    deprecated="auto",
-    sha256_crypt__default_rounds=10000
-)
+
+def _on_user_changed(user_id: Optional[int]):
+    if user_id is None:
+        user_cache.clear()
+    else:
+        invalidate_user(user_id)
+
+
+cache_bus.subscribe("user", _on_user_changed)
+
+
+def auth_cache_stats() -> dict:
+    return {"tokens": token_cache.stats(), "users": user_cache.stats()}
 
 # Упрощенная схема без лишних параметров
 oauth2_scheme = OAuth2PasswordBearer(
@@ -29,12 +70,20 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
-def authenticate_user(db: Session, login: str, password: str):
-    user = db.query(models.User).filter(models.User.login == login).first()
+async def authenticate_user(db: AsyncSession, login: str, password: str):
+    """
+    Проверка логина и пароля. Пароль проверяется в пуле хэширования;
+    устаревший хэш пересчитывается и сохраняется при успешном входе.
+    """
+    user = (await db.execute(select(models.User).where(models.User.login == login))).scalars().first()
     if not user:
         return False
-    if not verify_password(password, user.password_hash):
+    verified, new_hash = await passwords.verify_and_update(password, user.password_hash)
+    if not verified:
         return False
+    if new_hash:
+        user.password_hash = new_hash
+        await db.commit()
     return user
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -47,12 +96,15 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+def _decode_token(token: str, credentials_exception: HTTPException) -> int:
+    cached = token_cache.get(token)
+    if cached is not None:
+        user_id, expires_at = cached
+        if expires_at > time.time():
+            return user_id
+        token_cache.pop(token)
+        raise credentials_exception
+
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         user_id: str = payload.get("sub")
@@ -62,12 +114,31 @@ def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_
     except (JWTError, ValueError, TypeError) as e:
         raise credentials_exception
 
-    user = db.query(models.User).filter(models.User.user_id == token_data.user_id).first()
-    if user is None:
-        raise credentials_exception
-    return user
+    expires_at = payload.get("exp")
+    if isinstance(expires_at, (int, float)):
+        token_cache.set(token, (token_data.user_id, expires_at), ttl=expires_at - time.time())
+    return token_data.user_id
+
+async def get_current_user(db: AsyncSession = Depends(get_db), token: str = Depends(oauth2_scheme)) -> CurrentUser:
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    user_id = _decode_token(token, credentials_exception)
+    # По user_id сессии отмечаются записи пользователя (см. replicas.py)
+    db.info["user_id"] = user_id
+
+    current_user = user_cache.get(user_id)
+    if current_user is None:
+        user = await db.get(models.User, user_id)
+        if user is None:
+            raise credentials_exception
+        current_user = CurrentUser.from_model(user)
+        user_cache.set(user_id, current_user)
+    return current_user
 
-def get_current_admin_user(current_user: models.User = Depends(get_current_user)):
+async def get_current_admin_user(current_user: CurrentUser = Depends(get_current_user)):
     if not current_user.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
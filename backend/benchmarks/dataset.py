@@ -0,0 +1,119 @@
+"""
+Генератор синтетического набора данных для бенчмарков.
+
+Книги принадлежат пользователям через записи analytics (как при создании
+книги через API; user_book строится по ним): у каждой книги 1-history_length
+записей истории статусов ("В планах", затем чередование "Читаю"/"Прочитано"
+с датами начала и окончания - перечитывания), 1-2 автора и 1-2 жанра. Данные вставляются
+пакетами через Core по таблицам моделей, без ORM; свертку статистики,
+user_book и поисковый индекс после генерации нужно перестроить (см.
+benchmarks/run.py).
+"""
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+import models
+
+BATCH_SIZE = 5000
+STATUS_NAMES = ("В планах", "Читаю", "Прочитано")
+
+
+def _insert(connection, table, rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        connection.execute(table.insert(), rows[start:start + BATCH_SIZE])
+
+
+def _next_id(connection, column) -> int:
+    return (connection.execute(select(func.max(column))).scalar() or 0) + 1
+
+
+def _history(status_ids, length: int):
+    """Первый статус, затем по кругу остальные (начало и окончание чтения)"""
+    if len(status_ids) == 1:
+        return status_ids[:1] * length
+    rest = status_ids[1:]
+    return [status_ids[0]] + [rest[i % len(rest)] for i in range(length - 1)]
+
+
+def generate(engine, users: int = 100, books_per_user: int = 500, authors: int = 2000,
+             genres: int = 50, publishers: int = 200, reports_per_user: int = 20,
+             seed: int = 42, start: datetime = datetime(2020, 1, 1), history_length: int = 3,
+             password_hash: str = "-") -> dict:
+    """Заполнение БД; возвращает число вставленных строк по таблицам"""
+    rnd = random.Random(seed)
+    span_seconds = int((datetime.now() - start).total_seconds())
+
+    with engine.begin() as connection:
+        status_ids = connection.execute(select(models.BookStatus.status_id)).scalars().all()
+        if not status_ids:
+            _insert(connection, models.BookStatus.__table__, [{"name": name} for name in STATUS_NAMES])
+            status_ids = connection.execute(select(models.BookStatus.status_id)).scalars().all()
+
+        publisher_id = _next_id(connection, models.Publisher.publisher_id)
+        publisher_ids = list(range(publisher_id, publisher_id + publishers))
+        _insert(connection, models.Publisher.__table__,
+                [{"publisher_id": pid, "name": f"Издательство {pid}"} for pid in publisher_ids])
+
+        author_id = _next_id(connection, models.Author.author_id)
+        author_ids = list(range(author_id, author_id + authors))
+        _insert(connection, models.Author.__table__,
+                [{"author_id": aid, "last_name": f"Автор{aid}", "first_name": "Имя"} for aid in author_ids])
+
+        genre_id = _next_id(connection, models.Genre.genre_id)
+        genre_ids = list(range(genre_id, genre_id + genres))
+        _insert(connection, models.Genre.__table__,
+                [{"genre_id": gid, "name": f"Жанр {gid}"} for gid in genre_ids])
+
+        user_id = _next_id(connection, models.User.user_id)
+        user_ids = list(range(user_id, user_id + users))
+        _insert(connection, models.User.__table__, [
+            {"user_id": uid, "login": f"user{uid}", "password_hash": password_hash, "name": f"Пользователь {uid}",
+             "is_admin": False}
+            for uid in user_ids
+        ])
+
+        book_id = _next_id(connection, models.Book.book_id)
+        counts = {"users": users, "books": 0, "analytics": 0, "reports": 0}
+        for uid in user_ids:
+            books, author_links, genre_links, history = [], [], [], []
+            for _ in range(books_per_user):
+                added = start + timedelta(seconds=rnd.randrange(span_seconds))
+                books.append({
+                    "book_id": book_id,
+                    "publisher_id": rnd.choice(publisher_ids),
+                    "title": f"Книга {book_id} {rnd.choice(('о войне', 'о мире', 'о любви', 'о море'))}",
+                    "published": rnd.randint(1800, 2025),
+                    "description": "Синтетическое описание книги для бенчмарка",
+                    "added_date": added,
+                })
+                for aid in rnd.sample(author_ids, rnd.randint(1, 2)):
+                    author_links.append({"author_id": aid, "book_id": book_id})
+                for gid in rnd.sample(genre_ids, rnd.randint(1, 2)):
+                    genre_links.append({"genre_id": gid, "book_id": book_id})
+                created = added
+                for status_id in _history(status_ids, rnd.randint(1, history_length)):
+                    finished = len(status_ids) > 1 and status_id == status_ids[-1]
+                    history.append({
+                        "book_id": book_id, "user_id": uid, "status_id": status_id,
+                        "start_date": created.date() if len(status_ids) > 1 and status_id == status_ids[1] else None,
+                        "end_date": created.date() if finished else None,
+                        "pages_read": rnd.randint(50, 900) if finished else None,
+                        "created_date": created,
+                    })
+                    created += timedelta(days=rnd.randint(1, 60))
+                book_id += 1
+            _insert(connection, models.Book.__table__, books)
+            _insert(connection, models.author_book, author_links)
+            _insert(connection, models.genre_book, genre_links)
+            _insert(connection, models.Analytics.__table__, history)
+            _insert(connection, models.Report.__table__, [
+                {"user_id": uid, "report_type": "book_card", "status": "done",
+                 "generated_at": start + timedelta(seconds=rnd.randrange(span_seconds))}
+                for _ in range(reports_per_user)
+            ])
+            counts["books"] += len(books)
+            counts["analytics"] += len(history)
+            counts["reports"] += reports_per_user
+    return counts
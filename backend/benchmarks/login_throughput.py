@@ -0,0 +1,90 @@
+"""
+Пропускная способность /api/auth/login при параллельных входах.
+
+    uvicorn main:app --port 8000
+    python benchmarks/login_throughput.py --url http://localhost:8000 --concurrency 16 --duration 10
+
+Параллельно со входами выполняются запросы /health: их задержка
+показывает, не блокирует ли хэширование паролей остальные обработчики.
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+
+
+def post(url, data, form=False):
+    if form:
+        body = urllib.parse.urlencode(data).encode()
+        headers = {"Content-Type": "application/x-www-form-urlencoded"}
+    else:
+        body = json.dumps(data).encode()
+        headers = {"Content-Type": "application/json"}
+    request = urllib.request.Request(url, data=body, headers=headers, method="POST")
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.status, response.read()
+
+
+def get(url):
+    with urllib.request.urlopen(url, timeout=30) as response:
+        return response.status, response.read()
+
+
+def worker(func, stop_at, timings, errors):
+    while time.perf_counter() < stop_at:
+        start = time.perf_counter()
+        try:
+            func()
+        except (urllib.error.URLError, OSError):
+            errors.append(1)
+            continue
+        timings.append((time.perf_counter() - start) * 1000)
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    login = f"bench_{uuid.uuid4().hex[:8]}"
+    password = "bench-password"
+    post(f"{args.url}/api/auth/register", {"name": "Benchmark", "login": login, "password": password})
+
+    do_login = lambda: post(f"{args.url}/api/auth/login", {"username": login, "password": password}, form=True)
+    do_health = lambda: get(f"{args.url}/health")
+
+    login_timings, health_timings, errors = [], [], []
+    stop_at = time.perf_counter() + args.duration
+    threads = [threading.Thread(target=worker, args=(do_login, stop_at, login_timings, errors))
+               for _ in range(args.concurrency)]
+    threads.append(threading.Thread(target=worker, args=(do_health, stop_at, health_timings, errors)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(f"Входов: {len(login_timings)} за {args.duration:.0f} с, "
+          f"{len(login_timings) / args.duration:.1f} запросов/с, ошибок: {len(errors)}")
+    print(f"login   p50 {statistics.median(login_timings):8.1f} ms   "
+          f"p95 {percentile(login_timings, 95):8.1f} ms   p99 {percentile(login_timings, 99):8.1f} ms")
+    if health_timings:
+        print(f"health  p50 {statistics.median(health_timings):8.1f} ms   "
+              f"p95 {percentile(health_timings, 95):8.1f} ms   p99 {percentile(health_timings, 99):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Накладные расходы на создание PDFGenerator до и после общего контекста
+рендеринга.
+
+    python benchmarks/pdf_context.py --iterations 50
+
+"cold" - контекст (шрифты, стили, стили таблиц) строится заново для
+каждого отчета, как было раньше; "warm" - используется общий контекст
+процесса.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from pdf_generator import PDFGenerator, RenderContext, get_render_context  # noqa: E402
+
+BOOK = {
+    "book_id": 1,
+    "title": "Война и мир",
+    "authors": ["Толстой Лев"],
+    "published": 1869,
+    "publisher": "Эксмо",
+    "genres": ["Роман"],
+    "added_date": datetime(2025, 1, 1, 12, 0),
+    "description": "Роман-эпопея",
+    "current_status": "Читаю",
+}
+
+
+def measure(label, func, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    print(f"{label:<28} median {statistics.median(timings):8.2f} ms   "
+          f"max {max(timings):8.2f} ms")
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=30)
+    args = parser.parse_args()
+
+    output_dir = tempfile.mkdtemp(prefix="pdf_bench_")
+    get_render_context()
+
+    cold_setup = measure("setup, cold context", lambda: PDFGenerator(output_dir, context=RenderContext()), args.iterations)
+    warm_setup = measure("setup, warm context", lambda: PDFGenerator(output_dir), args.iterations)
+
+    counter = iter(range(10 ** 9))
+    cold_card = measure(
+        "book card, cold context",
+        lambda: PDFGenerator(output_dir, context=RenderContext()).generate_book_card(BOOK, filename=f"c{next(counter)}.pdf"),
+        args.iterations
+    )
+    warm_card = measure(
+        "book card, warm context",
+        lambda: PDFGenerator(output_dir).generate_book_card(BOOK, filename=f"w{next(counter)}.pdf"),
+        args.iterations
+    )
+
+    print(f"\nНакладные расходы на отчет: {cold_setup:.2f} ms -> {warm_setup:.3f} ms")
+    print(f"Карточка книги целиком: {cold_card:.2f} ms -> {warm_card:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import json
+import os
+import tempfile
+import threading
+import uuid
+from collections import defaultdict
+from typing import Callable, Dict, Hashable, List, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from config import settings
+
+# Шина инвалидации кэшей между процессами (воркерами uvicorn, фоновыми
+# командами manage.py). Функции crud перед commit вызывают publish(): событие
+# (сущность, ключ) запоминается в сессии и после commit применяется к кэшам
+# этого процесса. Остальные процессы узнают о нем:
+#   - PostgreSQL: pg_notify в той же транзакции - уведомление доставляется
+#     только при успешном commit; каждый процесс слушает канал (LISTEN)
+#     в отдельном потоке;
+#   - другие БД (SQLite): событие дописывается в общий файл после commit,
+#     процессы читают новые строки файла с интервалом CACHE_BUS_POLL_SECONDS.
+# Кэши подписываются на сущности через subscribe(). Обработчик получает ключ
+# или None - "сбросить все": так шина поступает после переподключения или
+# ротации файла, когда часть событий могла быть пропущена.
+# Событие приходит сразу после commit на основной БД, когда реплика может
+# еще не догнать его, поэтому кэши после сброса загружаются только с
+# основной БД (см. refcache).
+
+CHANNEL = "book_catalog_cache"
+FILE_MAX_BYTES = 1024 * 1024
+
+_PENDING = "cache_bus_events"
+_ORIGIN = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+_handlers: Dict[str, List[Callable[[Optional[Hashable]], None]]] = defaultdict(list)
+_counters = {"published": 0, "received": 0, "resets": 0, "errors": 0}
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+
+
+def subscribe(entity: str, handler: Callable[[Optional[Hashable]], None]):
+    _handlers[entity].append(handler)
+
+
+def publish(db: Session, entity: str, key: Optional[Hashable] = None):
+    """Событие изменения сущности; вызывается до commit в той же сессии"""
+    notified = db.get_bind().dialect.name == "postgresql"
+    if notified:
+        db.execute(text("SELECT pg_notify(:channel, :payload)"),
+                   {"channel": CHANNEL, "payload": _encode(entity, key)})
+    db.info.setdefault(_PENDING, []).append((entity, key, notified))
+
+
+def _encode(entity: str, key: Optional[Hashable]) -> str:
+    return json.dumps({"origin": _ORIGIN, "entity": entity, "key": key}, ensure_ascii=False)
+
+
+def _dispatch(entity: str, key: Optional[Hashable]):
+    for handler in _handlers.get(entity, ()):
+        try:
+            handler(key)
+        except Exception as e:
+            _counters["errors"] += 1
+            print(f"Ошибка обработчика кэша {entity}: {e}")
+
+
+def _reset():
+    _counters["resets"] += 1
+    for entity in list(_handlers):
+        _dispatch(entity, None)
+
+
+def _receive(payload: str):
+    try:
+        message = json.loads(payload)
+    except ValueError:
+        _counters["errors"] += 1
+        return
+    # Свои события уже применены в after_commit
+    if message.get("origin") == _ORIGIN:
+        return
+    _counters["received"] += 1
+    _dispatch(message.get("entity"), message.get("key"))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed(session: Session):
+    events = session.info.pop(_PENDING, None)
+    if not events:
+        return
+    unique = list(dict.fromkeys(events))
+    for entity, key, _ in unique:
+        _dispatch(entity, key)
+    _counters["published"] += len(unique)
+    lines = [_encode(entity, key) + "\n" for entity, key, notified in unique if not notified]
+    if lines:
+        try:
+            _append(lines)
+        except OSError as e:
+            _counters["errors"] += 1
+            print(f"Не удалось записать события кэша в {bus_file()}: {e}")
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session):
+    session.info.pop(_PENDING, None)
+
+
+# Файловый канал для БД без LISTEN/NOTIFY
+def bus_file() -> str:
+    if settings.CACHE_BUS_FILE:
+        return settings.CACHE_BUS_FILE
+    url = make_url(settings.DATABASE_URL)
+    if url.get_backend_name() == "sqlite" and url.database and url.database != ":memory:":
+        return os.path.abspath(url.database) + ".cache-bus"
+    return os.path.join(tempfile.gettempdir(), "book_catalog.cache-bus")
+
+
+def _append(lines: List[str]):
+    path = bus_file()
+    try:
+        if os.path.getsize(path) > FILE_MAX_BYTES:
+            # Читатели заметят смену файла и сбросят кэши целиком
+            os.replace(path, path + ".old")
+    except OSError:
+        pass
+    # Одна запись в режиме O_APPEND не перемешивается с записями других процессов
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+    try:
+        os.write(fd, "".join(lines).encode("utf-8"))
+    finally:
+        os.close(fd)
+
+
+def _file_position(path: str):
+    try:
+        stat = os.stat(path)
+        return stat.st_ino, stat.st_size
+    except OSError:
+        return None, 0
+
+
+def _tail_file():
+    path = bus_file()
+    inode, offset = _file_position(path)
+    while not _stop.wait(settings.CACHE_BUS_POLL_SECONDS):
+        current_inode, size = _file_position(path)
+        if current_inode != inode or size < offset:
+            # Файл создан впервые - пропускать нечего; ротация - сброс кэшей
+            if inode is not None:
+                _reset()
+            inode, offset = current_inode, 0
+        if size <= offset:
+            continue
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read(size - offset)
+        # Незаконченная строка дочитывается в следующий раз
+        complete = data.rfind(b"\n") + 1
+        for line in data[:complete].splitlines():
+            _receive(line.decode("utf-8", errors="replace"))
+        offset += complete
+
+
+# LISTEN для PostgreSQL
+def _listen_postgres():
+    import psycopg
+
+    conninfo = make_url(settings.DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+    while not _stop.is_set():
+        try:
+            with psycopg.connect(conninfo, autocommit=True) as connection:
+                connection.execute(f"LISTEN {CHANNEL}")
+                # Пока соединения не было, события могли быть пропущены
+                _reset()
+                while not _stop.is_set():
+                    for notify in connection.notifies(timeout=1.0):
+                        _receive(notify.payload)
+        except psycopg.Error as e:
+            _counters["errors"] += 1
+            print(f"Шина кэша: соединение LISTEN потеряно: {e}")
+            _stop.wait(settings.CACHE_BUS_RETRY_SECONDS)
+
+
+def start():
+    """Запуск прослушивания событий других процессов"""
+    global _thread
+    if _thread is not None:
+        return
+    _stop.clear()
+    if make_url(settings.DATABASE_URL).get_backend_name() == "postgresql":
+        target = _listen_postgres
+    else:
+        target = _tail_file
+    _thread = threading.Thread(target=target, name="cache-bus", daemon=True)
+    _thread.start()
+
+
+def shutdown():
+    global _thread
+    _stop.set()
+    if _thread is not None:
+        _thread.join(timeout=5)
+        _thread = None
+
+
+def stats() -> dict:
+    return {
+        "origin": _ORIGIN,
+        "transport": "postgres" if make_url(settings.DATABASE_URL).get_backend_name() == "postgresql" else "file",
+        "listening": _thread is not None and _thread.is_alive(),
+        **_counters,
+    }
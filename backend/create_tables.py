@@ -1,5 +1,5 @@
-from database import engine, Base
-from models import *
+import migrate
 
-Base.metadata.create_all(bind=engine)
-print("Таблицы успешно созданы")
\ No newline at end of file
+# Схема создается и обновляется миграциями (alembic.ini, migrations/)
+migrate.upgrade()
+print("Таблицы успешно созданы")
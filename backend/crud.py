@@ -1,8 +1,13 @@
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy import and_, case, func, literal, or_, select, tuple_, String
+from sqlalchemy.orm import Session, joinedload, selectinload
+from typing import Dict, Iterable, List, Optional
 from datetime import date, datetime
 import models
 import schemas
+import search
+import pagination
+import refcache
+import cache_bus
 from auth import get_password_hash
 
 # User CRUD
@@ -15,10 +20,12 @@ def get_user_by_login(db: Session, login: str):
 def get_users(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models.User).offset(skip).limit(limit).all()
 
-def create_user(db: Session, user: schemas.UserCreate, is_admin: bool = False):
+def create_user(db: Session, user: schemas.UserCreate, is_admin: bool = False,
+                password_hash: Optional[str] = None):
+    # password_hash может быть вычислен заранее (в пуле хэширования)
     db_user = models.User(
         login=user.login,
-        password_hash=get_password_hash(user.password),
+        password_hash=password_hash or get_password_hash(user.password),
         name=user.name,
         is_admin=is_admin
     )
@@ -27,7 +34,8 @@ def create_user(db: Session, user: schemas.UserCreate, is_admin: bool = False):
     db.refresh(db_user)
     return db_user
 
-def update_user(db: Session, user_id: int, user_update: schemas.UserUpdate):
+def update_user(db: Session, user_id: int, user_update: schemas.UserUpdate,
+                password_hash: Optional[str] = None):
     db_user = db.query(models.User).filter(models.User.user_id == user_id).first()
     if not db_user:
         return None
@@ -35,7 +43,8 @@ def update_user(db: Session, user_id: int, user_update: schemas.UserUpdate):
     update_data = user_update.dict(exclude_unset=True)
     
     if "password" in update_data:
-        update_data["password_hash"] = get_password_hash(update_data.pop("password"))
+        password = update_data.pop("password")
+        update_data["password_hash"] = password_hash or get_password_hash(password)
     
     for key, value in update_data.items():
         if key != "password_hash":
@@ -43,6 +52,7 @@ def update_user(db: Session, user_id: int, user_update: schemas.UserUpdate):
         else:
             setattr(db_user, "password_hash", value)
     
+    cache_bus.publish(db, "user", user_id)
     db.commit()
     db.refresh(db_user)
     return db_user
@@ -50,7 +60,11 @@ def update_user(db: Session, user_id: int, user_update: schemas.UserUpdate):
 def delete_user(db: Session, user_id: int):
     db_user = db.query(models.User).filter(models.User.user_id == user_id).first()
     if db_user:
+        db.query(models.UserBook).filter(
+            models.UserBook.user_id == user_id
+        ).delete(synchronize_session=False)
         db.delete(db_user)
+        cache_bus.publish(db, "user", user_id)
         db.commit()
     return db_user
 
@@ -64,6 +78,7 @@ def get_authors(db: Session, skip: int = 0, limit: int = 100):
 def create_author(db: Session, author: schemas.AuthorCreate):
     db_author = models.Author(**author.dict())
     db.add(db_author)
+    cache_bus.publish(db, "authors")
     db.commit()
     db.refresh(db_author)
     return db_author
@@ -76,6 +91,11 @@ def update_author(db: Session, author_id: int, author_update: schemas.AuthorCrea
     for key, value in author_update.dict().items():
         setattr(db_author, key, value)
     
+    # Имя автора входит в поисковый документ его книг
+    for book in db_author.books:
+        search.index_book(db, book)
+    
+    cache_bus.publish(db, "authors")
     db.commit()
     db.refresh(db_author)
     return db_author
@@ -84,6 +104,7 @@ def delete_author(db: Session, author_id: int):
     db_author = db.query(models.Author).filter(models.Author.author_id == author_id).first()
     if db_author:
         db.delete(db_author)
+        cache_bus.publish(db, "authors")
         db.commit()
     return db_author
 
@@ -97,6 +118,7 @@ def get_genres(db: Session, skip: int = 0, limit: int = 100):
 def create_genre(db: Session, genre: schemas.GenreCreate):
     db_genre = models.Genre(**genre.dict())
     db.add(db_genre)
+    cache_bus.publish(db, "genres")
     db.commit()
     db.refresh(db_genre)
     return db_genre
@@ -109,6 +131,7 @@ def update_genre(db: Session, genre_id: int, genre_update: schemas.GenreCreate):
     for key, value in genre_update.dict().items():
         setattr(db_genre, key, value)
     
+    cache_bus.publish(db, "genres")
     db.commit()
     db.refresh(db_genre)
     return db_genre
@@ -117,6 +140,7 @@ def delete_genre(db: Session, genre_id: int):
     db_genre = db.query(models.Genre).filter(models.Genre.genre_id == genre_id).first()
     if db_genre:
         db.delete(db_genre)
+        cache_bus.publish(db, "genres")
         db.commit()
     return db_genre
 
@@ -130,6 +154,7 @@ def get_publishers(db: Session, skip: int = 0, limit: int = 100):
 def create_publisher(db: Session, publisher: schemas.PublisherCreate):
     db_publisher = models.Publisher(**publisher.dict())
     db.add(db_publisher)
+    cache_bus.publish(db, "publishers")
     db.commit()
     db.refresh(db_publisher)
     return db_publisher
@@ -142,6 +167,7 @@ def update_publisher(db: Session, publisher_id: int, publisher_update: schemas.P
     for key, value in publisher_update.dict().items():
         setattr(db_publisher, key, value)
     
+    cache_bus.publish(db, "publishers")
     db.commit()
     db.refresh(db_publisher)
     return db_publisher
@@ -150,19 +176,57 @@ def delete_publisher(db: Session, publisher_id: int):
     db_publisher = db.query(models.Publisher).filter(models.Publisher.publisher_id == publisher_id).first()
     if db_publisher:
         db.delete(db_publisher)
+        cache_bus.publish(db, "publishers")
         db.commit()
     return db_publisher
 
 # Book CRUD
+def book_load_options():
+    """
+    Опции загрузки графа книги для BookResponse: авторы и жанры - отдельными
+    запросами IN, издательство - через JOIN. Число запросов не зависит от
+    количества книг на странице.
+    """
+    return (
+        selectinload(models.Book.authors),
+        selectinload(models.Book.genres),
+        joinedload(models.Book.publisher),
+    )
+
+def query_books(db: Session):
+    """Запрос книг с полным графом для сериализации"""
+    return db.query(models.Book).options(*book_load_options())
+
 def get_book(db: Session, book_id: int):
-    return db.query(models.Book).filter(models.Book.book_id == book_id).first()
+    return query_books(db).filter(models.Book.book_id == book_id).first()
+
+def _reload_book(db: Session, book_id: int):
+    # После commit объект просрочен - перечитываем вместе со связями
+    return query_books(db).populate_existing().filter(models.Book.book_id == book_id).first()
 
 def get_books(db: Session, skip: int = 0, limit: int = 100, search: Optional[str] = None):
-    query = db.query(models.Book)
+    query = query_books(db)
     if search:
-        query = query.filter(models.Book.title.ilike(f"%{search}%"))
+        query = _filter_by_search(db, query, search)
     return query.offset(skip).limit(limit).all()
 
+def _filter_by_search(db: Session, query, search_text: str):
+    clause = search.matching_book_ids_clause(db, search_text)
+    if clause is None:
+        return query
+    return query.filter(clause)
+
+def search_user_books(db: Session, user_id: int, query: str, skip: int = 0, limit: int = 20):
+    """Ранжированный полнотекстовый поиск по книгам пользователя"""
+    ranked = search.search_book_ids(db, query, user_id=user_id, limit=limit, offset=skip)
+    if not ranked:
+        return []
+    books = query_books(db).filter(
+        models.Book.book_id.in_([book_id for book_id, _ in ranked])
+    ).all()
+    by_id = {book.book_id: book for book in books}
+    return [by_id[book_id] for book_id, _ in ranked if book_id in by_id]
+
 def create_book(db: Session, book: schemas.BookCreate):
     db_book = models.Book(
         title=book.title,
@@ -172,18 +236,25 @@ def create_book(db: Session, book: schemas.BookCreate):
         added_date=datetime.now()
     )
     db.add(db_book)
-    db.commit()
-    db.refresh(db_book)
-    
-    authors = db.query(models.Author).filter(models.Author.author_id.in_(book.author_ids)).all()
-    db_book.authors.extend(authors)
+    db.flush()
     
-    genres = db.query(models.Genre).filter(models.Genre.genre_id.in_(book.genre_ids)).all()
-    db_book.genres.extend(genres)
+    # id авторов и жанров проверены вызывающим кодом (справочники в refcache),
+    # связи вставляются напрямую, без загрузки объектов
+    if book.author_ids:
+        db.execute(models.author_book.insert(), [
+            {"author_id": author_id, "book_id": db_book.book_id}
+            for author_id in dict.fromkeys(book.author_ids)
+        ])
+    if book.genre_ids:
+        db.execute(models.genre_book.insert(), [
+            {"genre_id": genre_id, "book_id": db_book.book_id}
+            for genre_id in dict.fromkeys(book.genre_ids)
+        ])
     
+    db_book = _reload_book(db, db_book.book_id)
+    search.index_book(db, db_book)
     db.commit()
-    db.refresh(db_book)
-    return db_book
+    return _reload_book(db, db_book.book_id)
 
 def update_book(db: Session, book_id: int, book_update: schemas.BookUpdate):
     db_book = db.query(models.Book).filter(models.Book.book_id == book_id).first()
@@ -204,17 +275,140 @@ def update_book(db: Session, book_id: int, book_update: schemas.BookUpdate):
         genres = db.query(models.Genre).filter(models.Genre.genre_id.in_(update_data['genre_ids'])).all()
         db_book.genres = genres
     
+    search.index_book(db, db_book)
     db.commit()
-    db.refresh(db_book)
-    return db_book
+    return _reload_book(db, db_book.book_id)
 
 def delete_book(db: Session, book_id: int):
     db_book = db.query(models.Book).filter(models.Book.book_id == book_id).first()
     if db_book:
+        search.remove_book(db, book_id)
+        db.query(models.UserBook).filter(
+            models.UserBook.book_id == book_id
+        ).delete(synchronize_session=False)
         db.delete(db_book)
         db.commit()
     return db_book
 
+# Bulk import
+def _insert_returning_ids(db: Session, table, id_column, rows: List[dict]) -> List[int]:
+    """Многострочная вставка; id возвращаются в порядке rows"""
+    if not rows:
+        return []
+    statement = table.insert().returning(id_column, sort_by_parameter_order=True)
+    return list(db.execute(statement, rows).scalars())
+
+def _get_or_create_named(db: Session, model, id_column, names: Iterable[str]):
+    """{название: id} для справочника с колонкой name и число созданных записей"""
+    names = set(names)
+    if not names:
+        return {}, 0
+    found = {}
+    for name, item_id in db.query(model.name, id_column).filter(model.name.in_(names)).order_by(id_column):
+        found.setdefault(name, item_id)
+    missing = sorted(names - found.keys())
+    found.update(zip(missing, _insert_returning_ids(db, model.__table__, id_column, [{"name": name} for name in missing])))
+    return found, len(missing)
+
+def author_key(full_name: str):
+    """'Фамилия Имя Отчество' -> (last_name, first_name, middle_name)"""
+    parts = full_name.split()
+    return parts[0], parts[1] if len(parts) > 1 else None, " ".join(parts[2:]) or None
+
+def _get_or_create_authors(db: Session, keys: Iterable[tuple]):
+    keys = set(keys)
+    if not keys:
+        return {}, 0
+    found = {}
+    rows = db.query(
+        models.Author.author_id, models.Author.last_name, models.Author.first_name, models.Author.middle_name
+    ).filter(models.Author.last_name.in_({key[0] for key in keys})).order_by(models.Author.author_id)
+    for author_id, last_name, first_name, middle_name in rows:
+        found.setdefault((last_name, first_name or None, middle_name or None), author_id)
+    missing = sorted(keys - found.keys(), key=lambda key: tuple(part or "" for part in key))
+    ids = _insert_returning_ids(db, models.Author.__table__, models.Author.author_id, [
+        {"last_name": last_name, "first_name": first_name, "middle_name": middle_name}
+        for last_name, first_name, middle_name in missing
+    ])
+    found.update(zip(missing, ids))
+    return found, len(missing)
+
+def import_books_batch(db: Session, user_id: int, rows: List[schemas.BookImportRow],
+                       status_ids: List[int], planned_status_id: int) -> Dict[str, int]:
+    """
+    Пакетное добавление книг в библиотеку пользователя (без commit).
+    Издательства, авторы и жанры находятся по названиям или создаются;
+    книги, связи и история статусов вставляются многострочными INSERT;
+    библиотека пользователя (user_book), свертка статистики и поисковый
+    индекс обновляются для пакета целиком.
+    status_ids[i] - текущий статус книги rows[i]; как и при создании через
+    API, первой записью истории идет статус "В планах".
+    """
+    publishers, publishers_created = _get_or_create_named(
+        db, models.Publisher, models.Publisher.publisher_id, {row.publisher for row in rows})
+    genres, genres_created = _get_or_create_named(
+        db, models.Genre, models.Genre.genre_id, {name for row in rows for name in row.genres})
+    authors, authors_created = _get_or_create_authors(
+        db, {author_key(name) for row in rows for name in row.authors})
+    
+    now = datetime.now()
+    book_ids = _insert_returning_ids(db, models.Book.__table__, models.Book.book_id, [
+        {
+            "title": row.title,
+            "published": row.published,
+            "description": row.description,
+            "publisher_id": publishers[row.publisher],
+            "added_date": now,
+        }
+        for row in rows
+    ])
+    
+    author_links, genre_links, history, current, documents = [], [], [], [], []
+    deltas = {}
+    for book_id, row, status_id in zip(book_ids, rows, status_ids):
+        for author_id in dict.fromkeys(authors[author_key(name)] for name in row.authors):
+            author_links.append({"author_id": author_id, "book_id": book_id})
+        for name in dict.fromkeys(row.genres):
+            genre_links.append({"genre_id": genres[name], "book_id": book_id})
+        
+        progress = {"start_date": row.start_date, "end_date": row.end_date, "pages_read": row.pages_read}
+        empty = dict.fromkeys(progress)
+        entries = [{"book_id": book_id, "user_id": user_id, "status_id": planned_status_id,
+                    **(progress if status_id == planned_status_id else empty)}]
+        if status_id != planned_status_id:
+            entries.append({"book_id": book_id, "user_id": user_id, "status_id": status_id, **progress})
+        history.extend(entries)
+        current.append({"user_id": user_id, "book_id": book_id, "status_id": status_id,
+                        "pages_read": row.pages_read})
+        # Новая книга: вклада до импорта нет
+        _add_contribution(deltas, _book_contribution([models.Analytics(**entry) for entry in reversed(entries)]), 1)
+        
+        documents.append({
+            "book_id": book_id,
+            "title": row.title,
+            "authors": " ".join(row.authors),
+            "description": row.description or "",
+        })
+    
+    if author_links:
+        db.execute(models.author_book.insert(), author_links)
+    if genre_links:
+        db.execute(models.genre_book.insert(), genre_links)
+    db.execute(models.Analytics.__table__.insert(), history)
+    # Книги новые - строки библиотеки вставляются без проверки конфликтов
+    db.execute(models.UserBook.__table__.insert(), current)
+    _upsert_stats_deltas(db, user_id, deltas)
+    search.index_documents(db, documents)
+    
+    for entity, created in (("publishers", publishers_created), ("genres", genres_created), ("authors", authors_created)):
+        if created:
+            cache_bus.publish(db, entity)
+    return {
+        "publishers_created": publishers_created,
+        "genres_created": genres_created,
+        "authors_created": authors_created,
+    }
+
 # Book Status CRUD
 def get_book_statuses(db: Session):
     return db.query(models.BookStatus).all()
@@ -242,7 +436,19 @@ def create_analytics(db: Session, analytics: schemas.AnalyticsBase, user_id: int
         user_id=user_id
     )
     
+    # Строка user_book обновляется первой: upsert блокирует ее до commit, и
+    # параллельная запись по той же книге читает историю только после нашей.
+    # Иначе обе вычислили бы вклад "до" по одной истории и дважды применили
+    # дельту к свертке
+    _upsert_current_status(db, user_id, final_book_id, analytics.status_id, analytics.pages_read)
+    
+    # Вклад книги в свертку статистики до и после новой записи
+    history = _book_history(db, user_id, final_book_id)
+    before = _book_contribution(history)
+    after = _book_contribution([db_analytics] + history)
+    
     db.add(db_analytics)
+    _apply_stats_delta(db, user_id, before, after)
     db.commit()
     db.refresh(db_analytics)
     return db_analytics
@@ -250,6 +456,233 @@ def create_analytics(db: Session, analytics: schemas.AnalyticsBase, user_id: int
 def get_user_analytics(db: Session, user_id: int):
     return db.query(models.Analytics).filter(models.Analytics.user_id == user_id).all()
 
+def _days_between(db: Session, start, end):
+    if db.get_bind().dialect.name == "sqlite":
+        return func.julianday(end) - func.julianday(start)
+    return end - start
+
+def compute_reading_stats(db: Session, user_id: Optional[int] = None):
+    """
+    Расчет статистики чтения по истории аналитики одним запросом.
+    Для каждой книги учитывается только последний статус; страницы - максимум
+    по истории книги, длительность чтения - от первой start_date до последней
+    end_date. Возвращает строки (user_id, status_id, books, pages, days_total, days_count).
+    """
+    partition = (models.Analytics.user_id, models.Analytics.book_id)
+    per_book = db.query(
+        models.Analytics.user_id.label("user_id"),
+        models.Analytics.book_id.label("book_id"),
+        models.Analytics.status_id.label("status_id"),
+        func.row_number().over(
+            partition_by=partition,
+            order_by=(models.Analytics.created_date.desc(), models.Analytics.analytics_id.desc())
+        ).label("rn"),
+        func.max(models.Analytics.pages_read).over(partition_by=partition).label("pages_read"),
+        func.min(models.Analytics.start_date).over(partition_by=partition).label("start_date"),
+        func.max(models.Analytics.end_date).over(partition_by=partition).label("end_date"),
+    )
+    if user_id is not None:
+        per_book = per_book.filter(models.Analytics.user_id == user_id)
+    per_book = per_book.subquery()
+    
+    duration = _days_between(db, per_book.c.start_date, per_book.c.end_date)
+    has_duration = and_(
+        per_book.c.start_date.isnot(None),
+        per_book.c.end_date.isnot(None),
+        per_book.c.end_date >= per_book.c.start_date
+    )
+    
+    return db.query(
+        per_book.c.user_id,
+        per_book.c.status_id,
+        func.count(per_book.c.book_id),
+        func.coalesce(func.sum(per_book.c.pages_read), 0),
+        func.coalesce(func.sum(case((has_duration, duration), else_=None)), 0),
+        func.count(case((has_duration, 1), else_=None)),
+    ).filter(
+        per_book.c.rn == 1
+    ).group_by(per_book.c.user_id, per_book.c.status_id).all()
+
+def get_user_reading_stats(db: Session, user_id: int):
+    """
+    Статистика чтения пользователя из свертки user_reading_stats.
+    Возвращает {название статуса: {books, pages, days_total, days_count}}.
+    """
+    rows = db.query(models.UserReadingStats).filter(
+        models.UserReadingStats.user_id == user_id
+    ).all()
+    statuses = refcache.statuses.get_many(db, [row.status_id for row in rows])
+    
+    return {
+        statuses[row.status_id].name: {
+            "books": row.books,
+            "pages": row.pages,
+            "days_total": float(row.days_total),
+            "days_count": row.days_count,
+        }
+        for row in rows
+        if row.status_id in statuses
+    }
+
+def rebuild_user_reading_stats(db: Session, user_id: Optional[int] = None) -> int:
+    """Пересчет свертки по истории аналитики (первичное заполнение и исправление расхождений)"""
+    query = db.query(models.UserReadingStats)
+    if user_id is not None:
+        query = query.filter(models.UserReadingStats.user_id == user_id)
+    query.delete(synchronize_session=False)
+    
+    rows = [
+        {
+            "user_id": row_user_id,
+            "status_id": status_id,
+            "books": books,
+            "pages": int(pages),
+            "days_total": int(round(days_total)),
+            "days_count": days_count,
+        }
+        for row_user_id, status_id, books, pages, days_total, days_count in compute_reading_stats(db, user_id)
+    ]
+    if rows:
+        db.execute(models.UserReadingStats.__table__.insert(), rows)
+    db.commit()
+    return len(rows)
+
+def _book_history(db: Session, user_id: int, book_id: int):
+    """История статусов книги пользователя, последние записи первыми"""
+    return db.query(models.Analytics).filter(
+        models.Analytics.user_id == user_id,
+        models.Analytics.book_id == book_id
+    ).order_by(models.Analytics.created_date.desc(), models.Analytics.analytics_id.desc()).all()
+
+def _book_contribution(history):
+    """Вклад одной книги в свертку: (status_id, pages, days) или None"""
+    if not history:
+        return None
+    pages = max((a.pages_read for a in history if a.pages_read is not None), default=0)
+    start_dates = [a.start_date for a in history if a.start_date is not None]
+    end_dates = [a.end_date for a in history if a.end_date is not None]
+    days = None
+    if start_dates and end_dates and max(end_dates) >= min(start_dates):
+        days = (max(end_dates) - min(start_dates)).days
+    return history[0].status_id, pages, days
+
+def _add_contribution(deltas: dict, contribution, sign: int):
+    if contribution is None:
+        return
+    status_id, pages, days = contribution
+    delta = deltas.setdefault(status_id, [0, 0, 0, 0])
+    delta[0] += sign
+    delta[1] += sign * pages
+    if days is not None:
+        delta[2] += sign * days
+        delta[3] += sign
+
+def _apply_stats_delta(db: Session, user_id: int, before, after):
+    """Изменение свертки при смене вклада книги (в текущей транзакции)"""
+    deltas = {}
+    _add_contribution(deltas, before, -1)
+    _add_contribution(deltas, after, 1)
+    _upsert_stats_deltas(db, user_id, deltas)
+
+def _dialect_insert(db: Session):
+    """insert() с поддержкой ON CONFLICT для диалекта сессии"""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+def _upsert_stats_deltas(db: Session, user_id: int, deltas: dict):
+    """
+    deltas: {status_id: [books, pages, days_total, days_count]}
+    Строки, в которых не осталось книг, удаляются - как и rebuild_user_reading_stats,
+    свертка не хранит статусы без книг.
+    """
+    table = models.UserReadingStats.__table__
+    insert = _dialect_insert(db)
+    
+    for status_id, (books, pages, days_total, days_count) in deltas.items():
+        if not any((books, pages, days_total, days_count)):
+            continue
+        statement = insert(table).values(
+            user_id=user_id, status_id=status_id, books=books,
+            pages=pages, days_total=days_total, days_count=days_count
+        )
+        db.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.status_id],
+            set_={
+                "books": table.c.books + statement.excluded.books,
+                "pages": table.c.pages + statement.excluded.pages,
+                "days_total": table.c.days_total + statement.excluded.days_total,
+                "days_count": table.c.days_count + statement.excluded.days_count,
+            }
+        ))
+    
+    emptied = [status_id for status_id, delta in deltas.items() if delta[0] < 0]
+    if emptied:
+        db.execute(table.delete().where(
+            table.c.user_id == user_id,
+            table.c.status_id.in_(emptied),
+            table.c.books <= 0
+        ))
+
+# Библиотека пользователя: строка user_book создается первой записью analytics
+# книги и обновляется в той же транзакции, что и каждая следующая запись;
+# статус в ней совпадает с последней записью истории, pages_read - максимум
+# по истории
+def _upsert_current_status(db: Session, user_id: int, book_id: int, status_id: int,
+                           pages_read: Optional[int]):
+    table = models.UserBook.__table__
+    statement = _dialect_insert(db)(table).values(
+        user_id=user_id, book_id=book_id, status_id=status_id, pages_read=pages_read
+    )
+    # greatest в PostgreSQL пропускает NULL, max(a, b) в SQLite возвращает NULL
+    greatest = func.greatest if db.get_bind().dialect.name == "postgresql" else func.max
+    current, new = table.c.pages_read, statement.excluded.pages_read
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.book_id],
+        set_={
+            "status_id": statement.excluded.status_id,
+            "pages_read": func.coalesce(greatest(current, new), current, new),
+            "changed_at": func.now(),
+        }
+    ))
+
+def rebuild_user_books(db: Session, user_id: Optional[int] = None) -> int:
+    """Пересчет библиотек пользователей (user_book) по истории аналитики"""
+    query = db.query(models.UserBook)
+    if user_id is not None:
+        query = query.filter(models.UserBook.user_id == user_id)
+    query.delete(synchronize_session=False)
+    
+    partition = (models.Analytics.user_id, models.Analytics.book_id)
+    per_book = db.query(
+        models.Analytics.user_id.label("user_id"),
+        models.Analytics.book_id.label("book_id"),
+        models.Analytics.status_id.label("status_id"),
+        func.max(models.Analytics.pages_read).over(partition_by=partition).label("pages_read"),
+        func.min(models.Analytics.created_date).over(partition_by=partition).label("added_at"),
+        models.Analytics.created_date.label("changed_at"),
+        func.row_number().over(
+            partition_by=partition,
+            order_by=(models.Analytics.created_date.desc(), models.Analytics.analytics_id.desc())
+        ).label("rn"),
+    ).filter(
+        models.Analytics.user_id.isnot(None),
+        models.Analytics.book_id.isnot(None),
+        models.Analytics.status_id.isnot(None)
+    )
+    if user_id is not None:
+        per_book = per_book.filter(models.Analytics.user_id == user_id)
+    per_book = per_book.subquery()
+    
+    columns = ("user_id", "book_id", "added_at", "status_id", "pages_read", "changed_at")
+    result = db.execute(models.UserBook.__table__.insert().from_select(
+        columns, select(*(per_book.c[name] for name in columns)).where(per_book.c.rn == 1)
+    ))
+    db.commit()
+    return result.rowcount
+
 def get_analytics_by_status(db: Session, user_id: int, status_id: int):
     return db.query(models.Analytics).filter(
         models.Analytics.user_id == user_id,
@@ -258,92 +691,297 @@ def get_analytics_by_status(db: Session, user_id: int, status_id: int):
 
 # Reports CRUD
 def get_books_added_in_period(db: Session, start_date: date, end_date: date):
-    return db.query(models.Book).filter(
+    return query_books(db).filter(
         models.Book.added_date.between(start_date, end_date)
     ).all()
     
 
 def create_report_record(db: Session, user_id: int, report_type: str,
                          period_from: Optional[date], period_to: Optional[date],
-                         file_path: str):
+                         file_path: Optional[str], status: str = "done",
+                         items_total: Optional[int] = None, items_done: Optional[int] = None):
     db_report = models.Report(
         user_id=user_id,
         report_type=report_type,
         period_from=period_from,
         period_to=period_to,
-        file_path=file_path
+        file_path=file_path,
+        status=status,
+        items_total=items_total,
+        items_done=items_done,
+        generated_at=datetime.now(),
+        finished_at=datetime.now() if status == "done" else None
     )
     db.add(db_report)
     db.commit()
     db.refresh(db_report)
     return db_report
 
+def get_user_report(db: Session, user_id: int, report_id: int):
+    return db.query(models.Report).filter(
+        models.Report.report_id == report_id,
+        models.Report.user_id == user_id
+    ).first()
+
+def get_user_reports(db: Session, user_id: int, skip: int = 0, limit: int = 100):
+    return db.query(models.Report).filter(
+        models.Report.user_id == user_id
+    ).order_by(models.Report.generated_at.desc(), models.Report.report_id.desc()).offset(skip).limit(limit).all()
+
+def update_report_progress(db: Session, report_id: int, items_done: int):
+    db.query(models.Report).filter(models.Report.report_id == report_id).update(
+        {models.Report.items_done: items_done}, synchronize_session=False
+    )
+    db.commit()
+
+def count_active_report_jobs(db: Session, user_id: int, newer_than: datetime) -> int:
+    """Количество незавершенных фоновых отчетов пользователя"""
+    return db.query(models.Report).filter(
+        models.Report.user_id == user_id,
+        models.Report.status == "queued",
+        models.Report.generated_at >= newer_than
+    ).count()
+
+def finish_report_job(db: Session, report_id: int, file_path: Optional[str] = None,
+                      error: Optional[str] = None):
+    db_report = db.query(models.Report).filter(models.Report.report_id == report_id).first()
+    if not db_report:
+        return None
+    db_report.status = "failed" if error else "done"
+    db_report.file_path = file_path
+    db_report.error = error
+    db_report.finished_at = datetime.now()
+    if not error and db_report.items_total is not None:
+        db_report.items_done = db_report.items_total
+    db.commit()
+    return db_report
+
 # Добавить в существующий файл crud.py следующие функции:
 
+def _join_user_books(query, user_id: int, user_book=models.UserBook):
+    """Ограничение запроса книг библиотекой пользователя (поиск по первичному ключу user_book)"""
+    return query.join(user_book, and_(
+        user_book.book_id == models.Book.book_id, user_book.user_id == user_id
+    ))
+
 def get_user_books(db: Session, user_id: int, skip: int = 0, limit: int = 100, search: Optional[str] = None):
-    """Получение книг пользователя через аналитику"""
-    query = db.query(models.Book).join(models.Analytics).filter(
-        models.Analytics.user_id == user_id
-    ).distinct()
+    """Получение книг пользователя"""
+    query = _join_user_books(query_books(db), user_id)
     
     if search:
-        query = query.filter(models.Book.title.ilike(f"%{search}%"))
+        query = _filter_by_search(db, query, search)
     
     return query.offset(skip).limit(limit).all()
 
+def get_user_books_page(db: Session, user_id: int, sort: str = "added_date", order: str = "desc",
+                        cursor: Optional[str] = None, limit: int = 100,
+                        search: Optional[str] = None, skip: int = 0):
+    """
+    Keyset-пагинация книг пользователя.
+    Возвращает (книги, курсор следующей страницы, курсор предыдущей страницы).
+    Сортировка всегда дополняется book_id, чтобы порядок был однозначным.
+    Книги читаются вместе с проекцией текущего статуса и получают атрибуты
+    current_status, pages_read и changed_at (BookWithStatusResponse).
+    Книги без значения сортируемой колонки (title, published) идут в конце
+    при asc и в начале при desc.
+    """
+    if sort not in pagination.BOOK_SORT_KEYS:
+        raise pagination.InvalidCursor(f"Неизвестная сортировка: {sort}")
+    if order not in ("asc", "desc"):
+        raise pagination.InvalidCursor(f"Неизвестный порядок сортировки: {order}")
+
+    # Книги пользователя, текущий статус и дата его изменения - одна строка
+    # user_book на книгу, без группировки по всей аналитике
+    current = models.UserBook
+    # Даты сортируются по user_book с book_id из нее же - страницы идут по
+    # индексам ix_user_book_user_added / ix_user_book_user_changed пользователя
+    sort_column, tie_column = {
+        "added_date": (current.added_at, current.book_id),
+        "title": (models.Book.title, models.Book.book_id),
+        "published": (models.Book.published, models.Book.book_id),
+        "status_changed": (current.changed_at, current.book_id),
+    }[sort]
+    nullable = sort in pagination.NULLABLE_SORT_KEYS
+
+    query = _join_user_books(db.query(models.Book, current).options(*book_load_options()), user_id)
+    if search:
+        query = _filter_by_search(db, query, search)
+
+    payload = pagination.decode_cursor(cursor, sort, order) if cursor else None
+    direction = payload["d"] if payload else "next"
+    # Для перехода назад читаем в обратном порядке и затем разворачиваем страницу
+    ascending = (order == "asc") == (direction == "next")
+
+    if payload:
+        sort_value_param = payload["v"]
+        if sort in pagination.DATETIME_SORT_KEYS and db.get_bind().dialect.name == "sqlite":
+            # CURRENT_TIMESTAMP в SQLite хранится строкой без микросекунд,
+            # сравниваем с тем же текстовым представлением
+            sort_value_param = literal(str(sort_value_param), String)
+        if nullable:
+            query = query.filter(_keyset_nullable(sort_column, tie_column, sort_value_param, payload["id"], ascending))
+        else:
+            key = tuple_(sort_column, tie_column)
+            value = tuple_(sort_value_param, payload["id"])
+            query = query.filter(key > value if ascending else key < value)
+    elif skip:
+        query = query.offset(skip)
+
+    # NULL - после всех значений в порядке asc (и явно, т.к. в SQLite по умолчанию наоборот)
+    if ascending:
+        query = query.order_by(sort_column.asc().nulls_last(), tie_column.asc())
+    else:
+        query = query.order_by(sort_column.desc().nulls_first(), tie_column.desc())
+
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == "prev":
+        rows.reverse()
+
+    def sort_value(row):
+        book, book_status = row
+        if sort == "status_changed":
+            return book_status.changed_at
+        if sort == "added_date":
+            return book_status.added_at
+        return getattr(book, sort)
+
+    def make_cursor(row, cursor_direction):
+        return pagination.encode_cursor(sort, order, cursor_direction, sort_value(row), row[0].book_id)
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if direction == "next":
+            if has_more:
+                next_cursor = make_cursor(rows[-1], "next")
+            if payload or skip:
+                prev_cursor = make_cursor(rows[0], "prev")
+        else:
+            next_cursor = make_cursor(rows[-1], "next")
+            if has_more:
+                prev_cursor = make_cursor(rows[0], "prev")
+
+    statuses = refcache.statuses.get_many(db, [book_status.status_id for _, book_status in rows])
+    for book, book_status in rows:
+        book.current_status = statuses.get(book_status.status_id)
+        book.pages_read = book_status.pages_read
+        book.changed_at = book_status.changed_at
+
+    return [book for book, _ in rows], next_cursor, prev_cursor
+
+def _keyset_nullable(column, tie_column, value, book_id: int, forward: bool):
+    """
+    Условие keyset для колонки с NULL при порядке (значения asc, NULL последними,
+    tie_column asc): forward - строки после (value, book_id), иначе - до.
+    Сравнение кортежей с NULL дает NULL, поэтому условие раскрывается через OR.
+    """
+    if value is None:
+        if forward:
+            return and_(column.is_(None), tie_column > book_id)
+        return or_(column.isnot(None), and_(column.is_(None), tie_column < book_id))
+    if forward:
+        return or_(column > value, and_(column == value, tie_column > book_id), column.is_(None))
+    return or_(column < value, and_(column == value, tie_column < book_id))
+
 def get_user_book_by_id(db: Session, user_id: int, book_id: int):
     """Получение конкретной книги пользователя"""
-    return db.query(models.Book).join(models.Analytics).filter(
-        models.Book.book_id == book_id,
-        models.Analytics.user_id == user_id
-    ).first()
+    return _join_user_books(query_books(db), user_id).filter(models.Book.book_id == book_id).first()
 
-def get_current_book_status(db: Session, user_id: int, book_id: int):
-    """Получение текущего статуса книги для пользователя"""
-    analytics = db.query(models.Analytics).filter(
+def user_owns_book(db: Session, user_id: int, book_id: int) -> bool:
+    """Проверка принадлежности книги пользователю без загрузки самой книги"""
+    return db.query(
+        db.query(models.UserBook).filter(
+            models.UserBook.user_id == user_id,
+            models.UserBook.book_id == book_id
+        ).exists()
+    ).scalar()
+
+def get_user_books_for_export(db: Session, user_id: int, book_ids: Optional[List[int]] = None,
+                              search: Optional[str] = None, status_id: Optional[int] = None):
+    """
+    Книги пользователя вместе с текущими статусами для пакетной выгрузки:
+    список (книга, статус) за фиксированное число запросов.
+    """
+    query = _join_user_books(
+        db.query(models.Book, models.UserBook.status_id).options(*book_load_options()), user_id
+    )
+    if book_ids is not None:
+        query = query.filter(models.Book.book_id.in_(book_ids))
+    if search:
+        query = _filter_by_search(db, query, search)
+    if status_id is not None:
+        query = query.filter(models.UserBook.status_id == status_id)
+    rows = query.order_by(models.Book.book_id).all()
+    
+    statuses = refcache.statuses.get_many(db, [row_status_id for _, row_status_id in rows])
+    return [(book, statuses.get(row_status_id)) for book, row_status_id in rows]
+
+def get_book_status_history(db: Session, user_id: int, book_id: int):
+    """История статусов книги пользователя, новые первыми"""
+    return db.query(models.Analytics).filter(
         models.Analytics.user_id == user_id,
         models.Analytics.book_id == book_id
-    ).order_by(models.Analytics.created_date.desc()).first()
+    ).order_by(models.Analytics.created_date.desc(), models.Analytics.analytics_id.desc()).all()
+
+def get_current_book_status(db: Session, user_id: int, book_id: int):
+    """Получение текущего статуса книги для пользователя"""
+    return get_current_book_statuses(db, user_id, [book_id]).get(book_id)
+
+def get_current_book_statuses(db: Session, user_id: int, book_ids: Iterable[int]) -> Dict[int, models.BookStatus]:
+    """Текущие статусы набора книг пользователя из user_book: {book_id: BookStatus}"""
+    book_ids = list(book_ids)
+    if not book_ids:
+        return {}
     
-    if analytics:
-        return db.query(models.BookStatus).filter(
-            models.BookStatus.status_id == analytics.status_id
-        ).first()
-    return None
+    rows = db.query(models.UserBook.book_id, models.UserBook.status_id).filter(
+        models.UserBook.user_id == user_id,
+        models.UserBook.book_id.in_(book_ids)
+    ).all()
+    statuses = refcache.statuses.get_many(db, [status_id for _, status_id in rows])
+    return {book_id: statuses[status_id] for book_id, status_id in rows if status_id in statuses}
+
+def _added_in_period(start_date: date, end_date: date):
+    # Увеличиваем end_date на 1 день, чтобы включить весь последний день
+    from datetime import timedelta
+    end_date_inclusive = end_date + timedelta(days=1)
+    
+    # Дата добавления в библиотеку (первая запись аналитики) хранится в user_book
+    return and_(
+        models.UserBook.added_at >= start_date,
+        models.UserBook.added_at < end_date_inclusive  # Строго меньше следующего дня
+    )
+
+def _books_added_in_period_query(db: Session, user_id: int, start_date: date, end_date: date):
+    return _join_user_books(db.query(models.Book), user_id).filter(
+        _added_in_period(start_date, end_date)
+    ).order_by(models.UserBook.added_at, models.Book.book_id)
+
+def books_added_in_period_fingerprint(db: Session, user_id: int, start_date: date, end_date: date):
+    """
+    Отпечаток набора книг за период для ключа кэша отчета: (число книг,
+    последняя дата добавления, наибольший book_id). Один запрос по индексу
+    ix_user_book_user_added, без чтения самих книг.
+    """
+    return tuple(db.query(
+        func.count(),
+        func.max(models.UserBook.added_at),
+        func.max(models.UserBook.book_id),
+    ).filter(
+        models.UserBook.user_id == user_id,
+        _added_in_period(start_date, end_date)
+    ).one())
 
 def get_books_added_in_period_by_user(db: Session, user_id: int, start_date: date, end_date: date):
     """Получение книг, добавленных пользователем за период (по дате создания аналитики)"""
     try:
         print(f"Поиск книг пользователя {user_id} за период с {start_date} по {end_date}")
         
-        # Увеличиваем end_date на 1 день, чтобы включить весь последний день
-        from datetime import timedelta
-        end_date_inclusive = end_date + timedelta(days=1)
-        
-        # Ищем книги по первой записи в аналитике
-        from sqlalchemy import func
-        
-        # Подзапрос: находим минимальную дату создания аналитики для каждой книги пользователя
-        subquery = db.query(
-            models.Analytics.book_id,
-            func.min(models.Analytics.created_date).label('first_analytics_date')
-        ).filter(
-            models.Analytics.user_id == user_id
-        ).group_by(models.Analytics.book_id).subquery()
-        
-        # Основной запрос: книги, где первая аналитика попадает в период
-        books = db.query(models.Book).join(
-            subquery,
-            models.Book.book_id == subquery.c.book_id
-        ).filter(
-            subquery.c.first_analytics_date >= start_date,
-            subquery.c.first_analytics_date < end_date_inclusive  # Строго меньше следующего дня
+        books = _books_added_in_period_query(db, user_id, start_date, end_date).options(
+            *book_load_options()
         ).all()
         
         print(f"Найдено книг за период: {len(books)}")
-        for book in books:
-            print(f"  - Книга ID {book.book_id}: '{book.title}'")
-        
         return books
         
     except Exception as e:
@@ -352,8 +990,31 @@ def get_books_added_in_period_by_user(db: Session, user_id: int, start_date: dat
         traceback.print_exc()
         return []
 
+def iter_books_added_in_period_by_user(db: Session, user_id: int, start_date: date, end_date: date,
+                                       batch_size: int = 500):
+    """
+    Потоковое чтение книг, добавленных за период: строки читаются с сервера
+    пачками по batch_size, авторы и жанры подгружаются для каждой пачки.
+    """
+    statement = _books_added_in_period_query(db, user_id, start_date, end_date).options(
+        selectinload(models.Book.authors),
+        selectinload(models.Book.genres)
+    ).statement.execution_options(yield_per=batch_size)
+    for book in db.scalars(statement):
+        yield book
+
 def delete_user_book(db: Session, user_id: int, book_id: int):
-    """Удаление книги пользователя (удаляет только аналитику)"""
+    """Удаление книги из библиотеки пользователя (сама книга остается); False - книги в библиотеке нет"""
+    removed = db.query(models.UserBook).filter(
+        models.UserBook.user_id == user_id,
+        models.UserBook.book_id == book_id
+    ).delete()
+    if not removed:
+        return False
+    
+    before = _book_contribution(_book_history(db, user_id, book_id))
+    _apply_stats_delta(db, user_id, before, None)
+    
     # Удаляем аналитику пользователя для этой книги
     db.query(models.Analytics).filter(
         models.Analytics.user_id == user_id,
@@ -368,6 +1029,7 @@ def delete_user_book(db: Session, user_id: int, book_id: int):
 def create_book_status(db: Session, status: schemas.BookStatusBase):
     db_status = models.BookStatus(**status.dict())
     db.add(db_status)
+    cache_bus.publish(db, "statuses")
     db.commit()
     db.refresh(db_status)
     return db_status
@@ -383,6 +1045,7 @@ def update_book_status(db: Session, status_id: int, status_update: schemas.BookS
     for key, value in status_update.dict().items():
         setattr(db_status, key, value)
     
+    cache_bus.publish(db, "statuses")
     db.commit()
     db.refresh(db_status)
     return db_status
@@ -394,6 +1057,7 @@ def delete_book_status(db: Session, status_id: int):
     
     if db_status:
         db.delete(db_status)
+        cache_bus.publish(db, "statuses")
         db.commit()
     
     return db_status
\ No newline at end of file
@@ -1,15 +1,61 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from config import settings
+import metrics
 
 DATABASE_URL = settings.DATABASE_URL
-engine = create_engine(DATABASE_URL)
+
+# Асинхронный драйвер для того же сервера: psycopg 3 для PostgreSQL,
+# aiosqlite для локальной SQLite
+_ASYNC_DRIVERS = {"postgresql": "postgresql+psycopg", "sqlite": "sqlite+aiosqlite"}
+
+
+def async_database_url(url: str) -> str:
+    parsed = make_url(url)
+    driver = _ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        return url
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or async_database_url(DATABASE_URL)
+
+
+def engine_options(url: str) -> dict:
+    options = {"pool_pre_ping": settings.DB_POOL_PRE_PING}
+    if make_url(url).get_backend_name() != "sqlite":
+        options.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+        )
+    return options
+
+
+# Синхронный движок: фоновые задачи отчетов, management-команды, миграции
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Асинхронный движок для обработчиков запросов. expire_on_commit=False:
+# объекты после commit отдаются в ответ без повторной загрузки атрибутов.
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL))
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+metrics.track_pool("primary", async_engine)
+metrics.track_pool("primary_sync", engine)
+
 Base = declarative_base()
 
-def get_db():
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def get_sync_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
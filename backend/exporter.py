@@ -0,0 +1,158 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from typing import Iterator, Optional
+
+from sqlalchemy.orm import Session
+
+import crud
+import models
+import refcache
+from config import settings
+from database import SessionLocal
+
+# Потоковая выгрузка библиотеки пользователя в NDJSON или CSV. Книги и
+# история статусов читаются двумя серверными курсорами (yield_per), оба
+# упорядочены по book_id, и сливаются на лету: в памяти одновременно
+# находятся только текущие пакеты курсоров и один буфер вывода, поэтому
+# память не зависит от размера библиотеки, а первые байты уходят клиенту
+# сразу после первого пакета.
+#
+# Поля совпадают с форматом importer.py (выгрузку можно загрузить обратно),
+# плюс book_id, added_date, status_changed_at и history - вся история
+# статусов. В CSV авторы и жанры перечисляются через ';', history - JSON.
+
+FORMATS = ("ndjson", "csv")
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+CSV_COLUMNS = (
+    "book_id", "title", "published", "description", "publisher", "authors", "genres",
+    "status", "pages_read", "start_date", "end_date", "added_date", "status_changed_at", "history",
+)
+
+
+def _isoformat(value) -> Optional[str]:
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+def _author_name(author: models.Author) -> str:
+    return " ".join(filter(None, (author.last_name, author.first_name, author.middle_name)))
+
+
+def _books(db: Session, user_id: int):
+    # Книги библиотеки пользователя вместе со строкой user_book (текущий
+    # статус, максимум прочитанных страниц); авторы и жанры догружаются
+    # запросами IN на каждый пакет курсора
+    return crud.query_books(db).add_entity(models.UserBook).join(
+        models.UserBook, models.UserBook.book_id == models.Book.book_id
+    ).filter(
+        models.UserBook.user_id == user_id
+    ).order_by(models.Book.book_id).yield_per(settings.EXPORT_YIELD_PER)
+
+
+def _history(db: Session, user_id: int):
+    # Порядок как у текущего статуса в crud: последняя запись - текущая
+    return db.query(
+        models.Analytics.book_id,
+        models.Analytics.status_id,
+        models.Analytics.start_date,
+        models.Analytics.end_date,
+        models.Analytics.pages_read,
+        models.Analytics.created_date,
+    ).filter(
+        models.Analytics.user_id == user_id
+    ).order_by(
+        models.Analytics.book_id, models.Analytics.created_date, models.Analytics.analytics_id
+    ).yield_per(settings.EXPORT_YIELD_PER)
+
+
+def iter_records(db: Session, user_id: int) -> Iterator[dict]:
+    """Записи выгрузки по книгам в порядке book_id"""
+    if db.get_bind().dialect.name == "postgresql":
+        # Оба курсора должны видеть один снимок данных
+        db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+    status_names = {status.status_id: status.name for status in refcache.statuses.all(db)}
+
+    history = iter(_history(db, user_id))
+    pending = next(history, None)
+    for book, user_book in _books(db, user_id):
+        # Записи книг, удаленных между запусками курсоров, пропускаются
+        while pending is not None and pending.book_id < book.book_id:
+            pending = next(history, None)
+        entries = []
+        while pending is not None and pending.book_id == book.book_id:
+            entries.append({
+                "status": status_names.get(pending.status_id),
+                "start_date": _isoformat(pending.start_date),
+                "end_date": _isoformat(pending.end_date),
+                "pages_read": pending.pages_read,
+                "created_date": _isoformat(pending.created_date),
+            })
+            pending = next(history, None)
+        current = entries[-1] if entries else {}
+        yield {
+            "book_id": book.book_id,
+            "title": book.title,
+            "published": book.published,
+            "description": book.description,
+            "publisher": book.publisher.name if book.publisher else None,
+            "authors": [_author_name(author) for author in book.authors],
+            "genres": [genre.name for genre in book.genres],
+            "status": status_names.get(user_book.status_id),
+            # Как в списке книг: максимум по истории, а не значение последней записи
+            "pages_read": user_book.pages_read,
+            "start_date": current.get("start_date"),
+            "end_date": current.get("end_date"),
+            "added_date": _isoformat(book.added_date),
+            "status_changed_at": current.get("created_date"),
+            "history": entries,
+        }
+
+
+def _ndjson_lines(records: Iterator[dict]) -> Iterator[str]:
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+def _csv_lines(records: Iterator[dict]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def line(values) -> str:
+        writer.writerow(values)
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return text
+
+    yield line(CSV_COLUMNS)
+    for record in records:
+        record["authors"] = ";".join(record["authors"])
+        record["genres"] = ";".join(record["genres"])
+        record["history"] = json.dumps(record["history"], ensure_ascii=False)
+        yield line(record[column] for column in CSV_COLUMNS)
+
+
+def export_books(user_id: int, fmt: str) -> Iterator[bytes]:
+    """
+    Генератор тела ответа. Открывает собственную сессию: выгрузка идет уже
+    после возврата из обработчика, когда сессии зависимостей закрыты.
+    Строки склеиваются в куски по EXPORT_CHUNK_BYTES.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат выгрузки: {fmt}")
+    lines = _ndjson_lines if fmt == "ndjson" else _csv_lines
+    db = SessionLocal()
+    try:
+        chunk, size = [], 0
+        for text in lines(iter_records(db, user_id)):
+            data = text.encode("utf-8")
+            chunk.append(data)
+            size += len(data)
+            if size >= settings.EXPORT_CHUNK_BYTES:
+                yield b"".join(chunk)
+                chunk, size = [], 0
+        if chunk:
+            yield b"".join(chunk)
+    finally:
+        db.close()
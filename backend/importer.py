@@ -0,0 +1,148 @@
+import csv
+import json
+import time
+from typing import Iterator, List, Optional, TextIO, Tuple, Union
+
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+import crud
+import refcache
+import schemas
+from config import settings
+
+# Импорт книг в библиотеку пользователя из CSV или JSONL. Файл читается
+# построчно, строки проверяются схемой BookImportRow и копятся в пакеты по
+# IMPORT_BATCH_SIZE; каждый пакет - одна транзакция crud.import_books_batch.
+# Ошибочная строка пропускается с сообщением об ошибке, остальные строки
+# пакета импортируются. Если пакет не удалось записать целиком, он
+# повторяется построчно, чтобы найти строки, которые не принимает БД.
+#
+# Колонки CSV (первая строка - заголовок): title, published, description,
+# publisher, authors, genres, status, pages_read, start_date, end_date;
+# авторы и жанры перечисляются через ';'. В JSONL те же поля, authors и
+# genres - списки (автор - строка или объект last_name/first_name/middle_name).
+
+FORMATS = ("csv", "jsonl")
+PLANNED_STATUS = "В планах"
+
+
+def detect_format(filename: Optional[str]) -> Optional[str]:
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    return None
+
+
+def read_records(stream: TextIO, fmt: str) -> Iterator[Tuple[int, Union[dict, str]]]:
+    """(номер строки, запись) или (номер строки, текст ошибки разбора)"""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for line_no, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_no, f"Некорректный JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield line_no, "Ожидается объект JSON"
+            continue
+        yield line_no, record
+
+
+def _describe(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(map(str, item['loc'])) or 'строка'}: {item['msg']}" for item in error.errors()
+    )
+
+
+class _Import:
+    def __init__(self, db: Session, user_id: int, planned_status_id: int):
+        self.db = db
+        self.user_id = user_id
+        self.planned_status_id = planned_status_id
+        self.result = schemas.BookImportResult(
+            rows=0, imported=0, failed=0, authors_created=0, genres_created=0,
+            publishers_created=0, seconds=0.0,
+        )
+
+    def error(self, line: int, message: str):
+        self.result.failed += 1
+        if len(self.result.errors) < settings.IMPORT_MAX_ERRORS:
+            self.result.errors.append(schemas.BookImportError(line=line, error=message))
+
+    def _write(self, batch: List[tuple]):
+        counts = crud.import_books_batch(
+            self.db, self.user_id,
+            [row for _, row, _ in batch], [status_id for _, _, status_id in batch],
+            self.planned_status_id,
+        )
+        self.db.commit()
+        self.result.imported += len(batch)
+        for key, value in counts.items():
+            setattr(self.result, key, getattr(self.result, key) + value)
+
+    def flush(self, batch: List[tuple]):
+        if not batch:
+            return
+        # Любая ошибка записи, не только ошибка БД, откатывает пакет: строки
+        # повторяются по одной, и неудачная становится ошибкой строки
+        try:
+            self._write(batch)
+            return
+        except Exception as e:
+            self.db.rollback()
+            print(f"Пакет импорта ({len(batch)} строк) не записан, повтор по строкам: {e}")
+        for item in batch:
+            try:
+                self._write([item])
+            except Exception as e:
+                self.db.rollback()
+                self.error(item[0], f"Ошибка записи: {e.__class__.__name__}: {getattr(e, 'orig', e)}")
+
+
+def import_books(db: Session, user_id: int, stream: TextIO, fmt: str,
+                 batch_size: Optional[int] = None) -> schemas.BookImportResult:
+    """Импорт книг из потока; возвращает итоги и первые ошибки по строкам"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат импорта: {fmt}")
+    batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+    start = time.perf_counter()
+    # Записи импорта отмечаются как записи пользователя (см. replicas.py)
+    db.info["user_id"] = user_id
+
+    statuses = {status.name: status.status_id for status in refcache.statuses.all(db)}
+    if PLANNED_STATUS not in statuses:
+        raise ValueError(f"Статус '{PLANNED_STATUS}' не найден")
+    job = _Import(db, user_id, statuses[PLANNED_STATUS])
+
+    batch = []
+    for line, record in read_records(stream, fmt):
+        job.result.rows += 1
+        if isinstance(record, str):
+            job.error(line, record)
+            continue
+        try:
+            row = schemas.BookImportRow.model_validate(record)
+        except ValidationError as e:
+            job.error(line, _describe(e))
+            continue
+        status_id = statuses.get(row.status or PLANNED_STATUS)
+        if status_id is None:
+            job.error(line, f"Неизвестный статус: {row.status}")
+            continue
+        batch.append((line, row, status_id))
+        if len(batch) >= batch_size:
+            job.flush(batch)
+            batch = []
+    job.flush(batch)
+
+    job.result.seconds = round(time.perf_counter() - start, 3)
+    return job.result
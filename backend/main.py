@@ -1,16 +1,25 @@
 from fastapi import FastAPI
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from database import engine, SessionLocal
-from models import Base, BookStatus
+from database import async_engine, SessionLocal
+from models import BookStatus
 import routers
 from routers import analytics
-from middleware import LoggingMiddleware  
+from middleware import RequestMetricsMiddleware
+from profiling import PROFILE_HEADER, ProfilingMiddleware
+import metrics
+import migrate
+import report_jobs
+import passwords
+import replicas
+import cache_bus
+from pdf_generator import warm_up as warm_up_pdf
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    print("Создание таблиц...")
-    Base.metadata.create_all(bind=engine)
+    # Миграции применяются при развертывании: python manage.py migrate
+    migrate.check_schema()
     
     db = SessionLocal()
     try:
@@ -32,9 +41,19 @@ async def lifespan(app: FastAPI):
     finally:
         db.close()
     
+    # Шрифты и стили PDF загружаются один раз, а не в первом запросе отчета
+    warm_up_pdf()
+    passwords.start()
+    cache_bus.start()
+    
     yield
     
     print("Приложение завершает работу...")
+    cache_bus.shutdown()
+    report_jobs.shutdown()
+    passwords.shutdown()
+    await async_engine.dispose()
+    await replicas.dispose()
 
 app = FastAPI(
     title="Каталогизатор персональной книжной коллекции",
@@ -50,7 +69,9 @@ app = FastAPI(
     }
 )
 
-app.add_middleware(LoggingMiddleware)
+# ProfilingMiddleware - внутри RequestMetricsMiddleware: ему нужна статистика SQL запроса
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(RequestMetricsMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -58,6 +79,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Prev-Cursor", "Server-Timing", PROFILE_HEADER],
 )
 
 app.include_router(routers.auth.router, prefix="/api")
@@ -69,6 +91,7 @@ app.include_router(routers.books.router, prefix="/api")
 app.include_router(routers.reports.router, prefix="/api")
 app.include_router(routers.statuses.router, prefix="/api")
 app.include_router(analytics.router, prefix="/api")
+app.include_router(routers.profiles.router, prefix="/api")
 
 @app.get("/")
 def root():
@@ -83,6 +106,11 @@ def root():
 def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    """Метрики процесса в текстовом формате Prometheus"""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
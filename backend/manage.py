@@ -0,0 +1,89 @@
+import argparse
+
+from database import SessionLocal
+
+
+def rebuild_search(args):
+    import search
+
+    db = SessionLocal()
+    try:
+        count = search.rebuild_search_index(db, batch_size=args.batch_size)
+        print(f"Поисковый индекс перестроен, книг: {count}")
+    finally:
+        db.close()
+
+
+def rebuild_stats(args):
+    import crud
+
+    db = SessionLocal()
+    try:
+        count = crud.rebuild_user_reading_stats(db, user_id=args.user_id)
+        print(f"Свертка статистики пересчитана, строк: {count}")
+        count = crud.rebuild_user_books(db, user_id=args.user_id)
+        print(f"Библиотеки пользователей пересчитаны, книг: {count}")
+    finally:
+        db.close()
+
+
+def import_books(args):
+    import importer
+
+    fmt = args.format or importer.detect_format(args.path)
+    if fmt not in importer.FORMATS:
+        raise SystemExit("Укажите --format csv или jsonl")
+    db = SessionLocal()
+    try:
+        with open(args.path, encoding="utf-8-sig", newline="") as stream:
+            result = importer.import_books(db, args.user_id, stream, fmt, batch_size=args.batch_size)
+    finally:
+        db.close()
+    print(f"Строк: {result.rows}, импортировано: {result.imported}, с ошибками: {result.failed} "
+          f"за {result.seconds} с")
+    print(f"Создано авторов: {result.authors_created}, жанров: {result.genres_created}, "
+          f"издательств: {result.publishers_created}")
+    for error in result.errors:
+        print(f"  строка {error.line}: {error.error}")
+
+
+def migrate_schema(args):
+    import migrate
+
+    if args.downgrade:
+        migrate.downgrade(args.revision)
+    else:
+        migrate.upgrade(args.revision)
+    print(f"Текущая ревизия схемы: {migrate.current_revision()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Служебные команды каталога")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    parser_search = subparsers.add_parser("rebuild-search", help="Перестроить полнотекстовый индекс книг")
+    parser_search.add_argument("--batch-size", type=int, default=1000)
+    parser_search.set_defaults(func=rebuild_search)
+
+    parser_stats = subparsers.add_parser("rebuild-stats", help="Пересчитать свертку статистики и библиотеки пользователей (user_book)")
+    parser_stats.add_argument("--user-id", type=int, default=None, help="Только для одного пользователя")
+    parser_stats.set_defaults(func=rebuild_stats)
+
+    parser_import = subparsers.add_parser("import-books", help="Импортировать книги из CSV/JSONL")
+    parser_import.add_argument("path")
+    parser_import.add_argument("--user-id", type=int, required=True, help="Владелец импортируемых книг")
+    parser_import.add_argument("--format", choices=("csv", "jsonl"), default=None)
+    parser_import.add_argument("--batch-size", type=int, default=None)
+    parser_import.set_defaults(func=import_books)
+
+    parser_migrate = subparsers.add_parser("migrate", help="Применить миграции схемы БД")
+    parser_migrate.add_argument("--revision", default="head")
+    parser_migrate.add_argument("--downgrade", action="store_true", help="Откатить схему до --revision")
+    parser_migrate.set_defaults(func=migrate_schema)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
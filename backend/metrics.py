@@ -0,0 +1,170 @@
+import threading
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Минимальный реестр метрик в текстовом формате Prometheus (без внешних
+# зависимостей). Метрики хранятся в памяти процесса: при нескольких воркерах
+# каждый отдает свои значения, суммирование - на стороне Prometheus.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_metrics: List["_Metric"] = []
+_collectors: List[Callable[[], Iterable[str]]] = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _key(self, labels: Dict[str, object]) -> Tuple:
+        return tuple(labels[name] for name in self.labelnames)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Ключ -> [счетчики по корзинам (не накопительные), сумма, количество]
+        self._values: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            item = self._values.get(key)
+            if item is None:
+                item = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            item[0][index] += 1
+            item[1] += value
+            item[2] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, [list(counts), total, count]) for key, (counts, total, count) in self._values.items())
+        lines = self._header()
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def register_collector(collector: Callable[[], Iterable[str]]):
+    """Функция, возвращающая готовые строки метрик в момент запроса /metrics"""
+    _collectors.append(collector)
+
+
+# Пулы соединений SQLAlchemy: значения читаются при каждом запросе /metrics
+_pools: Dict[str, object] = {}
+
+
+def track_pool(name: str, engine):
+    _pools[name] = engine
+
+
+def _pool_lines() -> List[str]:
+    gauges = (
+        ("db_pool_size", "Размер пула соединений", "size"),
+        ("db_pool_checked_out", "Соединения, выданные из пула", "checkedout"),
+        ("db_pool_checked_in", "Свободные соединения в пуле", "checkedin"),
+        ("db_pool_overflow", "Соединения сверх размера пула", "overflow"),
+    )
+    lines = []
+    for name, documentation, method in gauges:
+        samples = []
+        for engine_name, engine in sorted(_pools.items()):
+            pool = getattr(engine, "sync_engine", engine).pool
+            # У пулов SQLite (NullPool, StaticPool) части показателей нет
+            if hasattr(pool, method):
+                samples.append(f'{name}{{engine="{_escape(engine_name)}"}} {getattr(pool, method)()}')
+        if samples:
+            lines += [f"# HELP {name} {documentation}", f"# TYPE {name} gauge"] + samples
+    return lines
+
+
+register_collector(_pool_lines)
+
+
+def render() -> str:
+    lines = []
+    for metric in _metrics:
+        lines += metric.render()
+    for collector in _collectors:
+        lines += collector()
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Метрики HTTP-запросов (заполняет middleware.RequestMetricsMiddleware)
+http_requests_total = Counter(
+    "http_requests_total", "Число обработанных запросов", ("method", "route", "status"))
+http_request_duration_seconds = Histogram(
+    "http_request_duration_seconds", "Время обработки запроса, включая передачу тела ответа", ("method", "route"))
+http_requests_in_progress = Gauge(
+    "http_requests_in_progress", "Запросы, обрабатываемые в данный момент", ("method",))
+http_request_db_queries = Histogram(
+    "http_request_db_queries", "Число SQL-запросов на HTTP-запрос", ("method", "route"),
+    buckets=(1, 2, 3, 5, 10, 20, 50, 100))
+db_query_budget_exceeded_total = Counter(
+    "db_query_budget_exceeded_total", "Запросы, превысившие бюджет SQL-запросов маршрута", ("method", "route"))
@@ -1,28 +1,95 @@
 import logging
+import random
 import time
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+
+from starlette.datastructures import MutableHeaders
+
+import metrics
+import sqlstats
+from config import settings
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        # Логируем входящий запрос
-        start_time = time.time()
-        
-        logger.info(f"→ {request.method} {request.url.path}")
-        if request.url.query:
-            logger.info(f"  Query params: {request.url.query}")
-        
-        # Пропускаем запрос дальше
+
+class RequestMetricsMiddleware:
+    """
+    Метрики и журнал HTTP-запросов. Чистый ASGI-middleware: ответ, в том числе
+    потоковый (StreamingResponse), передается без буферизации и без
+    дополнительной задачи на запрос, как у BaseHTTPMiddleware.
+
+    Время считается до отправки последней части тела ответа. Метка route -
+    шаблон пути маршрута (/api/books/{book_id}), чтобы число рядов метрик
+    не зависело от id в URL. В журнал попадает доля REQUEST_LOG_SAMPLE_RATE
+    запросов, а также все медленные (REQUEST_LOG_SLOW_SECONDS), ошибочные
+    и превысившие бюджет SQL-запросов (QUERY_BUDGETS). Число запросов и время
+    в БД передаются клиенту в заголовке Server-Timing.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        start = time.perf_counter()
+        stats = sqlstats.QueryStats()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if settings.QUERY_BUDGET_STRICT:
+                    sqlstats.check_budget(stats, method, _route(scope))
+                MutableHeaders(scope=message).append(
+                    "Server-Timing", stats.server_timing(time.perf_counter() - start)
+                )
+            await send(message)
+
+        metrics.http_requests_in_progress.inc(method=method)
+        token = sqlstats.activate(stats)
+        failed = False
         try:
-            response = await call_next(request)
-            process_time = time.time() - start_time
-            
-            logger.info(f"← {request.method} {request.url.path} - {response.status_code} - {process_time:.2f}s")
-            
-            return response
-        except Exception as e:
-            logger.error(f"Ошибка обработки запроса {request.method} {request.url.path}: {e}")
-            raise
\ No newline at end of file
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            status_code = 500
+            failed = True
+            raise
+        finally:
+            sqlstats.deactivate(token)
+            duration = time.perf_counter() - start
+            metrics.http_requests_in_progress.dec(method=method)
+            route = _route(scope)
+            metrics.http_requests_total.inc(method=method, route=route, status=status_code)
+            metrics.http_request_duration_seconds.observe(duration, method=method, route=route)
+            metrics.http_request_db_queries.observe(stats.count, method=method, route=route)
+            # Запросы к БД могли продолжиться при передаче потокового тела.
+            # Ответ уже отправлен, поэтому строгий режим здесь не прерывает
+            # запрос - превышение попадает в метрику и журнал
+            budget = None if failed else sqlstats.exceeded_budget(stats, method, route)
+            if budget is not None:
+                metrics.db_query_budget_exceeded_total.inc(method=method, route=route)
+            self._log(method, scope, status_code, duration, stats, budget)
+
+    @staticmethod
+    def _log(method, scope, status_code, duration, stats, budget):
+        if status_code >= 500:
+            level = logging.ERROR
+        elif budget is not None or duration >= settings.REQUEST_LOG_SLOW_SECONDS:
+            level = logging.WARNING
+        elif settings.REQUEST_LOG_SAMPLE_RATE > 0 and random.random() < settings.REQUEST_LOG_SAMPLE_RATE:
+            level = logging.INFO
+        else:
+            return
+        budget_note = f" (бюджет {budget} превышен)" if budget is not None else ""
+        logger.log(level, "%s %s - %s - %.3fs - %s%s",
+                   method, scope["path"], status_code, duration, stats.summary(), budget_note)
+
+
+def _route(scope) -> str:
+    # Маршрут FastAPI записывает в scope при сопоставлении пути
+    return getattr(scope.get("route"), "path", "unmatched")
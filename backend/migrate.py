@@ -0,0 +1,63 @@
+import os
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect
+
+from database import engine
+
+# Применение миграций схемы (alembic.ini, migrations/) из кода приложения
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
+
+# Ревизия, соответствующая схеме, которую создавал Base.metadata.create_all
+# до появления миграций
+BASELINE_REVISION = "0001"
+
+
+def alembic_config() -> Config:
+    config = Config(ALEMBIC_INI)
+    config.set_main_option("script_location", os.path.join(os.path.dirname(ALEMBIC_INI), "migrations"))
+    config.attributes["configure_logger"] = False
+    return config
+
+
+def current_revision():
+    with engine.connect() as connection:
+        return MigrationContext.configure(connection).get_current_revision()
+
+
+def head_revision():
+    return ScriptDirectory.from_config(alembic_config()).get_current_head()
+
+
+def check_schema():
+    """
+    Проверка при запуске приложения: миграции применяются отдельным шагом
+    развертывания (manage.py migrate), а не каждым воркером, поэтому
+    приложение со схемой не той ревизии не запускается
+    """
+    current, head = current_revision(), head_revision()
+    if current != head:
+        raise RuntimeError(
+            f"Схема БД на ревизии {current}, ожидается {head}: выполните python manage.py migrate"
+        )
+
+
+def upgrade(revision: str = "head"):
+    """
+    Обновление схемы до ревизии. База, созданная без миграций, сначала
+    помечается исходной ревизией - следующие миграции учитывают объекты,
+    которые в ней уже есть.
+    """
+    config = alembic_config()
+    if current_revision() is None and inspect(engine).has_table("book"):
+        print("Схема создана без миграций, отмечаем исходную ревизию")
+        command.stamp(config, BASELINE_REVISION)
+    command.upgrade(config, revision)
+
+
+def downgrade(revision: str):
+    command.downgrade(alembic_config(), revision)
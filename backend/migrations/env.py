@@ -0,0 +1,45 @@
+from logging.config import fileConfig
+
+from alembic import context
+
+from database import engine
+import models
+
+target_metadata = models.Base.metadata
+
+# При запуске из приложения (migrate.py) логирование уже настроено
+if context.config.config_file_name and context.config.attributes.get("configure_logger", True):
+    fileConfig(context.config.config_file_name, disable_existing_loggers=False)
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    # Таблицы полнотекстового индекса создаются search.create_search_index
+    if type_ == "table" and (name == "book_search" or name.startswith("book_fts")):
+        return False
+    return True
+
+
+def run_migrations_offline():
+    context.configure(url=str(engine.url), target_metadata=target_metadata,
+                      include_object=include_object, literal_binds=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    with engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
+            # ALTER TABLE в SQLite выполняется пересозданием таблицы
+            render_as_batch=connection.dialect.name == "sqlite"
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
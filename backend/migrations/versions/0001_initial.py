@@ -0,0 +1,101 @@
+"""Исходная схема каталога
+
+Revision ID: 0001
+Revises:
+Create Date: 2025-12-20
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "users",
+        sa.Column("user_id", sa.Integer, primary_key=True),
+        sa.Column("login", sa.String(255), nullable=False, unique=True),
+        sa.Column("password_hash", sa.String(255), nullable=False),
+        sa.Column("name", sa.String(255)),
+        sa.Column("is_admin", sa.Boolean),
+    )
+    op.create_table(
+        "author",
+        sa.Column("author_id", sa.Integer, primary_key=True),
+        sa.Column("last_name", sa.String(255)),
+        sa.Column("first_name", sa.String(255)),
+        sa.Column("middle_name", sa.String(255)),
+    )
+    op.create_table(
+        "publisher",
+        sa.Column("publisher_id", sa.Integer, primary_key=True),
+        sa.Column("name", sa.String(255)),
+    )
+    op.create_table(
+        "genre",
+        sa.Column("genre_id", sa.Integer, primary_key=True),
+        sa.Column("name", sa.String(255)),
+    )
+    op.create_table(
+        "book_status",
+        sa.Column("status_id", sa.Integer, primary_key=True),
+        sa.Column("name", sa.String(255)),
+    )
+    op.create_table(
+        "book",
+        sa.Column("book_id", sa.Integer, primary_key=True),
+        sa.Column("publisher_id", sa.Integer, sa.ForeignKey("publisher.publisher_id")),
+        sa.Column("title", sa.String(255)),
+        sa.Column("published", sa.Integer),
+        sa.Column("description", sa.Text),
+        sa.Column("added_date", sa.TIMESTAMP),
+    )
+    op.create_table(
+        "genre_book",
+        sa.Column("genre_id", sa.Integer, sa.ForeignKey("genre.genre_id"), primary_key=True),
+        sa.Column("book_id", sa.Integer, sa.ForeignKey("book.book_id"), primary_key=True),
+    )
+    op.create_table(
+        "author_book",
+        sa.Column("author_id", sa.Integer, sa.ForeignKey("author.author_id"), primary_key=True),
+        sa.Column("book_id", sa.Integer, sa.ForeignKey("book.book_id"), primary_key=True),
+    )
+    op.create_table(
+        "review",
+        sa.Column("review_id", sa.Integer, primary_key=True),
+        sa.Column("book_id", sa.Integer, sa.ForeignKey("book.book_id")),
+        sa.Column("user_id", sa.Integer, sa.ForeignKey("users.user_id")),
+        sa.Column("review_text", sa.Text),
+        sa.Column("rating", sa.Integer),
+    )
+    op.create_table(
+        "analytics",
+        sa.Column("analytics_id", sa.Integer, primary_key=True),
+        sa.Column("book_id", sa.Integer, sa.ForeignKey("book.book_id")),
+        sa.Column("user_id", sa.Integer, sa.ForeignKey("users.user_id")),
+        sa.Column("status_id", sa.Integer, sa.ForeignKey("book_status.status_id")),
+        sa.Column("start_date", sa.Date),
+        sa.Column("end_date", sa.Date),
+        sa.Column("pages_read", sa.Integer),
+        sa.Column("created_date", sa.TIMESTAMP, server_default=sa.func.now()),
+    )
+    op.create_table(
+        "report",
+        sa.Column("report_id", sa.Integer, primary_key=True),
+        sa.Column("user_id", sa.Integer, sa.ForeignKey("users.user_id")),
+        sa.Column("report_type", sa.String(255)),
+        sa.Column("period_from", sa.Date),
+        sa.Column("period_to", sa.Date),
+        sa.Column("generated_at", sa.TIMESTAMP, server_default=sa.func.now()),
+        sa.Column("file_path", sa.String(255)),
+    )
+
+
+def downgrade():
+    for table in ("report", "analytics", "review", "author_book", "genre_book", "book",
+                  "book_status", "genre", "publisher", "author", "users"):
+        op.drop_table(table)
@@ -0,0 +1,78 @@
+"""Фоновые отчеты, свертка статистики чтения, полнотекстовый индекс
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2025-12-20
+
+Базы, созданные ранее через Base.metadata.create_all, уже могут содержать
+эти объекты, поэтому миграция проверяет их наличие.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+REPORT_COLUMNS = (
+    sa.Column("status", sa.String(32), nullable=False, server_default="done"),
+    sa.Column("error", sa.Text),
+    sa.Column("finished_at", sa.TIMESTAMP),
+    sa.Column("items_total", sa.Integer),
+    sa.Column("items_done", sa.Integer),
+)
+
+# DDL индекса на момент ревизии; search.create_search_index может меняться,
+# а миграция должна создавать ту же схему, что и при ее написании
+SEARCH_DDL = {
+    "postgresql": (
+        "CREATE TABLE IF NOT EXISTS book_search ("
+        " book_id INTEGER PRIMARY KEY REFERENCES book(book_id) ON DELETE CASCADE,"
+        " document tsvector NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS ix_book_search_document "
+        "ON book_search USING GIN (document)",
+    ),
+    "sqlite": (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS book_fts USING fts5("
+        "title, authors, description, tokenize='unicode61 remove_diacritics 2')",
+    ),
+}
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    existing = {column["name"] for column in inspector.get_columns("report")}
+    missing = [column for column in REPORT_COLUMNS if column.name not in existing]
+    if missing:
+        with op.batch_alter_table("report") as batch:
+            for column in missing:
+                batch.add_column(column)
+
+    if not inspector.has_table("user_reading_stats"):
+        op.create_table(
+            "user_reading_stats",
+            sa.Column("user_id", sa.Integer, sa.ForeignKey("users.user_id"), primary_key=True),
+            sa.Column("status_id", sa.Integer, sa.ForeignKey("book_status.status_id"), primary_key=True),
+            sa.Column("books", sa.Integer, nullable=False, server_default="0"),
+            sa.Column("pages", sa.Integer, nullable=False, server_default="0"),
+            sa.Column("days_total", sa.Integer, nullable=False, server_default="0"),
+            sa.Column("days_count", sa.Integer, nullable=False, server_default="0"),
+        )
+
+    for statement in SEARCH_DDL.get(op.get_bind().dialect.name, ()):
+        op.execute(statement)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        op.execute("DROP TABLE IF EXISTS book_search")
+    elif bind.dialect.name == "sqlite":
+        op.execute("DROP TABLE IF EXISTS book_fts")
+    op.drop_table("user_reading_stats")
+    with op.batch_alter_table("report") as batch:
+        for column in reversed(REPORT_COLUMNS):
+            batch.drop_column(column.name)
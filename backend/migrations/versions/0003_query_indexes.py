@@ -0,0 +1,49 @@
+"""Вторичные индексы под запросы crud.py
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2025-12-20
+
+- book (колонка сортировки, book_id): keyset-пагинация списка книг и
+  выборка книг за период по added_date;
+- analytics (user_id, book_id, created_date): книги пользователя, текущий
+  статус книги (последняя запись), проверка владения книгой;
+- analytics (status_id): проверка использования статуса перед удалением;
+- author_book/genre_book (book_id): selectinload авторов и жанров страницы
+  книг - первичный ключ начинается с author_id/genre_id и не подходит;
+- report (user_id, generated_at): список отчетов и подсчет активных задач.
+
+users.login отдельный индекс не нужен: его создает ограничение UNIQUE.
+
+На PostgreSQL индексы строятся CONCURRENTLY, без блокировки записи.
+"""
+from alembic import op
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ("ix_book_added_date_book_id", "book", ["added_date", "book_id"]),
+    ("ix_book_title_book_id", "book", ["title", "book_id"]),
+    ("ix_book_published_book_id", "book", ["published", "book_id"]),
+    ("ix_analytics_user_book_created", "analytics", ["user_id", "book_id", "created_date"]),
+    ("ix_analytics_status_id", "analytics", ["status_id"]),
+    ("ix_author_book_book_id", "author_book", ["book_id"]),
+    ("ix_genre_book_book_id", "genre_book", ["book_id"]),
+    ("ix_report_user_generated", "report", ["user_id", "generated_at"]),
+)
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
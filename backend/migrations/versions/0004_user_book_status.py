@@ -0,0 +1,54 @@
+"""Проекция текущего статуса книги пользователя
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-01-15
+
+user_book_status хранит по строке на (пользователь, книга): статус из
+последней записи analytics, максимум прочитанных страниц и дату изменения.
+Дальше ее поддерживает crud в тех же транзакциях, что и analytics; при
+создании таблица заполняется по существующей истории.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+BACKFILL = """
+INSERT INTO user_book_status (user_id, book_id, status_id, pages_read, changed_at)
+SELECT user_id, book_id, status_id, pages_read, created_date
+FROM (
+    SELECT user_id, book_id, status_id, created_date,
+           MAX(pages_read) OVER (PARTITION BY user_id, book_id) AS pages_read,
+           ROW_NUMBER() OVER (
+               PARTITION BY user_id, book_id ORDER BY created_date DESC, analytics_id DESC
+           ) AS rn
+    FROM analytics
+    WHERE user_id IS NOT NULL AND book_id IS NOT NULL AND status_id IS NOT NULL
+) latest
+WHERE rn = 1
+"""
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table("user_book_status"):
+        return
+    op.create_table(
+        "user_book_status",
+        sa.Column("user_id", sa.Integer, sa.ForeignKey("users.user_id"), primary_key=True),
+        sa.Column("book_id", sa.Integer, sa.ForeignKey("book.book_id"), primary_key=True),
+        sa.Column("status_id", sa.Integer, sa.ForeignKey("book_status.status_id"), nullable=False),
+        sa.Column("pages_read", sa.Integer),
+        sa.Column("changed_at", sa.TIMESTAMP, nullable=False, server_default=sa.func.now()),
+    )
+    op.create_index("ix_user_book_status_user_changed", "user_book_status", ["user_id", "changed_at", "book_id"])
+    op.execute(BACKFILL)
+
+
+def downgrade():
+    op.drop_index("ix_user_book_status_user_changed", table_name="user_book_status")
+    op.drop_table("user_book_status")
@@ -0,0 +1,55 @@
+"""Библиотека пользователя user_book вместо соединения с analytics
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-01-22
+
+Проекция текущего статуса user_book_status становится таблицей членства
+user_book: (user_id, book_id) - первичный ключ, к статусу добавляется дата
+добавления книги в библиотеку (первая запись analytics). Проверки владения
+и списки книг больше не соединяют book со всей историей analytics.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+BACKFILL_ADDED_AT = """
+UPDATE user_book SET added_at = (
+    SELECT MIN(a.created_date) FROM analytics a
+    WHERE a.user_id = user_book.user_id AND a.book_id = user_book.book_id
+)
+"""
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if inspector.has_table("user_book"):
+        # Таблица уже есть (схема создана по моделям): проекция из 0004 не нужна
+        if inspector.has_table("user_book_status"):
+            op.drop_index("ix_user_book_status_user_changed", table_name="user_book_status", if_exists=True)
+            op.drop_table("user_book_status")
+        return
+    op.drop_index("ix_user_book_status_user_changed", table_name="user_book_status")
+    op.rename_table("user_book_status", "user_book")
+    with op.batch_alter_table("user_book") as batch:
+        batch.add_column(sa.Column("added_at", sa.TIMESTAMP))
+    op.execute(BACKFILL_ADDED_AT)
+    op.execute("UPDATE user_book SET added_at = changed_at WHERE added_at IS NULL")
+    with op.batch_alter_table("user_book") as batch:
+        batch.alter_column("added_at", existing_type=sa.TIMESTAMP, nullable=False, server_default=sa.func.now())
+    op.create_index("ix_user_book_user_changed", "user_book", ["user_id", "changed_at", "book_id"])
+    op.create_index("ix_user_book_user_added", "user_book", ["user_id", "added_at", "book_id"])
+
+
+def downgrade():
+    op.drop_index("ix_user_book_user_added", table_name="user_book")
+    op.drop_index("ix_user_book_user_changed", table_name="user_book")
+    with op.batch_alter_table("user_book") as batch:
+        batch.drop_column("added_at")
+    op.rename_table("user_book", "user_book_status")
+    op.create_index("ix_user_book_status_user_changed", "user_book_status", ["user_id", "changed_at", "book_id"])
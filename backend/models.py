@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Text, Date, TIMESTAMP, Table
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Text, Date, TIMESTAMP, Table, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -7,16 +7,21 @@ genre_book = Table(
     'genre_book',                  
     Base.metadata,                   
     Column('genre_id', Integer, ForeignKey('genre.genre_id'), primary_key=True),
-    Column('book_id', Integer, ForeignKey('book.book_id'), primary_key=True)
+    Column('book_id', Integer, ForeignKey('book.book_id'), primary_key=True),
+    Index('ix_genre_book_book_id', 'book_id')
 )
 
 author_book = Table(
     'author_book',                    
     Base.metadata,                   
     Column('author_id', Integer, ForeignKey('author.author_id'), primary_key=True),
-    Column('book_id', Integer, ForeignKey('book.book_id'), primary_key=True)
+    Column('book_id', Integer, ForeignKey('book.book_id'), primary_key=True),
+    Index('ix_author_book_book_id', 'book_id')
 )
 
+# Индексы создаются миграциями (migrations/versions), здесь они объявлены,
+# чтобы схема моделей совпадала со схемой БД
+
 class User(Base):
     __tablename__ = "users"
     user_id = Column(Integer, primary_key=True)
@@ -74,6 +79,13 @@ class Book(Base):
     reviews = relationship("Review", back_populates="book")
     analytics = relationship("Analytics", back_populates="book")
 
+    # Индексы под keyset-пагинацию: (колонка сортировки, book_id)
+    __table_args__ = (
+        Index("ix_book_added_date_book_id", "added_date", "book_id"),
+        Index("ix_book_title_book_id", "title", "book_id"),
+        Index("ix_book_published_book_id", "published", "book_id"),
+    )
+
 class Review(Base):
     __tablename__ = "review"
     review_id = Column(Integer, primary_key=True)
@@ -100,6 +112,48 @@ class Analytics(Base):
     user = relationship("User", back_populates="analytics")
     status = relationship("BookStatus", back_populates="analytics")
 
+    # Книги пользователя и последнее изменение статуса по каждой книге;
+    # проверка использования статуса
+    __table_args__ = (
+        Index("ix_analytics_user_book_created", "user_id", "book_id", "created_date"),
+        Index("ix_analytics_status_id", "status_id"),
+    )
+
+class UserReadingStats(Base):
+    """Свертка статистики чтения: книги пользователя по текущему статусу"""
+    __tablename__ = "user_reading_stats"
+    user_id = Column(Integer, ForeignKey("users.user_id"), primary_key=True)
+    status_id = Column(Integer, ForeignKey("book_status.status_id"), primary_key=True)
+    books = Column(Integer, nullable=False, default=0)
+    pages = Column(Integer, nullable=False, default=0)
+    days_total = Column(Integer, nullable=False, default=0)
+    days_count = Column(Integer, nullable=False, default=0)
+
+    status = relationship("BookStatus")
+
+class UserBook(Base):
+    """
+    Книга в библиотеке пользователя: членство и проекция текущего статуса
+    (последняя запись analytics). Проверки владения и списки книг идут по
+    первичному ключу (user_id, book_id), а не по всей истории analytics.
+    """
+    __tablename__ = "user_book"
+    user_id = Column(Integer, ForeignKey("users.user_id"), primary_key=True)
+    book_id = Column(Integer, ForeignKey("book.book_id"), primary_key=True)
+    added_at = Column(TIMESTAMP, nullable=False, server_default=func.now())
+    status_id = Column(Integer, ForeignKey("book_status.status_id"), nullable=False)
+    # Максимум прочитанных страниц по истории книги, как в свертке статистики
+    pages_read = Column(Integer)
+    changed_at = Column(TIMESTAMP, nullable=False, server_default=func.now())
+
+    status = relationship("BookStatus")
+
+    # Списки книг пользователя по дате изменения статуса и по дате добавления
+    __table_args__ = (
+        Index("ix_user_book_user_changed", "user_id", "changed_at", "book_id"),
+        Index("ix_user_book_user_added", "user_id", "added_at", "book_id"),
+    )
+
 class Report(Base):
     __tablename__ = "report"
     report_id = Column(Integer, primary_key=True)
@@ -109,5 +163,17 @@ class Report(Base):
     period_to = Column(Date)
     generated_at = Column(TIMESTAMP, server_default=func.now())
     file_path = Column(String(255))
-
-    user = relationship("User", back_populates="reports")
\ No newline at end of file
+    # Состояние фоновой генерации: queued, done, failed
+    status = Column(String(32), nullable=False, default="done", server_default="done")
+    error = Column(Text)
+    finished_at = Column(TIMESTAMP)
+    # Прогресс пакетных выгрузок
+    items_total = Column(Integer)
+    items_done = Column(Integer)
+
+    user = relationship("User", back_populates="reports")
+
+    # Отчеты пользователя, новые первыми
+    __table_args__ = (
+        Index("ix_report_user_generated", "user_id", "generated_at"),
+    )
\ No newline at end of file
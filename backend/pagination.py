@@ -0,0 +1,59 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any
+
+# Курсоры keyset-пагинации: непрозрачная для клиента строка base64(JSON)
+# с ключом сортировки, значением сортируемой колонки и book_id последней
+# (или первой) строки страницы.
+
+BOOK_SORT_KEYS = ("added_date", "title", "published", "status_changed")
+DATETIME_SORT_KEYS = ("added_date", "status_changed")
+# Колонки сортировки, допускающие NULL
+NULLABLE_SORT_KEYS = ("title", "published")
+# Тип значения сортируемой колонки в курсоре (даты - строкой ISO 8601)
+SORT_VALUE_TYPES = {"added_date": str, "title": str, "published": int, "status_changed": str}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(sort: str, order: str, direction: str, value: Any, book_id: int) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = {"s": sort, "o": order, "d": direction, "v": value, "id": book_id}
+    raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _is_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _valid_value(sort: str, value) -> bool:
+    if value is None:
+        return sort in NULLABLE_SORT_KEYS
+    if SORT_VALUE_TYPES[sort] is int:
+        return _is_int(value)
+    return isinstance(value, SORT_VALUE_TYPES[sort])
+
+
+def decode_cursor(cursor: str, sort: str, order: str) -> dict:
+    """Разбор курсора; курсор должен соответствовать текущей сортировке"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if payload["s"] != sort or payload["o"] != order or payload["d"] not in ("next", "prev"):
+            raise InvalidCursor("Курсор не соответствует параметрам сортировки")
+        # Значение попадает в SQL как параметр сравнения: значение другого типа
+        # дало бы ошибку БД или сравнение строк вместо чисел
+        if not _valid_value(sort, payload["v"]) or not _is_int(payload["id"]):
+            raise InvalidCursor("Некорректное значение курсора")
+        if sort in DATETIME_SORT_KEYS:
+            payload["v"] = datetime.fromisoformat(payload["v"])
+    except InvalidCursor:
+        raise
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor("Некорректный курсор") from e
+    return payload
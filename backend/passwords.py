@@ -0,0 +1,76 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+from config import settings
+
+# Хэширование паролей. sha256_crypt с тысячами раундов занимает CPU на
+# десятки миллисекунд, поэтому в асинхронных обработчиках оно выполняется в
+# отдельном ограниченном пуле процессов и не занимает потоки запросов.
+#
+# Хэши с числом раундов, отличным от PASSWORD_HASH_ROUNDS, считаются
+# устаревшими и пересчитываются при следующем успешном входе.
+
+pwd_context = CryptContext(
+    schemes=["sha256_crypt"],
+    deprecated="auto",
+    sha256_crypt__default_rounds=settings.PASSWORD_HASH_ROUNDS,
+    sha256_crypt__min_rounds=settings.PASSWORD_HASH_ROUNDS,
+    sha256_crypt__max_rounds=settings.PASSWORD_HASH_ROUNDS
+)
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+
+def _ping() -> bool:
+    return True
+
+
+def start():
+    """Запуск процессов пула заранее, чтобы первый вход не ждал их старта"""
+    executor = get_executor()
+    for future in [executor.submit(_ping) for _ in range(settings.PASSWORD_HASH_WORKERS)]:
+        future.result()
+
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def hash_password_sync(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_and_update_sync(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Проверка пароля; второй элемент - новый хэш, если параметры хэширования изменились"""
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+async def hash_password(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), hash_password_sync, password)
+
+
+async def verify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), verify_and_update_sync, password, hashed_password)
@@ -1,128 +1,230 @@
 import os
+import shutil
+import subprocess
+import threading
+from io import BytesIO
 from pathlib import Path
 from datetime import date, datetime
-from typing import List, Dict, Any
+from typing import Iterable, Iterator, List, Dict, Any, Optional, Tuple
 
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 import platform
 
-class PDFGenerator:
-    def __init__(self, output_dir: str = "reports"):
-        self.output_dir = Path(output_dir)
-        self.output_dir.mkdir(exist_ok=True)
-        
-        # Регистрируем русские шрифты
-        self.register_fonts()
-        
+REGULAR_FONT = 'DejaVuSans'
+# Размер сегмента таблицы отчета о пополнении коллекции (строк без заголовка)
+COLLECTION_CHUNK_ROWS = 100
+BOLD_FONT = 'DejaVuSans-Bold'
+
+# Кандидаты (обычный, жирный) с поддержкой кириллицы
+_FONT_CANDIDATES = {
+    "Windows": [
+        ("C:/Windows/Fonts/dejavusans.ttf", "C:/Windows/Fonts/dejavusans-bold.ttf"),
+        ("C:/Windows/Fonts/arial.ttf", "C:/Windows/Fonts/arialbd.ttf"),
+        ("C:/Windows/Fonts/times.ttf", "C:/Windows/Fonts/timesbd.ttf"),
+    ],
+    "Linux": [
+        ("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"),
+        ("/usr/share/fonts/dejavu/DejaVuSans.ttf", "/usr/share/fonts/dejavu/DejaVuSans-Bold.ttf"),
+        ("/usr/share/fonts/dejavu-sans-fonts/DejaVuSans.ttf", "/usr/share/fonts/dejavu-sans-fonts/DejaVuSans-Bold.ttf"),
+        ("/usr/share/fonts/TTF/DejaVuSans.ttf", "/usr/share/fonts/TTF/DejaVuSans-Bold.ttf"),
+        ("/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf", "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf"),
+        ("/usr/share/fonts/liberation-sans/LiberationSans-Regular.ttf", "/usr/share/fonts/liberation-sans/LiberationSans-Bold.ttf"),
+    ],
+    "Darwin": [
+        ("/Library/Fonts/Arial.ttf", "/Library/Fonts/Arial Bold.ttf"),
+        ("/System/Library/Fonts/Supplemental/Arial.ttf", "/System/Library/Fonts/Supplemental/Arial Bold.ttf"),
+    ],
+}
+
+
+def _fontconfig_lookup(pattern: str) -> Optional[str]:
+    """Поиск файла шрифта через fontconfig (если установлен)"""
+    if shutil.which("fc-match") is None:
+        return None
+    try:
+        result = subprocess.run(
+            ["fc-match", "-f", "%{file}", pattern],
+            capture_output=True, text=True, timeout=5
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    path = result.stdout.strip()
+    if path.lower().endswith(".ttf") and Path(path).exists():
+        return path
+    return None
+
+
+def find_font_files() -> Tuple[Optional[str], Optional[str]]:
+    """
+    Пути к обычному и жирному TTF-шрифтам с кириллицей.
+    Порядок: переменные окружения PDF_FONT_REGULAR/PDF_FONT_BOLD,
+    известные пути для ОС, fontconfig.
+    """
+    regular = os.environ.get("PDF_FONT_REGULAR")
+    bold = os.environ.get("PDF_FONT_BOLD")
+    if regular and Path(regular).exists():
+        return regular, bold if bold and Path(bold).exists() else regular
+
+    for regular_path, bold_path in _FONT_CANDIDATES.get(platform.system(), []):
+        if Path(regular_path).exists():
+            return regular_path, bold_path if Path(bold_path).exists() else regular_path
+
+    regular = _fontconfig_lookup("DejaVu Sans") or _fontconfig_lookup("sans-serif:lang=ru")
+    if regular:
+        bold = _fontconfig_lookup("DejaVu Sans:style=Bold") or regular
+        return regular, bold
+    return None, None
+
+
+class RenderContext:
+    """
+    Все, что не зависит от содержимого отчета: зарегистрированные шрифты,
+    стили абзацев и таблиц. Создается один раз на процесс.
+    """
+
+    def __init__(self):
+        self.regular_font, self.bold_font = self._register_fonts()
+
         self.styles = getSampleStyleSheet()
-        
+
         # Создаем стили с русскими шрифтами
         self.title_style = ParagraphStyle(
             'CustomTitle',
             parent=self.styles['Heading1'],
-            fontName='DejaVuSans-Bold',  # Используем зарегистрированный шрифт
+            fontName=self.bold_font,
             fontSize=16,
             spaceAfter=12,
             alignment=1  # center
         )
-        
+
         self.subtitle_style = ParagraphStyle(
             'CustomSubtitle',
             parent=self.styles['Heading2'],
-            fontName='DejaVuSans-Bold',
+            fontName=self.bold_font,
             fontSize=12,
             spaceAfter=8
         )
-        
+
         self.normal_style = ParagraphStyle(
             'CustomNormal',
             parent=self.styles['Normal'],
-            fontName='DejaVuSans',
+            fontName=self.regular_font,
             fontSize=10
         )
-        
+
         self.footer_style = ParagraphStyle(
             'Footer',
             parent=self.normal_style,
             fontSize=8,
             textColor=colors.grey
         )
-    
-    def register_fonts(self):
+
+        self.book_card_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+            ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
+            ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, -1), self.regular_font),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ])
+
+        self.collection_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4A90E2')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), self.bold_font),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#F5F5F5')),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#DDDDDD')),
+            ('ALIGN', (0, 1), (0, -1), 'CENTER'),
+            ('ALIGN', (3, 1), (3, -1), 'CENTER'),
+            ('FONTNAME', (0, 1), (-1, -1), self.regular_font),
+        ])
+
+    def _register_fonts(self) -> Tuple[str, str]:
         """Регистрируем шрифты с поддержкой кириллицы"""
-        try:
-            # Пытаемся найти DejaVu Sans (хорошая поддержка Unicode)
-            font_paths = []
-            
-            # Проверяем операционную систему
-            system = platform.system()
-            
-            if system == "Windows":
-                font_paths = [
-                    "C:/Windows/Fonts/dejavusans.ttf",
-                    "C:/Windows/Fonts/arial.ttf",
-                    "C:/Windows/Fonts/times.ttf",
-                ]
-            elif system == "Linux":
-                font_paths = [
-                    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
-                    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
-                    "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
-                    "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf",
-                ]
-            elif system == "Darwin":  # macOS
-                font_paths = [
-                    "/Library/Fonts/Arial.ttf",
-                    "/System/Library/Fonts/Supplemental/Arial.ttf",
-                ]
-            
-            # Регистрируем обычный и жирный шрифты
-            regular_found = False
-            bold_found = False
-            
-            for font_path in font_paths:
-                path = Path(font_path)
-                if path.exists():
-                    try:
-                        if "dejavu" in font_path.lower() or "liberation" in font_path.lower():
-                            # Для DejaVu/Liberation
-                            if "bold" in font_path.lower():
-                                pdfmetrics.registerFont(TTFont('DejaVuSans-Bold', str(path)))
-                                bold_found = True
-                                print(f"Зарегистрирован жирный шрифт: {path}")
-                            else:
-                                pdfmetrics.registerFont(TTFont('DejaVuSans', str(path)))
-                                regular_found = True
-                                print(f"Зарегистрирован обычный шрифт: {path}")
-                        elif "arial" in font_path.lower():
-                            # Для Arial
-                            pdfmetrics.registerFont(TTFont('DejaVuSans', str(path)))
-                            pdfmetrics.registerFont(TTFont('DejaVuSans-Bold', str(path)))
-                            regular_found = bold_found = True
-                            print(f"Зарегистрирован Arial: {path}")
-                            break
-                    except Exception as e:
-                        print(f"Ошибка загрузки шрифта {path}: {e}")
-                        continue
-            
-            # Если не нашли нужные шрифты, используем стандартные (но могут быть квадратики)
-            if not regular_found or not bold_found:
-                print("Предупреждение: Не найдены русские шрифты. Могут появиться квадратики.")
-                # Используем стандартные шрифты как fallback
-                pdfmetrics.registerFont(TTFont('DejaVuSans', 'Helvetica'))
-                pdfmetrics.registerFont(TTFont('DejaVuSans-Bold', 'Helvetica-Bold'))
-                
-        except Exception as e:
-            print(f"Критическая ошибка загрузки шрифтов: {e}")
-            # Аварийный fallback
-            pdfmetrics.registerFont(TTFont('DejaVuSans', 'Helvetica'))
-            pdfmetrics.registerFont(TTFont('DejaVuSans-Bold', 'Helvetica-Bold'))
+        regular_path, bold_path = find_font_files()
+        if regular_path:
+            try:
+                pdfmetrics.registerFont(TTFont(REGULAR_FONT, regular_path))
+                pdfmetrics.registerFont(TTFont(BOLD_FONT, bold_path))
+                print(f"Зарегистрированы шрифты: {regular_path}, {bold_path}")
+                return REGULAR_FONT, BOLD_FONT
+            except Exception as e:
+                print(f"Ошибка загрузки шрифтов {regular_path}: {e}")
+
+        # Встроенные шрифты PDF не требуют файлов, но не содержат кириллицы
+        print("Предупреждение: Не найдены русские шрифты. Могут появиться квадратики.")
+        return 'Helvetica', 'Helvetica-Bold'
+
+
+_context: Optional[RenderContext] = None
+_context_lock = threading.Lock()
+
+
+def get_render_context() -> RenderContext:
+    """Общий для процесса контекст рендеринга (создается при первом обращении)"""
+    global _context
+    if _context is None:
+        with _context_lock:
+            if _context is None:
+                _context = RenderContext()
+    return _context
+
+
+def warm_up():
+    """Предварительная инициализация контекста при старте процесса"""
+    get_render_context()
+
+
+class LazyStory(list):
+    """
+    Список flowables, который дочитывается из генератора по мере того, как
+    platypus забирает элементы из начала. В памяти держится только несколько
+    ближайших элементов, а не весь отчет.
+    """
+
+    def __init__(self, source: Iterable, low_water: int = 8):
+        super().__init__()
+        self._source = iter(source)
+        self._low_water = low_water
+
+    def _fill(self):
+        while self._source is not None and list.__len__(self) < self._low_water:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                self._source = None
+
+    def __len__(self):
+        self._fill()
+        return list.__len__(self)
+
+    def __getitem__(self, index):
+        self._fill()
+        return list.__getitem__(self, index)
+
+
+class PDFGenerator:
+    def __init__(self, output_dir: str = "reports", context: Optional[RenderContext] = None):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(exist_ok=True)
+        
+        self.context = context or get_render_context()
+        self.styles = self.context.styles
+        self.title_style = self.context.title_style
+        self.subtitle_style = self.context.subtitle_style
+        self.normal_style = self.context.normal_style
+        self.footer_style = self.context.footer_style
     
     def safe_text(self, text: str) -> str:
         """Безопасное преобразование текста"""
@@ -131,13 +233,37 @@ class PDFGenerator:
         # Убираем проблемные символы и обеспечиваем правильную кодировку
         return str(text).encode('utf-8', 'ignore').decode('utf-8')
     
-    def generate_book_card(self, book_data: Dict[str, Any]) -> str:
+    def generate_book_card(self, book_data: Dict[str, Any], filename: Optional[str] = None) -> str:
         """Генерация отчета по карточке книги"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"book_card_{book_data['book_id']}_{timestamp}.pdf"
+        if filename is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = f"book_card_{book_data['book_id']}_{timestamp}.pdf"
         filepath = self.output_dir / filename
         
         doc = SimpleDocTemplate(str(filepath), pagesize=A4)
+        doc.build(self._book_card_story(book_data))
+        return str(filepath)
+    
+    def render_book_card(self, book_data: Dict[str, Any]) -> bytes:
+        """Карточка книги в памяти (для пакетной выгрузки)"""
+        buffer = BytesIO()
+        SimpleDocTemplate(buffer, pagesize=A4).build(self._book_card_story(book_data))
+        return buffer.getvalue()
+    
+    def generate_book_cards(self, books: Iterable[Dict[str, Any]], filename: str) -> str:
+        """Несколько карточек книг в одном PDF, каждая с новой страницы"""
+        filepath = self.output_dir / filename
+        
+        def story():
+            for i, book_data in enumerate(books):
+                if i:
+                    yield PageBreak()
+                yield from self._book_card_story(book_data)
+        
+        SimpleDocTemplate(str(filepath), pagesize=A4).build(LazyStory(story()))
+        return str(filepath)
+    
+    def _book_card_story(self, book_data: Dict[str, Any]) -> list:
         story = []
         
         # Заголовок
@@ -158,16 +284,7 @@ class PDFGenerator:
             data.append(["Текущий статус:", self.safe_text(book_data['current_status'])])
         
         table = Table(data, colWidths=[2*inch, 4*inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-            ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'DejaVuSans'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ]))
+        table.setStyle(self.context.book_card_table_style)
         
         story.append(table)
         story.append(Spacer(1, 12))
@@ -185,84 +302,87 @@ class PDFGenerator:
             self.footer_style
         ))
         
-        doc.build(story)
-        return str(filepath)
+        return story
     
-    def generate_collection_report(self, books: List[Dict[str, Any]],
-                                  start_date: date, end_date: date) -> str:
-        """Генерация отчета по пополнению коллекции"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"collection_report_{start_date}_{end_date}_{timestamp}.pdf"
+    def generate_collection_report(self, books: Iterable[Dict[str, Any]],
+                                  start_date: date, end_date: date,
+                                  filename: Optional[str] = None,
+                                  chunk_size: int = COLLECTION_CHUNK_ROWS) -> str:
+        """
+        Генерация отчета по пополнению коллекции.
+        books может быть генератором: таблица строится сегментами по chunk_size
+        строк с повторяющимся заголовком, поэтому в памяти одновременно
+        находится только текущий сегмент.
+        """
+        if filename is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = f"collection_report_{start_date}_{end_date}_{timestamp}.pdf"
         filepath = self.output_dir / filename
         
         doc = SimpleDocTemplate(str(filepath), pagesize=A4)
-        story = []
-        
+        doc.build(LazyStory(self._collection_story(books, start_date, end_date, chunk_size)))
+        return str(filepath)
+    
+    def _collection_story(self, books: Iterable[Dict[str, Any]], start_date: date,
+                          end_date: date, chunk_size: int) -> Iterator:
         # Заголовок
-        story.append(Paragraph(
+        yield Paragraph(
             self.safe_text("Отчет по пополнению книжной коллекции"), 
             self.title_style
-        ))
-        story.append(Spacer(1, 10))
+        )
+        yield Spacer(1, 10)
         
         # Период - ИСПРАВЛЕНО: используем переданные даты без изменений
-        story.append(Paragraph(
+        yield Paragraph(
             self.safe_text(f"Период: с {start_date.strftime('%d.%m.%Y')} по {end_date.strftime('%d.%m.%Y')}"),
             self.subtitle_style
-        ))
-        story.append(Spacer(1, 20))
+        )
+        yield Spacer(1, 20)
         
         # Таблица с книгами
-        if books:
-            # Заголовки таблицы
-            headers = ["№", "Название книги", "Автор", "Год издания", "Жанр", "Дата добавления"]
-            table_data = [[self.safe_text(h) for h in headers]]
-            
-            for i, book in enumerate(books, 1):
-                table_data.append([
-                    str(i),
-                    self.safe_text(book['title']),
-                    self.safe_text(", ".join(book['authors'])),
-                    self.safe_text(str(book['published'])),
-                    self.safe_text(", ".join(book['genres'])),
-                    self.safe_text(book['added_date'].strftime("%d.%m.%Y"))
-                ])
-            
-            table = Table(table_data, colWidths=[0.5*inch, 2*inch, 1.5*inch, 1*inch, 1.5*inch, 1.5*inch])
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4A90E2')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'DejaVuSans-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 9),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#F5F5F5')),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#DDDDDD')),
-                ('ALIGN', (0, 1), (0, -1), 'CENTER'),
-                ('ALIGN', (3, 1), (3, -1), 'CENTER'),
-                ('FONTNAME', (0, 1), (-1, -1), 'DejaVuSans'),
-            ]))
-            
-            story.append(table)
-            story.append(Spacer(1, 20))
+        headers = ["№", "Название книги", "Автор", "Год издания", "Жанр", "Дата добавления"]
+        header_row = [self.safe_text(h) for h in headers]
+        col_widths = [0.5*inch, 2*inch, 1.5*inch, 1*inch, 1.5*inch, 1.5*inch]
+        
+        total = 0
+        rows = []
+        for total, book in enumerate(books, 1):
+            rows.append([
+                str(total),
+                self.safe_text(book['title']),
+                self.safe_text(", ".join(book['authors'])),
+                self.safe_text(str(book['published'])),
+                self.safe_text(", ".join(book['genres'])),
+                self.safe_text(book['added_date'].strftime("%d.%m.%Y"))
+            ])
+            if len(rows) == chunk_size:
+                yield self._collection_segment(header_row, rows, col_widths)
+                rows = []
+        if rows:
+            yield self._collection_segment(header_row, rows, col_widths)
+        
+        if total:
+            yield Spacer(1, 20)
             
             # Итоги
-            story.append(Paragraph(
-                self.safe_text(f"Всего добавлено книг: {len(books)}"),
+            yield Paragraph(
+                self.safe_text(f"Всего добавлено книг: {total}"),
                 self.subtitle_style
-            ))
+            )
         else:
-            story.append(Paragraph(
+            yield Paragraph(
                 self.safe_text("За указанный период книги не добавлялись."), 
                 self.normal_style
-            ))
+            )
         
         # Дата генерации отчета
-        story.append(Spacer(1, 20))
-        story.append(Paragraph(
+        yield Spacer(1, 20)
+        yield Paragraph(
             self.safe_text(f"Отчет сгенерирован: {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}"),
             self.footer_style
-        ))
-        
-        doc.build(story)
-        return str(filepath)
+        )
+    
+    def _collection_segment(self, header_row: List[str], rows: List[List[str]], col_widths: List[float]) -> Table:
+        table = Table([header_row] + rows, colWidths=col_widths, repeatRows=1)
+        table.setStyle(self.context.collection_table_style)
+        return table
@@ -0,0 +1,204 @@
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import anyio
+from fastapi import HTTPException
+from starlette.datastructures import Headers, MutableHeaders
+
+import sqlstats
+from auth import get_current_admin_user, get_current_user
+from config import settings
+from database import AsyncSessionLocal
+
+# Профилирование отдельного запроса по требованию администратора: заголовок
+# "X-Profile: 1" или параметр ?profile=1. Запрос выполняется под выборочным
+# профилировщиком (поток раз в PROFILE_SAMPLE_INTERVAL_MS снимает стеки
+# потоков приложения), результат сохраняется в каталоге PROFILES_DIR в
+# формате folded stacks (flamegraph.pl, speedscope) вместе со сводкой:
+# общее время, время в БД по sqlstats и остаток - время Python.
+# id профиля возвращается в заголовке X-Profile-Id, файлы отдает
+# routers/profiles.py. Без флага middleware только проверяет заголовки.
+#
+# Стеки снимаются с потока цикла событий и рабочих потоков AnyIO (синхронные
+# обработчики): запросы, параллельно идущие в них, тоже попадут в профиль.
+
+PROFILES_DIR = os.path.abspath("profiles")
+PROFILE_HEADER = "X-Profile-Id"
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+_save_lock = threading.Lock()
+
+
+def profiles_dir() -> Path:
+    path = Path(PROFILES_DIR)
+    path.mkdir(exist_ok=True)
+    return path
+
+
+def _is_app_file(filename: str) -> bool:
+    return filename.startswith(_APP_DIR) and "site-packages" not in filename and "venv" not in filename
+
+
+def _folded_stack(frame) -> Optional[str]:
+    names, in_app = [], False
+    while frame is not None:
+        code = frame.f_code
+        in_app = in_app or _is_app_file(code.co_filename)
+        names.append(f"{os.path.splitext(os.path.basename(code.co_filename))[0]}:{code.co_name}")
+        frame = frame.f_back
+    # Потоки без кода приложения (ожидание в пулах, цикл событий) не интересны
+    return ";".join(reversed(names)) if in_app else None
+
+
+class Sampler:
+    """Создается в потоке цикла событий - его стеки и снимаются"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.loop_thread_id = threading.get_ident()
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                name = names.get(thread_id, "")
+                if thread_id != self.loop_thread_id and not name.startswith("AnyIO worker thread"):
+                    continue
+                stack = _folded_stack(frame)
+                if stack:
+                    self.samples[f"{name};{stack}"] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def _prune(directory: Path):
+    with _save_lock:
+        summaries = sorted(directory.glob("*.json"), key=lambda path: path.stat().st_mtime, reverse=True)
+        for path in summaries[settings.PROFILE_KEEP:]:
+            path.unlink(missing_ok=True)
+            path.with_suffix(".folded").unlink(missing_ok=True)
+
+
+def _store(profile_id: str, summary: dict, samples: Dict[str, int]):
+    directory = profiles_dir()
+    folded = "".join(f"{stack} {count}\n" for stack, count in Counter(samples).most_common())
+    (directory / f"{profile_id}.folded").write_text(folded, encoding="utf-8")
+    (directory / f"{profile_id}.json").write_text(
+        json.dumps({"profile_id": profile_id, **summary}, ensure_ascii=False), encoding="utf-8"
+    )
+    _prune(directory)
+
+
+def list_profiles(limit: int = 50) -> List[dict]:
+    summaries = sorted(profiles_dir().glob("*.json"), key=lambda path: path.stat().st_mtime, reverse=True)
+    return [json.loads(path.read_text(encoding="utf-8")) for path in summaries[:limit]]
+
+
+def _path(profile_id: str, suffix: str) -> Optional[Path]:
+    # id - 16 шестнадцатеричных символов; все остальное не является путем к профилю
+    if len(profile_id) != 16 or any(ch not in "0123456789abcdef" for ch in profile_id):
+        return None
+    path = profiles_dir() / f"{profile_id}{suffix}"
+    return path if path.exists() else None
+
+
+def load_summary(profile_id: str) -> Optional[dict]:
+    path = _path(profile_id, ".json")
+    return json.loads(path.read_text(encoding="utf-8")) if path else None
+
+
+def folded_path(profile_id: str) -> Optional[Path]:
+    return _path(profile_id, ".folded")
+
+
+def _requested(scope) -> bool:
+    if b"profile=1" in scope.get("query_string", b"").split(b"&"):
+        return True
+    return any(name == b"x-profile" and value not in (b"", b"0", b"false") for name, value in scope["headers"])
+
+
+async def _is_admin(scope) -> bool:
+    authorization = Headers(scope=scope).get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    # Проверка прав не входит в профилируемый запрос: ее SQL не учитывается
+    # в sqlstats запроса, его Server-Timing и бюджете
+    stats_token = sqlstats.activate(None)
+    try:
+        async with AsyncSessionLocal() as db:
+            try:
+                await get_current_admin_user(await get_current_user(db=db, token=token))
+            except HTTPException:
+                return False
+    finally:
+        sqlstats.deactivate(stats_token)
+    return True
+
+
+class ProfilingMiddleware:
+    """Профилирование запроса по флагу; должен стоять внутри RequestMetricsMiddleware"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _requested(scope) or not await _is_admin(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex[:16]
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message).append(PROFILE_HEADER, profile_id)
+            await send(message)
+
+        stats = sqlstats.current()
+        queries_before = stats.count if stats else 0
+        db_before = stats.duration if stats else 0.0
+        sampler = Sampler(settings.PROFILE_SAMPLE_INTERVAL_MS / 1000)
+        started_at = datetime.now()
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            # Ожидание потока профилировщика и запись файлов - вне цикла событий;
+            # профиль сохраняется и при отмене запроса (разрыв соединения)
+            with anyio.CancelScope(shield=True):
+                await anyio.to_thread.run_sync(sampler.stop)
+                db_time = (stats.duration - db_before) if stats else 0.0
+                summary = {
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status_code,
+                    "started_at": started_at.isoformat(),
+                    "duration_ms": round(duration * 1000, 2),
+                    "db_ms": round(db_time * 1000, 2),
+                    "python_ms": round(max(duration - db_time, 0) * 1000, 2),
+                    "queries": (stats.count - queries_before) if stats else 0,
+                    "samples": sum(sampler.samples.values()),
+                    "interval_ms": settings.PROFILE_SAMPLE_INTERVAL_MS,
+                }
+                await anyio.to_thread.run_sync(_store, profile_id, summary, sampler.samples)
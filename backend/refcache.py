@@ -0,0 +1,168 @@
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+import cache_bus
+import models
+import schemas
+from config import settings
+from database import AsyncSessionLocal, SessionLocal
+
+# Кэш справочников (статусы, жанры, издательства, авторы) в памяти процесса.
+# Записи хранятся как pydantic-схемы ответов и не привязаны к сессии БД.
+# Изменение справочника в crud публикует событие cache_bus, по которому
+# каждый процесс вызывает invalidate(): версия кэша увеличивается, записи
+# сбрасываются, а загрузка, начатая до сброса, свой результат уже не
+# сохранит. REFERENCE_CACHE_TTL_SECONDS - страховка на случай потери события.
+
+
+class RefCache:
+    def __init__(self, name: str, model, id_column, schema):
+        self.name = name
+        self.model = model
+        self.id_column = id_column
+        self.schema = schema
+        self._lock = threading.Lock()
+        self._items: Dict[int, object] = {}
+        self._complete = False
+        self._version = 0
+        self._expires_at = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def invalidate(self):
+        with self._lock:
+            self._version += 1
+            self._items = {}
+            self._complete = False
+
+    def _check_expiry(self):
+        if time.monotonic() >= self._expires_at:
+            self._version += 1
+            self._items = {}
+            self._complete = False
+            self._expires_at = time.monotonic() + settings.REFERENCE_CACHE_TTL_SECONDS
+
+    def _peek(self, ids: Iterable[int]):
+        with self._lock:
+            self._check_expiry()
+            found, missing = {}, []
+            for item_id in dict.fromkeys(ids):
+                item = self._items.get(item_id)
+                if item is not None:
+                    found[item_id] = item
+                elif not self._complete:
+                    missing.append(item_id)
+            self.hits += len(found)
+            self.misses += len(missing)
+            return found, missing, self._version
+
+    def _load(self, db: Session, ids: Optional[List[int]], version: int) -> Dict[int, object]:
+        if db.info.get("replica"):
+            # Данные отстающей реплики остались бы в кэше до следующего сброса,
+            # в том числе сразу после события cache_bus от другого процесса.
+            # Сюда попадают синхронные функции crud, вызванные на сессии реплики
+            with SessionLocal() as primary:
+                return self._load(primary, ids, version)
+        query = db.query(self.model)
+        if ids is not None:
+            query = query.filter(self.id_column.in_(ids))
+        loaded = {
+            getattr(row, self.id_column.key): self.schema.model_validate(row)
+            for row in query.all()
+        }
+        with self._lock:
+            # Справочник изменился во время загрузки - результат не кэшируем
+            if self._version == version:
+                self._items.update(loaded)
+                if ids is None:
+                    self._complete = True
+        return loaded
+
+    def _snapshot(self):
+        with self._lock:
+            self._check_expiry()
+            if self._complete:
+                self.hits += 1
+                return list(self._items.values()), self._version
+            self.misses += 1
+            return None, self._version
+
+    def get_many(self, db: Session, ids: Iterable[int]) -> Dict[int, object]:
+        """Записи по id одним запросом для отсутствующих в кэше; неизвестные id пропускаются"""
+        found, missing, version = self._peek(ids)
+        if missing:
+            found.update(self._load(db, missing, version))
+        return found
+
+    def get(self, db: Session, item_id: int):
+        return self.get_many(db, [item_id]).get(item_id)
+
+    def all(self, db: Session) -> list:
+        items, version = self._snapshot()
+        if items is None:
+            items = list(self._load(db, None, version).values())
+        return sorted(items, key=lambda item: getattr(item, self.id_column.key))
+
+    def by_name(self, db: Session, name: str):
+        return next((item for item in self.all(db) if item.name == name), None)
+
+    # Варианты для AsyncSession: БД затрагивается только при промахе
+    async def _aload(self, db: AsyncSession, ids: Optional[List[int]], version: int) -> Dict[int, object]:
+        if db.info.get("replica"):
+            # Как в _load, но без блокирующего запроса в цикле событий
+            async with AsyncSessionLocal() as primary:
+                return await primary.run_sync(self._load, ids, version)
+        return await db.run_sync(self._load, ids, version)
+
+    async def aget_many(self, db: AsyncSession, ids: Iterable[int]) -> Dict[int, object]:
+        found, missing, version = self._peek(ids)
+        if missing:
+            found.update(await self._aload(db, missing, version))
+        return found
+
+    async def aget(self, db: AsyncSession, item_id: int):
+        return (await self.aget_many(db, [item_id])).get(item_id)
+
+    async def aall(self, db: AsyncSession) -> list:
+        items, version = self._snapshot()
+        if items is None:
+            items = list((await self._aload(db, None, version)).values())
+        return sorted(items, key=lambda item: getattr(item, self.id_column.key))
+
+    async def aby_name(self, db: AsyncSession, name: str):
+        return next((item for item in await self.aall(db) if item.name == name), None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "version": self._version,
+                "size": len(self._items),
+                "complete": self._complete,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+statuses = RefCache("statuses", models.BookStatus, models.BookStatus.status_id, schemas.BookStatusResponse)
+genres = RefCache("genres", models.Genre, models.Genre.genre_id, schemas.GenreResponse)
+publishers = RefCache("publishers", models.Publisher, models.Publisher.publisher_id, schemas.PublisherResponse)
+authors = RefCache("authors", models.Author, models.Author.author_id, schemas.AuthorResponse)
+
+ALL = (statuses, genres, publishers, authors)
+
+for _cache in ALL:
+    cache_bus.subscribe(_cache.name, lambda key, cache=_cache: cache.invalidate())
+
+
+def stats() -> dict:
+    return {cache.name: cache.stats() for cache in ALL}
@@ -0,0 +1,110 @@
+import itertools
+import time
+from typing import List, Optional
+
+from fastapi import Depends
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+
+import cache_bus
+from auth import CurrentUser, get_current_user
+from cache import TTLCache
+from config import settings
+import metrics
+from database import AsyncSessionLocal, async_database_url, engine_options
+
+# Маршрутизация чтения на реплики. Безопасные GET-обработчики получают
+# сессию через get_read_db: она открывается на одной из реплик (по кругу),
+# кроме случаев, когда пользователь недавно записывал данные - тогда чтение
+# идет в основную БД, чтобы он увидел свои изменения, пока реплика догоняет.
+#
+# Отметки о записи хранятся в памяти процесса и рассылаются остальным
+# воркерам через cache_bus; REPLICA_STICKINESS_SECONDS должен покрывать
+# типичное отставание реплик.
+# Для локальной проверки репликой может быть вторая база PostgreSQL или
+# копия файла SQLite.
+
+_recent_writers = TTLCache(settings.AUTH_CACHE_MAX_ENTRIES, settings.REPLICA_STICKINESS_SECONDS)
+
+
+class _Replica:
+    def __init__(self, url: str):
+        async_url = async_database_url(url)
+        self.engine = create_async_engine(async_url, **engine_options(async_url))
+        self.sessionmaker = async_sessionmaker(
+            self.engine, autoflush=False, expire_on_commit=False, info={"replica": True}
+        )
+        self.unavailable_until = 0.0
+
+
+_replicas: List[_Replica] = [_Replica(url) for url in settings.replica_urls]
+_round_robin = itertools.cycle(range(len(_replicas))) if _replicas else None
+
+for _index, _replica in enumerate(_replicas):
+    metrics.track_pool(f"replica{_index}", _replica.engine)
+
+
+@event.listens_for(Session, "before_commit")
+def _remember_writer(session: Session):
+    # user_id записывает в сессию get_current_user; без реплик отметки не нужны
+    user_id = session.info.get("user_id")
+    if user_id is not None and _replicas:
+        cache_bus.publish(session, "writer", user_id)
+
+
+def mark_write(user_id: Optional[int]):
+    # None - сброс шины: пропущенные записи неизвестны, отметки не ставим
+    if user_id is not None:
+        _recent_writers.set(user_id, True)
+
+
+cache_bus.subscribe("writer", mark_write)
+
+
+def is_sticky(user_id: int) -> bool:
+    return _recent_writers.get(user_id) is not None
+
+
+def _next_replica():
+    now = time.monotonic()
+    for _ in range(len(_replicas)):
+        replica = _replicas[next(_round_robin)]
+        if replica.unavailable_until <= now:
+            return replica
+    return None
+
+
+async def _open_replica_session():
+    """Сессия на доступной реплике или None"""
+    while True:
+        replica = _next_replica()
+        if replica is None:
+            return None
+        session = replica.sessionmaker()
+        try:
+            await session.connection()
+            return session
+        except (DBAPIError, OSError) as e:
+            await session.close()
+            print(f"Реплика {replica.engine.url.render_as_string()} недоступна: {e}")
+            replica.unavailable_until = time.monotonic() + settings.REPLICA_RETRY_SECONDS
+
+
+async def get_read_db(current_user: CurrentUser = Depends(get_current_user)):
+    """Сессия только для чтения: реплика, если нет причин читать из основной БД"""
+    session = None
+    if _replicas and not is_sticky(current_user.user_id):
+        session = await _open_replica_session()
+    if session is None:
+        session = AsyncSessionLocal()
+    try:
+        yield session
+    finally:
+        await session.close()
+
+
+async def dispose():
+    for replica in _replicas:
+        await replica.engine.dispose()
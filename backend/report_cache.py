@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, List, Optional
+
+from sqlalchemy.orm import Session
+
+import models
+from config import settings
+
+# Кэш PDF-отчетов с адресацией по содержимому: имя файла содержит хэш
+# входных данных отчета, поэтому повторный запрос с теми же данными
+# отдается готовым файлом без рендеринга. Старые и лишние файлы удаляются
+# по ограничениям возраста и суммарного размера каталога.
+
+REPORTS_DIR = os.path.abspath("reports")
+
+_evict_lock = threading.Lock()
+_last_eviction = 0.0
+
+
+def reports_dir() -> Path:
+    path = Path(REPORTS_DIR)
+    path.mkdir(exist_ok=True)
+    return path
+
+
+def cache_key(report_type: str, data: Any) -> str:
+    """Хэш входных данных отчета (dict/list с датами сериализуются в ISO)"""
+    raw = json.dumps(
+        {"type": report_type, "data": data},
+        sort_keys=True, ensure_ascii=False, default=_json_default
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _json_default(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+CACHE_EXTENSIONS = (".pdf", ".zip")
+
+
+def cache_filename(report_type: str, key: str, extension: str = "pdf") -> str:
+    return f"{report_type}_{key[:32]}.{extension}"
+
+
+def lookup(report_type: str, key: str, extension: str = "pdf") -> Optional[str]:
+    """Путь к готовому отчету или None; попадание продлевает жизнь файла"""
+    path = reports_dir() / cache_filename(report_type, key, extension)
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    return str(path)
+
+
+def store(report_type: str, key: str, render: Callable[[str], str], extension: str = "pdf") -> str:
+    """
+    Рендеринг отчета во временный файл и атомарное переименование в
+    кэшированное имя. render(filename) должен вернуть путь к созданному файлу.
+    """
+    path = reports_dir() / cache_filename(report_type, key, extension)
+    tmp_name = f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+    rendered = render(tmp_name)
+    os.replace(rendered, path)
+    return str(path)
+
+
+def evict(db: Session, force: bool = False) -> List[str]:
+    """
+    Удаление файлов старше REPORT_CACHE_MAX_AGE_DAYS и самых давно
+    использованных файлов сверх REPORT_CACHE_MAX_MB. Записи report,
+    ссылающиеся на удаленные файлы, теряют file_path.
+    """
+    global _last_eviction
+    with _evict_lock:
+        now = time.time()
+        if not force and now - _last_eviction < settings.REPORT_CACHE_EVICT_INTERVAL_SECONDS:
+            return []
+        _last_eviction = now
+
+        files = []
+        for entry in os.scandir(reports_dir()):
+            if not entry.is_file() or not entry.name.endswith(CACHE_EXTENSIONS):
+                continue
+            stat = entry.stat()
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+        files.sort()
+
+        max_age = settings.REPORT_CACHE_MAX_AGE_DAYS * 86400
+        max_bytes = settings.REPORT_CACHE_MAX_MB * 1024 * 1024
+        total = sum(size for _, size, _ in files)
+        removed = []
+        for mtime, size, path in files:
+            if now - mtime <= max_age and total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed.append(path)
+
+    if removed:
+        db.query(models.Report).filter(
+            models.Report.file_path.in_(removed)
+        ).update({models.Report.file_path: None}, synchronize_session=False)
+        db.commit()
+        print(f"Удалено отчетов из кэша: {len(removed)}")
+    return removed
+
+
+def is_available(report: models.Report) -> bool:
+    return bool(report.file_path) and os.path.exists(report.file_path)
@@ -0,0 +1,331 @@
+import multiprocessing
+import threading
+import zipfile
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from sqlalchemy.orm import Session
+
+import crud
+import report_cache
+from config import settings
+from database import SessionLocal
+
+# Фоновая генерация PDF-отчетов: запрос создает запись report со статусом
+# queued и сразу возвращает ее id, рендеринг выполняется в пуле процессов,
+# по завершении запись переводится в done/failed.
+
+
+class JobLimitExceeded(Exception):
+    pass
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+_running: Dict[int, Any] = {}
+
+_worker_generator = None
+
+
+def _init_worker(output_dir: str):
+    """Инициализация процесса пула: генератор создается один раз на процесс"""
+    global _worker_generator
+    from pdf_generator import PDFGenerator
+    _worker_generator = PDFGenerator(output_dir=output_dir)
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.REPORT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                # Пути к файлам не должны зависеть от рабочего каталога процесса пула
+                initargs=(report_cache.REPORTS_DIR,)
+            )
+        return _executor
+
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def collection_rows(db: Session, user_id: int, start_date, end_date) -> Iterator[Dict[str, Any]]:
+    """Строки отчета о пополнении коллекции, читаемые из БД потоком"""
+    for book in crud.iter_books_added_in_period_by_user(db, user_id, start_date, end_date):
+        yield {
+            "title": book.title,
+            "authors": [" ".join(filter(None, (a.last_name, a.first_name))) for a in book.authors],
+            "published": book.published,
+            "genres": [g.name for g in book.genres],
+            "added_date": book.added_date
+        }
+
+
+def collection_cache_key(db: Session, payload: Dict[str, Any]) -> str:
+    """
+    Ключ кэша отчета о пополнении: параметры периода и отпечаток набора книг
+    (число, последняя дата добавления, наибольший id) - один агрегирующий
+    запрос, книги при постановке в очередь не читаются. Изменение названий,
+    авторов или жанров уже добавленных книг ключ не меняет: такой отчет
+    обновится после истечения срока кэша (REPORT_CACHE_MAX_AGE_DAYS).
+    """
+    fingerprint = crud.books_added_in_period_fingerprint(
+        db, payload["user_id"], payload["start_date"], payload["end_date"])
+    return report_cache.cache_key("collection_growth", {**payload, "books": fingerprint})
+
+
+def render_report(report_type: str, payload: Dict[str, Any], key: str,
+                  generator=None, db: Optional[Session] = None) -> str:
+    """
+    Рендеринг отчета в кэш отчетов, возвращает путь к PDF.
+    Для collection_growth книги читаются из БД потоком (своя сессия, если
+    db не передана - например, в процессе пула).
+    """
+    if generator is None:
+        generator = _worker_generator
+    if generator is None:
+        from pdf_generator import PDFGenerator
+        generator = PDFGenerator(output_dir=report_cache.REPORTS_DIR)
+
+    if report_type == "book_card":
+        return report_cache.store(
+            report_type, key,
+            lambda filename: generator.generate_book_card(payload["book"], filename=filename)
+        )
+    if report_type != "collection_growth":
+        raise ValueError(f"Unknown report type: {report_type}")
+
+    session = db or SessionLocal()
+    try:
+        return report_cache.store(
+            report_type, key,
+            lambda filename: generator.generate_collection_report(
+                books=collection_rows(session, payload["user_id"], payload["start_date"], payload["end_date"]),
+                start_date=payload["start_date"],
+                end_date=payload["end_date"],
+                filename=filename
+            )
+        )
+    finally:
+        if db is None:
+            session.close()
+
+
+def _generator():
+    if _worker_generator is not None:
+        return _worker_generator
+    from pdf_generator import PDFGenerator
+    return PDFGenerator(output_dir=report_cache.REPORTS_DIR)
+
+
+def render_book_card_bytes(book_data: Dict[str, Any]) -> bytes:
+    """Карточка одной книги в памяти (выполняется в процессе пула)"""
+    return _generator().render_book_card(book_data)
+
+
+def book_card_filename(book_data: Dict[str, Any]) -> str:
+    return f"book_card_{book_data['book_id']}.pdf"
+
+
+class _ZipStream:
+    """Буфер без seek для zipfile: записанные данные забираются кусками"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _rendered_cards(books: List[Dict[str, Any]]) -> Iterator[bytes]:
+    # map сохраняет порядок книг, карточки рендерятся параллельно
+    return get_executor().map(render_book_card_bytes, books, chunksize=4)
+
+
+def _write_cards_zip(archive: zipfile.ZipFile, books: List[Dict[str, Any]],
+                     on_progress: Optional[Callable[[int], None]] = None) -> Iterator[None]:
+    # PDF уже сжат, поэтому архив без сжатия
+    for done, (book_data, pdf) in enumerate(zip(books, _rendered_cards(books)), start=1):
+        archive.writestr(book_card_filename(book_data), pdf, compress_type=zipfile.ZIP_STORED)
+        if on_progress:
+            on_progress(done)
+        yield
+
+
+def iter_book_cards_zip(books: List[Dict[str, Any]]) -> Iterator[bytes]:
+    """ZIP с карточками книг, отдаваемый потоком по мере рендеринга"""
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, mode="w") as archive:
+        for _ in _write_cards_zip(archive, books):
+            chunk = stream.drain()
+            if chunk:
+                yield chunk
+    yield stream.drain()
+
+
+def book_cards_cache_key(books: List[Dict[str, Any]], fmt: str) -> str:
+    return report_cache.cache_key(f"book_cards_{fmt}", {"books": books})
+
+
+def render_book_cards(books: List[Dict[str, Any]], fmt: str, key: str,
+                      on_progress: Optional[Callable[[int], None]] = None) -> str:
+    """
+    Пакетная выгрузка карточек в кэш отчетов, возвращает путь к файлу.
+    zip - карточки рендерятся параллельно в пуле процессов;
+    pdf - один документ со всеми карточками.
+    """
+    if fmt == "pdf":
+        def render(filename):
+            future = get_executor().submit(_render_book_cards_pdf, books, filename)
+            path = future.result()
+            if on_progress:
+                on_progress(len(books))
+            return path
+        return report_cache.store("book_cards", key, render)
+
+    def render_zip(filename):
+        path = str(report_cache.reports_dir() / filename)
+        with zipfile.ZipFile(path, mode="w") as archive:
+            for _ in _write_cards_zip(archive, books, on_progress):
+                pass
+        return path
+    return report_cache.store("book_cards", key, render_zip, extension="zip")
+
+
+def _render_book_cards_pdf(books: List[Dict[str, Any]], filename: str) -> str:
+    return _generator().generate_book_cards(books, filename=filename)
+
+
+def _stale_before() -> datetime:
+    return datetime.now() - timedelta(seconds=settings.REPORT_JOB_TIMEOUT_SECONDS)
+
+
+def submit(db: Session, user_id: int, report_type: str, payload: Dict[str, Any],
+           period_from=None, period_to=None):
+    """Постановка отчета в очередь с ограничением числа активных задач пользователя"""
+    _check_job_limit(db, user_id)
+
+    if report_type == "collection_growth":
+        key = collection_cache_key(db, payload)
+    else:
+        key = report_cache.cache_key(report_type, payload)
+    cached_path = report_cache.lookup(report_type, key)
+    report = crud.create_report_record(
+        db=db,
+        user_id=user_id,
+        report_type=report_type,
+        period_from=period_from,
+        period_to=period_to,
+        file_path=cached_path,
+        status="done" if cached_path else "queued"
+    )
+    if cached_path:
+        return report
+
+    future = get_executor().submit(render_report, report_type, payload, key)
+    _running[report.report_id] = future
+    future.add_done_callback(partial(_finish, report.report_id))
+    return report
+
+
+def _check_job_limit(db: Session, user_id: int):
+    active = crud.count_active_report_jobs(db, user_id, newer_than=_stale_before())
+    if active >= settings.REPORT_JOBS_PER_USER:
+        raise JobLimitExceeded(f"Не более {settings.REPORT_JOBS_PER_USER} отчетов одновременно")
+
+
+def submit_book_cards(db: Session, user_id: int, books: List[Dict[str, Any]], fmt: str):
+    """
+    Пакетная выгрузка карточек в фоне. Рендеринг распределяется по пулу
+    процессов, координирующий поток обновляет items_done записи report.
+    """
+    _check_job_limit(db, user_id)
+    key = book_cards_cache_key(books, fmt)
+    cached_path = report_cache.lookup("book_cards", key, "zip" if fmt == "zip" else "pdf")
+    report = crud.create_report_record(
+        db=db,
+        user_id=user_id,
+        report_type="book_cards",
+        period_from=None,
+        period_to=None,
+        file_path=cached_path,
+        status="done" if cached_path else "queued",
+        items_total=len(books),
+        items_done=len(books) if cached_path else 0
+    )
+    if cached_path:
+        return report
+
+    future = Future()
+    future.set_running_or_notify_cancel()
+    _running[report.report_id] = future
+    future.add_done_callback(partial(_finish, report.report_id))
+    threading.Thread(
+        target=_run_book_cards,
+        args=(report.report_id, books, fmt, key, future),
+        daemon=True
+    ).start()
+    return report
+
+
+def _run_book_cards(report_id: int, books: List[Dict[str, Any]], fmt: str, key: str, future: Future):
+    db = SessionLocal()
+    step = max(1, len(books) // 20)
+
+    def on_progress(done: int):
+        if done % step == 0 or done == len(books):
+            crud.update_report_progress(db, report_id, done)
+
+    try:
+        future.set_result(render_book_cards(books, fmt, key, on_progress=on_progress))
+    except Exception as e:
+        future.set_exception(e)
+    finally:
+        db.close()
+
+
+def _finish(report_id: int, future):
+    _running.pop(report_id, None)
+    db = SessionLocal()
+    try:
+        try:
+            file_path = future.result()
+        except Exception as e:
+            print(f"Ошибка генерации отчета {report_id}: {e}")
+            crud.finish_report_job(db, report_id, error=str(e) or e.__class__.__name__)
+        else:
+            crud.finish_report_job(db, report_id, file_path=file_path)
+            report_cache.evict(db)
+    finally:
+        db.close()
+
+
+def job_state(report) -> str:
+    """Статус задачи с учетом выполнения в этом процессе и зависших задач"""
+    if report.status != "queued":
+        return report.status
+    future = _running.get(report.report_id)
+    if future is not None:
+        return "running" if future.running() else "queued"
+    if report.generated_at and report.generated_at < _stale_before():
+        # Процесс, выполнявший задачу, был перезапущен
+        return "failed"
+    return "queued"
@@ -6,5 +6,6 @@ from . import publishers
 from . import books
 from . import reports
 from . import statuses
+from . import profiles
 
-__all__ = ['auth', 'users', 'authors', 'genres', 'publishers', 'books', 'reports', 'statuses']
\ No newline at end of file
+__all__ = ['auth', 'users', 'authors', 'genres', 'publishers', 'books', 'reports', 'statuses', 'profiles']
\ No newline at end of file
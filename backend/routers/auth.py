@@ -1,31 +1,37 @@
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import get_db
 import schemas
-import crud
+import async_crud
+import passwords
 from auth import authenticate_user, create_access_token, get_current_user
 from config import settings
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
 @router.post("/register", response_model=schemas.Token)
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register(user: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
     # Проверяем, существует ли пользователь
-    db_user = crud.get_user_by_login(db, login=user.login)
+    db_user = await async_crud.get_user_by_login(db, login=user.login)
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Пользователь с таким логином уже существует"
         )
     
+    # Хэш вычисляется в пуле хэширования, не занимая поток запросов
+    password_hash = await passwords.hash_password(user.password)
+    
     # Первый пользователь становится админом
-    users_count = len(crud.get_users(db))
+    users_count = len(await async_crud.get_users(db, limit=1))
     is_admin = users_count == 0
     
     # Создаем пользователя
-    db_user = crud.create_user(db=db, user=user, is_admin=is_admin)
+    db_user = await async_crud.create_user(
+        db=db, user=user, is_admin=is_admin, password_hash=password_hash
+    )
     
     # Создаем токен
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -37,8 +43,8 @@ def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/login", response_model=schemas.Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.username, form_data.password)
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -55,5 +61,5 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=schemas.UserResponse)
-def read_users_me(current_user = Depends(get_current_user)):
+async def read_users_me(current_user = Depends(get_current_user)):
     return current_user
\ No newline at end of file
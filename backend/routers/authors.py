@@ -1,38 +1,39 @@
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import get_db
+from replicas import get_read_db
 import schemas
-import crud
+import async_crud
 from auth import get_current_user
 
 router = APIRouter(prefix="/authors", tags=["authors"])
 
 @router.get("/", response_model=List[schemas.AuthorResponse])
-def read_authors(
+async def read_authors(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user = Depends(get_current_user)
 ):
-    authors = crud.get_authors(db, skip=skip, limit=limit)
+    authors = await async_crud.get_authors(db, skip=skip, limit=limit)
     return authors
 
 @router.post("/", response_model=schemas.AuthorResponse)
-def create_author(
+async def create_author(
     author: schemas.AuthorCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    return crud.create_author(db=db, author=author)
+    return await async_crud.create_author(db=db, author=author)
 
 @router.get("/{author_id}", response_model=schemas.AuthorResponse)
-def read_author(
+async def read_author(
     author_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user = Depends(get_current_user)
 ):
-    db_author = crud.get_author(db, author_id=author_id)
+    db_author = await async_crud.get_author(db, author_id=author_id)
     if db_author is None:
         raise HTTPException(
             status_code=404,
@@ -41,13 +42,13 @@ def read_author(
     return db_author
 
 @router.put("/{author_id}", response_model=schemas.AuthorResponse)
-def update_author(
+async def update_author(
     author_id: int,
     author_update: schemas.AuthorCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    db_author = crud.update_author(db, author_id=author_id, author_update=author_update)
+    db_author = await async_crud.update_author(db, author_id=author_id, author_update=author_update)
     if db_author is None:
         raise HTTPException(
             status_code=404,
@@ -56,12 +57,12 @@ def update_author(
     return db_author
 
 @router.delete("/{author_id}")
-def delete_author(
+async def delete_author(
     author_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    db_author = crud.delete_author(db, author_id=author_id)
+    db_author = await async_crud.delete_author(db, author_id=author_id)
     if db_author is None:
         raise HTTPException(
             status_code=404,
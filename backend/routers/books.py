@@ -1,62 +1,98 @@
+import io
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, File, HTTPException, status, Query, Response, UploadFile
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from database import get_db
+from database import get_db, get_sync_db
+from replicas import get_read_db
 import schemas
-import crud
+import async_crud
+import importer
+import exporter
 from auth import get_current_user
-import models  
+from pagination import InvalidCursor
 
 router = APIRouter(prefix="/books", tags=["books"])
 
-@router.get("/", response_model=List[schemas.BookResponse])
-def read_books(
+@router.get("/", response_model=List[schemas.BookWithStatusResponse])
+async def read_books(
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=500),
     search: Optional[str] = Query(None, description="Поиск по названию книги"),
-    db: Session = Depends(get_db),
+    sort: str = Query("added_date", description="Сортировка: added_date, title, published, status_changed"),
+    order: str = Query("desc", description="Порядок сортировки: asc или desc"),
+    cursor: Optional[str] = Query(None, description="Курсор страницы из заголовка X-Next-Cursor или X-Prev-Cursor"),
+    db: AsyncSession = Depends(get_read_db),
     current_user = Depends(get_current_user)
 ):
     # Пользователь видит только свои книги
-    books = crud.get_user_books(db, current_user.user_id, skip=skip, limit=limit, search=search)
+    try:
+        books, next_cursor, prev_cursor = await async_crud.get_user_books_page(
+            db, current_user.user_id, sort=sort, order=order, cursor=cursor,
+            limit=limit, search=search, skip=skip
+        )
+    except InvalidCursor as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if prev_cursor:
+        response.headers["X-Prev-Cursor"] = prev_cursor
     return books
 
+@router.get("/search", response_model=List[schemas.BookResponse])
+async def search_books(
+    q: str = Query(..., min_length=1, description="Поисковый запрос (название, описание, авторы)"),
+    skip: int = 0,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db),
+    current_user = Depends(get_current_user)
+):
+    """Полнотекстовый поиск по книгам пользователя, результаты упорядочены по релевантности"""
+    return await async_crud.search_user_books(db, current_user.user_id, q, skip=skip, limit=limit)
+
 @router.post("/", response_model=schemas.BookResponse)
-def create_book(
+async def create_book(
     book: schemas.BookCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    publisher = crud.get_publisher(db, publisher_id=book.publisher_id)
+    publisher = await async_crud.get_publisher(db, publisher_id=book.publisher_id)
     if not publisher:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Издательство не найдено"
         )
     
+    # Справочники проверяются пакетно через кэш, без запроса на каждый id
+    authors = await async_crud.get_authors_by_ids(db, book.author_ids)
     for author_id in book.author_ids:
-        author = crud.get_author(db, author_id=author_id)
-        if not author:
+        if author_id not in authors:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Автор с ID {author_id} не найден"
             )
     
+    genres = await async_crud.get_genres_by_ids(db, book.genre_ids)
     for genre_id in book.genre_ids:
-        genre = crud.get_genre(db, genre_id=genre_id)
-        if not genre:
+        if genre_id not in genres:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Жанр с ID {genre_id} не найден"
             )
     
     # Создаем книгу
-    db_book = crud.create_book(db=db, book=book)
+    db_book = await async_crud.create_book(db=db, book=book)
     
     # Создаем запись в аналитике для пользователя (статус "В планах")
-    status_in_plans = crud.get_book_status_by_name(db, "В планах")
+    status_in_plans = await async_crud.get_book_status_by_name(db, "В планах")
     if status_in_plans:
-        crud.create_analytics(
+        await async_crud.create_analytics(
             db=db,
             analytics=schemas.AnalyticsBase(
                 book_id=db_book.book_id,
@@ -65,15 +101,67 @@ def create_book(
             user_id=current_user.user_id
         )
     
-    return db_book
+    # commit аналитики сбрасывает загруженные связи книги
+    return await async_crud.get_book(db, db_book.book_id)
+
+@router.post("/import", response_model=schemas.BookImportResult)
+def import_books(
+    file: UploadFile = File(..., description="CSV или JSONL, см. importer.py"),
+    format: Optional[str] = Query(None, description="'csv' или 'jsonl'; по умолчанию - по расширению файла"),
+    db: Session = Depends(get_sync_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Массовый импорт книг в библиотеку. Файл разбирается построчно и
+    записывается пакетами; строки с ошибками пропускаются и перечисляются
+    в ответе, остальные импортируются.
+    """
+    fmt = format or importer.detect_format(file.filename)
+    if fmt not in importer.FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Укажите format: csv или jsonl"
+        )
+    # Загрузка уже во временном файле (большие - на диске), читаем его потоком
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        return importer.import_books(db, current_user.user_id, stream, fmt)
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Файл должен быть в кодировке UTF-8"
+        )
+    finally:
+        stream.detach()
+
+@router.get("/export")
+async def export_books(
+    format: str = Query("ndjson", description="'ndjson' или 'csv'"),
+    current_user = Depends(get_current_user)
+):
+    """
+    Потоковая выгрузка всей библиотеки с текущим статусом и историей
+    статусов. Тело формируется по мере чтения серверных курсоров, см. exporter.py.
+    """
+    if format not in exporter.FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Укажите format: ndjson или csv"
+        )
+    filename = f"library-{current_user.user_id}.{format}"
+    return StreamingResponse(
+        exporter.export_books(current_user.user_id, format),
+        media_type=exporter.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 @router.get("/{book_id}", response_model=schemas.BookResponse)
-def read_book(
+async def read_book(
     book_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user = Depends(get_current_user)
 ):
-    db_book = crud.get_user_book_by_id(db, current_user.user_id, book_id)
+    db_book = await async_crud.get_user_book_by_id(db, current_user.user_id, book_id)
     if db_book is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -82,21 +170,20 @@ def read_book(
     return db_book
 
 @router.put("/{book_id}", response_model=schemas.BookResponse)
-def update_book(
+async def update_book(
     book_id: int,
     book_update: schemas.BookUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     # Проверяем, что книга принадлежит пользователю
-    db_book = crud.get_user_book_by_id(db, current_user.user_id, book_id)
-    if db_book is None:
+    if not await async_crud.user_owns_book(db, current_user.user_id, book_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Книга не найдена"
         )
     
-    db_book = crud.update_book(db, book_id=book_id, book_update=book_update)
+    db_book = await async_crud.update_book(db, book_id=book_id, book_update=book_update)
     if db_book is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -105,13 +192,13 @@ def update_book(
     return db_book
 
 @router.delete("/{book_id}")
-def delete_book(
+async def delete_book(
     book_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     # Удаляем книгу только для текущего пользователя
-    success = crud.delete_user_book(db, current_user.user_id, book_id)
+    success = await async_crud.delete_user_book(db, current_user.user_id, book_id)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -120,13 +207,13 @@ def delete_book(
     return {"message": "Книга удалена из вашей коллекции"}
 
 @router.get("/{book_id}/status", response_model=schemas.BookStatusResponse)
-def get_book_status(
+async def get_book_status(
     book_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user = Depends(get_current_user)
 ):
     """Получить текущий статус книги для пользователя"""
-    status_obj = crud.get_current_book_status(db, current_user.user_id, book_id)
+    status_obj = await async_crud.get_current_book_status(db, current_user.user_id, book_id)
     if status_obj is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -135,10 +222,10 @@ def get_book_status(
     return status_obj
 
 @router.post("/{book_id}/status/", response_model=schemas.AnalyticsResponse)
-def update_book_status(
+async def update_book_status(
     book_id: int,
     status_update: schemas.AnalyticsBase,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     print(f"=== ОБНОВЛЕНИЕ СТАТУСА КНИГИ ===")
@@ -147,15 +234,14 @@ def update_book_status(
     print(f"Полученные данные: {status_update.dict()}")
     
     # Проверяем, что книга принадлежит пользователю
-    book = crud.get_user_book_by_id(db, current_user.user_id, book_id)
-    if not book:
+    if not await async_crud.user_owns_book(db, current_user.user_id, book_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Книга не найдена в вашей коллекции"
         )
     
     # Проверяем статус
-    status_obj = crud.get_book_status_by_id(db, status_update.status_id)
+    status_obj = await async_crud.get_book_status_by_id(db, status_update.status_id)
     if not status_obj:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -163,7 +249,7 @@ def update_book_status(
         )
     
     # Создаем запись аналитики - явно указываем book_id
-    analytics = crud.create_analytics(
+    analytics = await async_crud.create_analytics(
         db=db,
         analytics=status_update,
         user_id=current_user.user_id,
@@ -173,23 +259,17 @@ def update_book_status(
     return analytics
 
 @router.get("/{book_id}/statuses", response_model=List[schemas.AnalyticsResponse])
-def get_book_status_history(
+async def get_book_status_history(
     book_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user = Depends(get_current_user)
 ):
     """Получить историю статусов книги для пользователя"""
     # Проверяем, что книга принадлежит пользователю
-    book = crud.get_user_book_by_id(db, current_user.user_id, book_id)
-    if not book:
+    if not await async_crud.user_owns_book(db, current_user.user_id, book_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Книга не найдена"
         )
     
-    analytics = db.query(models.Analytics).filter(
-        models.Analytics.user_id == current_user.user_id,
-        models.Analytics.book_id == book_id
-    ).order_by(models.Analytics.created_date.desc()).all()
-    
-    return analytics
\ No newline at end of file
+    return await async_crud.get_book_status_history(db, current_user.user_id, book_id)
\ No newline at end of file
@@ -1,38 +1,39 @@
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import get_db
+from replicas import get_read_db
 import schemas
-import crud
+import async_crud
 from auth import get_current_user
 
 router = APIRouter(prefix="/genres", tags=["genres"])
 
 @router.get("/", response_model=List[schemas.GenreResponse])
-def read_genres(
+async def read_genres(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user = Depends(get_current_user)
 ):
-    genres = crud.get_genres(db, skip=skip, limit=limit)
+    genres = await async_crud.get_genres(db, skip=skip, limit=limit)
     return genres
 
 @router.post("/", response_model=schemas.GenreResponse)
-def create_genre(
+async def create_genre(
     genre: schemas.GenreCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    return crud.create_genre(db=db, genre=genre)
+    return await async_crud.create_genre(db=db, genre=genre)
 
 @router.get("/{genre_id}", response_model=schemas.GenreResponse)
-def read_genre(
+async def read_genre(
     genre_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user = Depends(get_current_user)
 ):
-    db_genre = crud.get_genre(db, genre_id=genre_id)
+    db_genre = await async_crud.get_genre(db, genre_id=genre_id)
     if db_genre is None:
         raise HTTPException(
             status_code=404,
@@ -41,13 +42,13 @@ def read_genre(
     return db_genre
 
 @router.put("/{genre_id}", response_model=schemas.GenreResponse)
-def update_genre(
+async def update_genre(
     genre_id: int,
     genre_update: schemas.GenreCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    db_genre = crud.update_genre(db, genre_id=genre_id, genre_update=genre_update)
+    db_genre = await async_crud.update_genre(db, genre_id=genre_id, genre_update=genre_update)
     if db_genre is None:
         raise HTTPException(
             status_code=404,
@@ -56,12 +57,12 @@ def update_genre(
     return db_genre
 
 @router.delete("/{genre_id}")
-def delete_genre(
+async def delete_genre(
     genre_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    db_genre = crud.delete_genre(db, genre_id=genre_id)
+    db_genre = await async_crud.delete_genre(db, genre_id=genre_id)
     if db_genre is None:
         raise HTTPException(
             status_code=404,
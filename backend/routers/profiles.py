@@ -0,0 +1,38 @@
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+import schemas
+import profiling
+from auth import get_current_admin_user
+
+# Профили запросов, снятые по флагу X-Profile / ?profile=1 (см. profiling.py)
+router = APIRouter(prefix="/profiles", tags=["profiles"])
+
+@router.get("/", response_model=List[schemas.ProfileResponse])
+def read_profiles(
+    limit: int = 50,
+    current_user = Depends(get_current_admin_user)  # Только администратор
+):
+    """Последние профили этого сервера, новые первыми"""
+    return profiling.list_profiles(limit)
+
+@router.get("/{profile_id}", response_model=schemas.ProfileResponse)
+def read_profile(
+    profile_id: str,
+    current_user = Depends(get_current_admin_user)
+):
+    summary = profiling.load_summary(profile_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return summary
+
+@router.get("/{profile_id}/folded")
+def download_profile(
+    profile_id: str,
+    current_user = Depends(get_current_admin_user)
+):
+    """Стеки в формате folded: flamegraph.pl или speedscope.app"""
+    path = profiling.folded_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain; charset=utf-8", filename=f"profile-{profile_id}.folded")
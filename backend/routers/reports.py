@@ -1,49 +1,109 @@
 import os
 from datetime import date, datetime
+from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import FileResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from database import get_db
+from database import get_sync_db
 import schemas
 import crud
+import report_cache
+import report_jobs
 from auth import get_current_user
+from config import settings
 from pdf_generator import PDFGenerator
 
 router = APIRouter(prefix="/reports", tags=["reports"])
 
+def _book_card_data(db: Session, user_id: int, book_id: int):
+    # Проверяем, что книга принадлежит пользователю
+    book = crud.get_user_book_by_id(db, user_id, book_id)
+    if not book:
+        raise HTTPException(
+            status_code=404,
+            detail="Book not found in your collection"
+        )
+    
+    # Получаем текущий статус книги
+    current_status = crud.get_current_book_status(db, user_id, book.book_id)
+    
+    return _card_payload(book, current_status)
+
+def _card_payload(book, current_status) -> dict:
+    return {
+        "book_id": book.book_id,
+        "title": book.title,
+        "authors": [" ".join(filter(None, (a.last_name, a.first_name))) for a in book.authors],
+        "published": book.published,
+        "publisher": book.publisher.name,
+        "genres": [g.name for g in book.genres],
+        "added_date": book.added_date,
+        "description": book.description,
+        "current_status": current_status.name if current_status else "Не указан"
+    }
+
+def _collection_period(report_request: schemas.ReportRequest):
+    if not report_request.period_from or not report_request.period_to:
+        raise HTTPException(
+            status_code=400,
+            detail="For collection growth report, period is required"
+        )
+    
+    # Исправлено: преобразуем строки в даты
+    period_from = report_request.period_from
+    period_to = report_request.period_to
+    
+    if isinstance(period_from, str):
+        period_from = datetime.strptime(period_from, "%Y-%m-%d").date()
+    if isinstance(period_to, str):
+        period_to = datetime.strptime(period_to, "%Y-%m-%d").date()
+    return period_from, period_to
+
+def _collection_payload(user_id: int, period_from: date, period_to: date) -> dict:
+    # Сами книги не передаются: они читаются из БД потоком при рендеринге
+    return {"user_id": user_id, "start_date": period_from, "end_date": period_to}
+
+def _render_cached(db: Session, report_type: str, payload: dict) -> str:
+    """Готовый отчет из кэша или рендеринг в запросе"""
+    if report_type == "collection_growth":
+        key = report_jobs.collection_cache_key(db, payload)
+    else:
+        key = report_cache.cache_key(report_type, payload)
+    pdf_path = report_cache.lookup(report_type, key)
+    if pdf_path is None:
+        pdf_gen = PDFGenerator(output_dir=report_cache.REPORTS_DIR)
+        pdf_path = report_jobs.render_report(report_type, payload, key, generator=pdf_gen, db=db)
+        report_cache.evict(db)
+    return pdf_path
+
+@router.get("/", response_model=List[schemas.ReportJobResponse])
+def read_reports(
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_sync_db),
+    current_user = Depends(get_current_user)
+):
+    """Ранее сформированные отчеты пользователя, новые первыми"""
+    reports = crud.get_user_reports(db, current_user.user_id, skip=skip, limit=limit)
+    result = []
+    for report in reports:
+        item = schemas.ReportJobResponse.model_validate(report)
+        item.status = report_jobs.job_state(report)
+        item.file_available = report_cache.is_available(report)
+        result.append(item)
+    return result
+
 @router.post("/generate")
 def generate_report(
     report_request: schemas.ReportRequest,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_sync_db),
     current_user = Depends(get_current_user)
 ):
-    pdf_gen = PDFGenerator()
-    
     if report_request.report_type == "book_card" and report_request.book_id:
-        # Проверяем, что книга принадлежит пользователю
-        book = crud.get_user_book_by_id(db, current_user.user_id, report_request.book_id)
-        if not book:
-            raise HTTPException(
-                status_code=404,
-                detail="Book not found in your collection"
-            )
+        book_data = _book_card_data(db, current_user.user_id, report_request.book_id)
         
-        # Получаем текущий статус книги
-        current_status = crud.get_current_book_status(db, current_user.user_id, book.book_id)
-        
-        book_data = {
-            "book_id": book.book_id,
-            "title": book.title,
-            "authors": [f"{a.last_name} {a.first_name}" for a in book.authors],
-            "published": book.published,
-            "publisher": book.publisher.name,
-            "genres": [g.name for g in book.genres],
-            "added_date": book.added_date,
-            "description": book.description,
-            "current_status": current_status.name if current_status else "Не указан"
-        }
-        
-        pdf_path = pdf_gen.generate_book_card(book_data)
+        pdf_path = _render_cached(db, "book_card", {"book": book_data})
         
         crud.create_report_record(
             db=db,
@@ -61,43 +121,11 @@ def generate_report(
         )
     
     elif report_request.report_type == "collection_growth":
-        if not report_request.period_from or not report_request.period_to:
-            raise HTTPException(
-                status_code=400,
-                detail="For collection growth report, period is required"
-            )
-        
-        # Исправлено: преобразуем строки в даты
-        period_from = report_request.period_from
-        period_to = report_request.period_to
-        
-        if isinstance(period_from, str):
-            period_from = datetime.strptime(period_from, "%Y-%m-%d").date()
-        if isinstance(period_to, str):
-            period_to = datetime.strptime(period_to, "%Y-%m-%d").date()
-        
-        # Получаем книги за период
-        books = crud.get_books_added_in_period_by_user(
-            db=db,
-            user_id=current_user.user_id,
-            start_date=period_from,
-            end_date=period_to
-        )
+        period_from, period_to = _collection_period(report_request)
         
-        books_data = []
-        for book in books:
-            books_data.append({
-                "title": book.title,
-                "authors": [f"{a.last_name} {a.first_name}" for a in book.authors],
-                "published": book.published,
-                "genres": [g.name for g in book.genres],
-                "added_date": book.added_date
-            })
-        
-        pdf_path = pdf_gen.generate_collection_report(
-            books=books_data,
-            start_date=period_from,
-            end_date=period_to
+        pdf_path = _render_cached(
+            db, "collection_growth",
+            _collection_payload(current_user.user_id, period_from, period_to)
         )
         
         crud.create_report_record(
@@ -120,3 +148,166 @@ def generate_report(
             status_code=400,
             detail="Invalid report type"
         )
+
+@router.post("/jobs", response_model=schemas.ReportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+def submit_report_job(
+    report_request: schemas.ReportRequest,
+    db: Session = Depends(get_sync_db),
+    current_user = Depends(get_current_user)
+):
+    """Постановка отчета в очередь; результат забирается через /reports/jobs/{job_id}"""
+    period_from = period_to = None
+    if report_request.report_type == "book_card" and report_request.book_id:
+        payload = {"book": _book_card_data(db, current_user.user_id, report_request.book_id)}
+    elif report_request.report_type == "collection_growth":
+        period_from, period_to = _collection_period(report_request)
+        payload = _collection_payload(current_user.user_id, period_from, period_to)
+    else:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid report type"
+        )
+    
+    try:
+        report = report_jobs.submit(
+            db, current_user.user_id, report_request.report_type, payload,
+            period_from=period_from, period_to=period_to
+        )
+    except report_jobs.JobLimitExceeded as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e)
+        )
+    return report
+
+_MEDIA_TYPES = {".pdf": "application/pdf", ".zip": "application/zip"}
+
+def _media_type(file_path: str) -> str:
+    return _MEDIA_TYPES.get(os.path.splitext(file_path)[1], "application/octet-stream")
+
+@router.post("/book-cards")
+def export_book_cards(
+    export_request: schemas.BookCardsExportRequest,
+    db: Session = Depends(get_sync_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Карточки нескольких книг: ZIP (по файлу на книгу) или один PDF.
+    Небольшие выгрузки отдаются сразу, выгрузки больше BOOK_CARDS_SYNC_LIMIT
+    ставятся в очередь (202) с прогрессом в /reports/jobs/{job_id}.
+    """
+    if export_request.format not in ("zip", "pdf"):
+        raise HTTPException(
+            status_code=400,
+            detail="Format must be 'zip' or 'pdf'"
+        )
+    
+    books = [
+        _card_payload(book, current_status)
+        for book, current_status in crud.get_user_books_for_export(
+            db, current_user.user_id,
+            book_ids=export_request.book_ids,
+            search=export_request.search,
+            status_id=export_request.status_id
+        )
+    ]
+    if not books:
+        raise HTTPException(
+            status_code=404,
+            detail="No books found in your collection"
+        )
+    
+    if len(books) > settings.BOOK_CARDS_SYNC_LIMIT:
+        try:
+            report = report_jobs.submit_book_cards(db, current_user.user_id, books, export_request.format)
+        except report_jobs.JobLimitExceeded as e:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=str(e)
+            )
+        response = schemas.ReportJobResponse.model_validate(report)
+        response.status = report_jobs.job_state(report)
+        response.file_available = report_cache.is_available(report)
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content=jsonable_encoder(response)
+        )
+    
+    key = report_jobs.book_cards_cache_key(books, export_request.format)
+    cached_path = report_cache.lookup("book_cards", key, export_request.format)
+    if cached_path is None and export_request.format == "zip":
+        # Архив собирается и отдается по мере рендеринга карточек
+        return StreamingResponse(
+            report_jobs.iter_book_cards_zip(books),
+            media_type="application/zip",
+            headers={"Content-Disposition": 'attachment; filename="book_cards.zip"'}
+        )
+    
+    file_path = cached_path or report_jobs.render_book_cards(books, export_request.format, key)
+    report_cache.evict(db)
+    crud.create_report_record(
+        db=db,
+        user_id=current_user.user_id,
+        report_type="book_cards",
+        period_from=None,
+        period_to=None,
+        file_path=file_path,
+        items_total=len(books),
+        items_done=len(books)
+    )
+    return FileResponse(
+        path=file_path,
+        media_type=_media_type(file_path),
+        filename=os.path.basename(file_path)
+    )
+
+def _get_job(db: Session, user_id: int, job_id: int):
+    report = crud.get_user_report(db, user_id, job_id)
+    if report is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Report job not found"
+        )
+    return report
+
+@router.get("/jobs/{job_id}", response_model=schemas.ReportJobResponse)
+def get_report_job(
+    job_id: int,
+    db: Session = Depends(get_sync_db),
+    current_user = Depends(get_current_user)
+):
+    report = _get_job(db, current_user.user_id, job_id)
+    response = schemas.ReportJobResponse.model_validate(report)
+    response.status = report_jobs.job_state(report)
+    response.file_available = report_cache.is_available(report)
+    return response
+
+@router.get("/jobs/{job_id}/file")
+def download_report_job(
+    job_id: int,
+    db: Session = Depends(get_sync_db),
+    current_user = Depends(get_current_user)
+):
+    report = _get_job(db, current_user.user_id, job_id)
+    state = report_jobs.job_state(report)
+    if state == "failed":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=report.error or "Report generation failed"
+        )
+    if state != "done":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Report is not ready yet"
+        )
+    if not report_cache.is_available(report):
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Report file has been removed, generate it again"
+        )
+    
+    return FileResponse(
+        path=report.file_path,
+        media_type=_media_type(report.file_path),
+        filename=os.path.basename(report.file_path)
+    )
@@ -1,44 +1,53 @@
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import get_db
 import schemas
-import crud
-from auth import get_current_admin_user, get_current_user
+import async_crud
+import passwords
+import refcache
+import cache_bus
+from auth import auth_cache_stats, get_current_admin_user, get_current_user
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 @router.get("/", response_model=List[schemas.UserResponse])
-def read_users(
+async def read_users(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_admin_user)
 ):
-    users = crud.get_users(db, skip=skip, limit=limit)
+    users = await async_crud.get_users(db, skip=skip, limit=limit)
     return users
 
 @router.post("/", response_model=schemas.UserResponse)
-def create_user(
+async def create_user(
     user: schemas.UserCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_admin_user)
 ):
-    db_user = crud.get_user_by_login(db, login=user.login)
+    db_user = await async_crud.get_user_by_login(db, login=user.login)
     if db_user:
         raise HTTPException(
             status_code=400,
             detail="User with this login already exists"
         )
-    return crud.create_user(db=db, user=user)
+    password_hash = await passwords.hash_password(user.password)
+    return await async_crud.create_user(db=db, user=user, password_hash=password_hash)
+
+@router.get("/cache/stats")
+async def read_auth_cache_stats(current_user = Depends(get_current_admin_user)):
+    """Статистика кэшей этого процесса и шины их инвалидации"""
+    return {**auth_cache_stats(), "reference": refcache.stats(), "bus": cache_bus.stats()}
 
 @router.get("/{user_id}", response_model=schemas.UserResponse)
-def read_user(
+async def read_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_admin_user)
 ):
-    db_user = crud.get_user(db, user_id=user_id)
+    db_user = await async_crud.get_user(db, user_id=user_id)
     if db_user is None:
         raise HTTPException(
             status_code=404,
@@ -47,13 +56,18 @@ def read_user(
     return db_user
 
 @router.put("/{user_id}", response_model=schemas.UserResponse)
-def update_user(
+async def update_user(
     user_id: int,
     user_update: schemas.UserUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_admin_user)
 ):
-    db_user = crud.update_user(db, user_id=user_id, user_update=user_update)
+    password_hash = None
+    if user_update.password is not None:
+        password_hash = await passwords.hash_password(user_update.password)
+    db_user = await async_crud.update_user(
+        db, user_id=user_id, user_update=user_update, password_hash=password_hash
+    )
     if db_user is None:
         raise HTTPException(
             status_code=404,
@@ -62,12 +76,12 @@ def update_user(
     return db_user
 
 @router.delete("/{user_id}")
-def delete_user(
+async def delete_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_admin_user)
 ):
-    db_user = crud.delete_user(db, user_id=user_id)
+    db_user = await async_crud.delete_user(db, user_id=user_id)
     if db_user is None:
         raise HTTPException(
             status_code=404,
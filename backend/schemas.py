@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List
 from datetime import date, datetime
 
@@ -23,7 +23,8 @@ class TokenData(BaseModel):
 # Author schemas
 class AuthorBase(BaseModel):
     last_name: str
-    first_name: str
+    # Импорт допускает авторов, указанных одной фамилией
+    first_name: Optional[str] = None
     middle_name: Optional[str] = None
 
 class AuthorCreate(AuthorBase):
@@ -80,7 +81,65 @@ class BookUpdate(BaseModel):
     author_ids: Optional[List[int]] = None
     genre_ids: Optional[List[int]] = None
 
+class BookImportRow(BaseModel):
+    """Строка импорта (CSV/JSONL): справочники указываются названиями"""
+    title: str = Field(..., min_length=1, max_length=255)
+    # Год издания может быть неизвестен (колонка book.published допускает NULL),
+    # такие книги есть и в выгрузке exporter.py
+    published: Optional[int] = None
+    description: Optional[str] = None
+    publisher: str = Field(..., min_length=1, max_length=255)
+    authors: List[str] = Field(default_factory=list, description="'Фамилия Имя Отчество'; в CSV - через ';'")
+    genres: List[str] = Field(default_factory=list, description="Названия жанров; в CSV - через ';'")
+    status: Optional[str] = Field(None, description="Текущий статус; по умолчанию 'В планах'")
+    pages_read: Optional[int] = Field(None, ge=0)
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+
+    @field_validator("authors", "genres", mode="before")
+    @classmethod
+    def split_names(cls, value):
+        if value is None:
+            return []
+        if isinstance(value, str):
+            value = value.split(";")
+        names = []
+        for item in value:
+            # Автор в JSONL может быть объектом с полями модели
+            if isinstance(item, dict):
+                item = " ".join(filter(None, (item.get("last_name"), item.get("first_name"), item.get("middle_name"))))
+            if str(item).strip():
+                names.append(" ".join(str(item).split()))
+        return names
+
+    @field_validator("title", "publisher", mode="before")
+    @classmethod
+    def strip_text(cls, value):
+        # Строка из одних пробелов не проходит проверку min_length
+        return value.strip() if isinstance(value, str) else value
+
+    @field_validator("published", "description", "status", "pages_read", "start_date", "end_date", mode="before")
+    @classmethod
+    def empty_to_none(cls, value):
+        # Пустые ячейки CSV
+        return None if isinstance(value, str) and not value.strip() else value
+
+class BookImportError(BaseModel):
+    line: int
+    error: str
+
+class BookImportResult(BaseModel):
+    rows: int
+    imported: int
+    failed: int
+    authors_created: int
+    genres_created: int
+    publishers_created: int
+    seconds: float
+    errors: List[BookImportError] = Field(default_factory=list, description="Первые IMPORT_MAX_ERRORS ошибок")
+
 class BookResponse(BookBase):
+    published: Optional[int] = None
     book_id: int
     added_date: datetime
     authors: List[AuthorResponse]
@@ -149,6 +208,41 @@ class ReportRequest(BaseModel):
             }
         }
 
+class BookCardsExportRequest(BaseModel):
+    book_ids: Optional[List[int]] = Field(None, description="ID книг; если не указаны - все книги, подходящие под фильтр")
+    search: Optional[str] = Field(None, description="Фильтр: полнотекстовый поиск")
+    status_id: Optional[int] = Field(None, description="Фильтр: текущий статус книги")
+    format: str = Field("zip", description="'zip' - архив карточек, 'pdf' - один PDF со всеми карточками")
+
+class ProfileResponse(BaseModel):
+    profile_id: str
+    method: str
+    path: str
+    status: int
+    started_at: datetime
+    duration_ms: float
+    db_ms: float
+    python_ms: float
+    queries: int
+    samples: int
+    interval_ms: int
+
+class ReportJobResponse(BaseModel):
+    report_id: int
+    report_type: str
+    status: str
+    period_from: Optional[date] = None
+    period_to: Optional[date] = None
+    generated_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    items_total: Optional[int] = None
+    items_done: Optional[int] = None
+    file_available: bool = False
+    
+    class Config:
+        from_attributes = True
+
 # User schemas
 class UserResponse(BaseModel):
     user_id: int
@@ -169,6 +263,8 @@ class UserUpdate(BaseModel):
 
 class BookWithStatusResponse(BookResponse):
     current_status: Optional[BookStatusResponse] = None
+    pages_read: Optional[int] = None
+    changed_at: Optional[datetime] = Field(None, description="Дата последнего изменения статуса")
     
     class Config:
         from_attributes = True
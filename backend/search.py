@@ -0,0 +1,186 @@
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+import models
+
+# Полнотекстовый индекс по названию, описанию и авторам книги.
+# PostgreSQL: таблица book_search с колонкой tsvector и GIN-индексом
+# (русский стеммер). SQLite: виртуальная таблица FTS5 (стемминга нет,
+# только префиксный поиск).
+
+SEARCH_CONFIG = "russian"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _dialect(bind) -> str:
+    return bind.dialect.name
+
+
+def create_search_index(bind):
+    """Создание структур полнотекстового индекса (идемпотентно)"""
+    if _dialect(bind) == "postgresql":
+        bind.execute(text(
+            "CREATE TABLE IF NOT EXISTS book_search ("
+            " book_id INTEGER PRIMARY KEY REFERENCES book(book_id) ON DELETE CASCADE,"
+            " document tsvector NOT NULL)"
+        ))
+        bind.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_book_search_document "
+            "ON book_search USING GIN (document)"
+        ))
+    elif _dialect(bind) == "sqlite":
+        bind.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS book_fts USING fts5("
+            "title, authors, description, tokenize='unicode61 remove_diacritics 2')"
+        ))
+
+
+def _author_names(book: models.Book) -> str:
+    return " ".join(
+        " ".join(filter(None, [a.last_name, a.first_name, a.middle_name]))
+        for a in book.authors
+    )
+
+
+def index_book(db: Session, book: models.Book):
+    """Обновление записи индекса для одной книги (в текущей транзакции)"""
+    index_documents(db, [{
+        "book_id": book.book_id,
+        "title": book.title or "",
+        "authors": _author_names(book),
+        "description": book.description or "",
+    }])
+
+
+def index_documents(db: Session, documents: List[dict]):
+    """
+    Запись индекса для нескольких книг одним executemany.
+    documents: словари book_id, title, authors (строка имен), description.
+    """
+    if not documents:
+        return
+    dialect = _dialect(db.get_bind())
+    if dialect == "postgresql":
+        db.execute(text(
+            "INSERT INTO book_search (book_id, document) VALUES (:book_id, "
+            " setweight(to_tsvector(CAST(:config AS regconfig), :title), 'A') ||"
+            " setweight(to_tsvector(CAST(:config AS regconfig), :authors), 'B') ||"
+            " setweight(to_tsvector(CAST(:config AS regconfig), :description), 'C'))"
+            " ON CONFLICT (book_id) DO UPDATE SET document = EXCLUDED.document"
+        ), [{**document, "config": SEARCH_CONFIG} for document in documents])
+    elif dialect == "sqlite":
+        db.execute(text("DELETE FROM book_fts WHERE rowid = :book_id"), documents)
+        db.execute(text(
+            "INSERT INTO book_fts (rowid, title, authors, description) "
+            "VALUES (:book_id, :title, :authors, :description)"
+        ), documents)
+
+
+def remove_book(db: Session, book_id: int):
+    """Удаление книги из индекса"""
+    dialect = _dialect(db.get_bind())
+    if dialect == "postgresql":
+        db.execute(text("DELETE FROM book_search WHERE book_id = :book_id"), {"book_id": book_id})
+    elif dialect == "sqlite":
+        db.execute(text("DELETE FROM book_fts WHERE rowid = :book_id"), {"book_id": book_id})
+
+
+def rebuild_search_index(db: Session, batch_size: int = 1000) -> int:
+    """Полная перестройка индекса (для первичного заполнения и восстановления)"""
+    count = 0
+    last_id = 0
+    while True:
+        books = db.query(models.Book).filter(
+            models.Book.book_id > last_id
+        ).order_by(models.Book.book_id).limit(batch_size).all()
+        if not books:
+            break
+        for book in books:
+            index_book(db, book)
+        db.commit()
+        count += len(books)
+        last_id = books[-1].book_id
+        db.expunge_all()
+    return count
+
+
+def _tokens(query: str) -> List[str]:
+    return _TOKEN_RE.findall(query.lower())
+
+
+def search_book_ids(db: Session, query: str, user_id: Optional[int] = None,
+                    limit: int = 20, offset: int = 0) -> List[Tuple[int, float]]:
+    """
+    Ранжированный поиск книг.
+    Возвращает список (book_id, rank), лучшие совпадения первыми.
+    Последнее слово запроса ищется по префиксу.
+    """
+    tokens = _tokens(query)
+    if not tokens:
+        return []
+
+    params = {"limit": limit, "offset": offset, "user_id": user_id}
+    owner_filter = ""
+    dialect = _dialect(db.get_bind())
+
+    if dialect == "postgresql":
+        if user_id is not None:
+            owner_filter = (" AND EXISTS (SELECT 1 FROM user_book ub"
+                            " WHERE ub.user_id = :user_id AND ub.book_id = s.book_id)")
+        params["config"] = SEARCH_CONFIG
+        params["tsquery"] = " & ".join(tokens[:-1] + [tokens[-1] + ":*"])
+        rows = db.execute(text(
+            "SELECT s.book_id, ts_rank_cd(s.document, q) AS rank"
+            " FROM book_search s, to_tsquery(CAST(:config AS regconfig), :tsquery) q"
+            " WHERE s.document @@ q" + owner_filter +
+            " ORDER BY rank DESC, s.book_id LIMIT :limit OFFSET :offset"
+        ), params).all()
+    elif dialect == "sqlite":
+        if user_id is not None:
+            owner_filter = (" AND EXISTS (SELECT 1 FROM user_book ub"
+                            " WHERE ub.user_id = :user_id AND ub.book_id = book_fts.rowid)")
+        params["match"] = " ".join(f'"{t}"' for t in tokens[:-1]) + f' "{tokens[-1]}"*'
+        # bm25 возвращает меньшие значения для лучших совпадений
+        rows = db.execute(text(
+            "SELECT rowid AS book_id, -bm25(book_fts, 10.0, 5.0, 1.0) AS rank"
+            " FROM book_fts WHERE book_fts MATCH :match" + owner_filter +
+            " ORDER BY rank DESC, rowid LIMIT :limit OFFSET :offset"
+        ), params).all()
+    else:
+        pattern = f"%{query}%"
+        q = db.query(models.Book.book_id).filter(models.Book.title.ilike(pattern))
+        if user_id is not None:
+            q = q.join(models.UserBook, models.UserBook.book_id == models.Book.book_id).filter(
+                models.UserBook.user_id == user_id
+            )
+        rows = [(row.book_id, 0.0) for row in
+                q.order_by(models.Book.book_id).offset(offset).limit(limit).all()]
+
+    return [(row[0], float(row[1])) for row in rows]
+
+
+def matching_book_ids_clause(db: Session, query: str):
+    """
+    Условие фильтрации models.Book по полнотекстовому индексу
+    (для списков без ранжирования)
+    """
+    tokens = _tokens(query)
+    if not tokens:
+        return None
+    dialect = _dialect(db.get_bind())
+    if dialect == "postgresql":
+        subquery = text(
+            "SELECT book_id FROM book_search"
+            " WHERE document @@ to_tsquery(CAST(:config AS regconfig), :tsquery)"
+        ).bindparams(config=SEARCH_CONFIG,
+                     tsquery=" & ".join(tokens[:-1] + [tokens[-1] + ":*"]))
+        return models.Book.book_id.in_(subquery.columns(book_id=models.Book.book_id.type))
+    if dialect == "sqlite":
+        subquery = text(
+            "SELECT rowid AS book_id FROM book_fts WHERE book_fts MATCH :match"
+        ).bindparams(match=" ".join(f'"{t}"' for t in tokens[:-1]) + f' "{tokens[-1]}"*')
+        return models.Book.book_id.in_(subquery.columns(book_id=models.Book.book_id.type))
+    return models.Book.title.ilike(f"%{query}%")
@@ -0,0 +1,108 @@
+import time
+from contextvars import ContextVar, Token
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from config import settings
+
+# Статистика SQL-запросов текущего HTTP-запроса: число запросов, суммарное
+# время в БД и самый медленный запрос. Обработчики событий висят на классе
+# Engine и видят все движки (основной, асинхронный, реплики); запросы
+# учитываются, только пока в контексте активен объект QueryStats - его
+# включает RequestMetricsMiddleware. Контекст переходит и в синхронные
+# обработчики (пул потоков), и в AsyncSession.run_sync; фоновые задачи
+# отчетов в свой поток его не уносят и не учитываются.
+
+_START_TIMES = "query_start_times"
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+class QueryStats:
+    __slots__ = ("count", "duration", "slowest", "slowest_statement")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = 0.0
+        self.slowest_statement: Optional[str] = None
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.duration += duration
+        if duration >= self.slowest:
+            self.slowest = duration
+            self.slowest_statement = statement
+
+    def server_timing(self, total: float) -> str:
+        """Значение заголовка Server-Timing (длительности в миллисекундах)"""
+        return (
+            f'db;dur={self.duration * 1000:.1f};desc="{self.count} queries", '
+            f"app;dur={max(total - self.duration, 0) * 1000:.1f}"
+        )
+
+    def summary(self) -> str:
+        line = f"queries={self.count} db={self.duration:.3f}s"
+        if self.slowest_statement:
+            line += f" slowest={self.slowest:.3f}s {' '.join(self.slowest_statement.split())[:200]}"
+        return line
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def activate(stats: Optional[QueryStats]) -> Token:
+    return _current.set(stats)
+
+
+def deactivate(token: Token):
+    _current.reset(token)
+
+
+def current() -> Optional[QueryStats]:
+    return _current.get()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault(_START_TIMES, []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    start_times = conn.info.get(_START_TIMES)
+    if stats is None or not start_times:
+        return
+    stats.record(statement, time.perf_counter() - start_times.pop())
+
+
+def budget_for(method: str, route: str) -> Optional[int]:
+    """Допустимое число запросов для маршрута ("GET /api/books/") или None"""
+    return settings.QUERY_BUDGETS.get(f"{method} {route}")
+
+
+def exceeded_budget(stats: QueryStats, method: str, route: str) -> Optional[int]:
+    """Превышенный бюджет маршрута или None, без исключения в строгом режиме"""
+    budget = budget_for(method, route)
+    if budget is None or stats.count <= budget:
+        return None
+    return budget
+
+
+def check_budget(stats: QueryStats, method: str, route: str) -> Optional[int]:
+    """
+    Превышенный бюджет маршрута или None. При QUERY_BUDGET_STRICT
+    (тесты, CI) превышение - исключение QueryBudgetExceeded.
+    """
+    budget = exceeded_budget(stats, method, route)
+    if budget is not None and settings.QUERY_BUDGET_STRICT:
+        raise QueryBudgetExceeded(
+            f"{method} {route}: {stats.count} SQL-запросов при бюджете {budget} ({stats.summary()})"
+        )
+    return budget
@@ -0,0 +1,66 @@
+import csv
+import io
+import os
+import re
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+# Окружение задается до импорта модулей приложения: config читает его при
+# импорте, каталоги отчетов и профилей берутся от рабочего каталога
+_workdir = tempfile.mkdtemp(prefix="book_catalog_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir, 'test.db')}"
+os.environ["QUERY_BUDGET_STRICT"] = "True"
+os.chdir(_workdir)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_SERVER_TIMING_QUERIES = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    import migrate
+    from main import app
+
+    migrate.upgrade()
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def auth_headers(client):
+    """Новый пользователь с пустой библиотекой"""
+    login = f"user_{uuid.uuid4().hex[:12]}"
+    response = client.post("/api/auth/register", json={"name": "Тест", "login": login, "password": "secret"})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def add_books(client, headers, count: int, offset: int = 0):
+    """Книги в библиотеку через импорт CSV: с издательством, авторами и жанрами"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["title", "published", "publisher", "authors", "genres", "status", "pages_read"])
+    for i in range(offset, offset + count):
+        writer.writerow([
+            f"Книга {i} о море", 1950 + i % 70, f"Издательство {i % 3}",
+            f"Автор{i % 5} Имя;Соавтор{i % 7} Имя", f"Жанр {i % 4};Роман",
+            ("В планах", "Читаю", "Прочитано")[i % 3], 10 * i,
+        ])
+    response = client.post(
+        "/api/books/import", headers=headers,
+        files={"file": ("books.csv", buffer.getvalue().encode("utf-8"), "text/csv")},
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["imported"] == count, response.json()
+
+
+def query_count(response) -> int:
+    """Число SQL-запросов запроса из заголовка Server-Timing"""
+    match = _SERVER_TIMING_QUERIES.search(response.headers.get("server-timing", ""))
+    assert match, f"нет Server-Timing: {dict(response.headers)}"
+    return int(match.group(1))
@@ -0,0 +1,116 @@
+from conftest import add_books
+
+
+def _import(client, headers, text: str, filename: str = "books.csv"):
+    response = client.post(
+        "/api/books/import", headers=headers,
+        files={"file": (filename, text.encode("utf-8"), "text/csv")},
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_imported_single_name_author_is_listed(client, auth_headers):
+    result = _import(client, auth_headers, (
+        "title,published,publisher,authors,genres\n"
+        "Одна фамилия,2001,Эксмо,Петров,Роман\n"
+    ))
+    assert result["imported"] == 1, result
+
+    response = client.get("/api/books/", headers=auth_headers)
+    assert response.status_code == 200, response.text
+    [book] = response.json()
+    assert book["title"] == "Одна фамилия"
+    assert [(a["last_name"], a["first_name"]) for a in book["authors"]] == [("Петров", None)]
+    assert book["current_status"]["name"] == "В планах"
+
+
+def test_imported_books_are_listed_with_status(client, auth_headers):
+    add_books(client, auth_headers, 6)
+
+    books = client.get("/api/books/?limit=100", headers=auth_headers).json()
+    assert len(books) == 6
+    statuses = sorted(book["current_status"]["name"] for book in books)
+    assert statuses == sorted(["В планах", "Читаю", "Прочитано"] * 2)
+    assert all(len(book["authors"]) == 2 and book["genres"] for book in books)
+
+
+def test_blank_publisher_is_a_row_error(client, auth_headers):
+    result = _import(client, auth_headers, (
+        "title,published,publisher,authors,genres\n"
+        "Без издательства,2001,   ,Петров Иван,Роман\n"
+        "  С пробелами  ,2002,  Эксмо ,Петров Иван,Роман\n"
+    ))
+    assert (result["imported"], result["failed"]) == (1, 1), result
+    assert result["errors"][0]["line"] == 2
+
+    [book] = client.get("/api/books/", headers=auth_headers).json()
+    assert (book["title"], book["publisher"]["name"]) == ("С пробелами", "Эксмо")
+
+
+def test_unexpected_write_error_fails_only_its_row(client, auth_headers, monkeypatch):
+    import crud
+
+    import_books_batch = crud.import_books_batch
+
+    def failing_batch(db, user_id, rows, *args, **kwargs):
+        if any(row.title == "Сломанная" for row in rows):
+            raise RuntimeError("сбой обработки")
+        return import_books_batch(db, user_id, rows, *args, **kwargs)
+
+    monkeypatch.setattr(crud, "import_books_batch", failing_batch)
+    result = _import(client, auth_headers, (
+        "title,published,publisher,authors,genres\n"
+        "Первая,2001,Эксмо,Петров Иван,Роман\n"
+        "Сломанная,2002,Эксмо,Петров Иван,Роман\n"
+        "Третья,2003,Эксмо,Петров Иван,Роман\n"
+    ))
+    assert (result["imported"], result["failed"]) == (2, 1), result
+    assert result["errors"][0]["line"] == 3
+    assert "сбой обработки" in result["errors"][0]["error"]
+
+    titles = sorted(book["title"] for book in client.get("/api/books/", headers=auth_headers).json())
+    assert titles == ["Первая", "Третья"]
+
+
+def _export(client, headers, fmt: str):
+    response = client.get("/api/books/export", headers=headers, params={"format": fmt})
+    assert response.status_code == 200, response.text
+    return response.text
+
+
+def test_export_round_trip(client, auth_headers):
+    import uuid
+
+    _import(client, auth_headers, (
+        "title,published,publisher,authors,genres,status,pages_read\n"
+        "Без года,,Эксмо,Петров,Роман,Читаю,50\n"
+        "С годом,1999,АСТ,Иванов Иван Иванович;Петров,Роман;Повесть,Прочитано,300\n"
+    ))
+    books = {book["title"]: book for book in client.get("/api/books/", headers=auth_headers).json()}
+    assert books["Без года"]["published"] is None
+    # Меньше страниц в последней записи истории: в библиотеке остается максимум
+    response = client.post(
+        f"/api/books/{books['Без года']['book_id']}/status/", headers=auth_headers,
+        json={"status_id": books["Без года"]["current_status"]["status_id"], "pages_read": 20},
+    )
+    assert response.status_code == 200, response.text
+    exported = _export(client, auth_headers, "csv")
+
+    login = f"user_{uuid.uuid4().hex[:12]}"
+    token = client.post("/api/auth/register", json={"name": "Тест", "login": login, "password": "secret"}).json()
+    other_headers = {"Authorization": f"Bearer {token['access_token']}"}
+    result = _import(client, other_headers, exported)
+    assert (result["imported"], result["failed"]) == (2, 0), result
+
+    def library(headers):
+        return sorted(
+            (book["title"], book["published"], book["publisher"]["name"],
+             sorted((a["last_name"], a["first_name"], a["middle_name"]) for a in book["authors"]),
+             sorted(genre["name"] for genre in book["genres"]),
+             book["current_status"]["name"], book["pages_read"])
+            for book in client.get("/api/books/", headers=headers).json()
+        )
+
+    assert library(other_headers) == library(auth_headers)
+    assert [row[-1] for row in library(auth_headers)] == [50, 300]
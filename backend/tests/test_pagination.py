@@ -0,0 +1,112 @@
+import base64
+import json
+
+import pytest
+
+from conftest import add_books
+
+
+def _pages(fetch, limit: int):
+    """Все страницы вперед по X-Next-Cursor, затем назад по X-Prev-Cursor"""
+    forward, cursor = [], None
+    while True:
+        ids, next_cursor, prev_cursor = fetch(cursor, limit)
+        forward.append((ids, prev_cursor))
+        if not next_cursor:
+            break
+        cursor = next_cursor
+    backward = [forward[-1][0]]
+    cursor = forward[-1][1]
+    while cursor:
+        ids, _, cursor = fetch(cursor, limit)
+        backward.append(ids)
+    return [ids for ids, _ in forward], backward[::-1]
+
+
+def _api_fetch(client, headers, sort, order):
+    def fetch(cursor, limit):
+        params = {"sort": sort, "order": order, "limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/books/", headers=headers, params=params)
+        assert response.status_code == 200, response.text
+        return ([book["book_id"] for book in response.json()],
+                response.headers.get("x-next-cursor"), response.headers.get("x-prev-cursor"))
+    return fetch
+
+
+@pytest.mark.parametrize("sort", ["added_date", "title", "published", "status_changed"])
+@pytest.mark.parametrize("order", ["asc", "desc"])
+def test_cursor_pages_cover_library(client, auth_headers, sort, order):
+    add_books(client, auth_headers, 8)
+    everything = _api_fetch(client, auth_headers, sort, order)(None, 100)[0]
+    assert len(everything) == 8
+
+    forward, backward = _pages(_api_fetch(client, auth_headers, sort, order), 3)
+    assert [len(ids) for ids in forward] == [3, 3, 2]
+    assert sum(forward, []) == everything
+    assert backward == forward
+
+
+def test_null_sort_keys_are_paged(client, auth_headers):
+    import crud
+    import models
+    from database import SessionLocal
+
+    user_id = client.get("/api/auth/me", headers=auth_headers).json()["user_id"]
+    add_books(client, auth_headers, 7, offset=1000)
+    with SessionLocal() as db:
+        book_ids = sorted(book_id for (book_id,) in db.query(models.UserBook.book_id).filter(
+            models.UserBook.user_id == user_id))
+        db.query(models.Book).filter(models.Book.book_id.in_(book_ids[::2])).update(
+            {"published": None}, synchronize_session=False)
+        db.query(models.Book).filter(models.Book.book_id.in_(book_ids[1::3])).update(
+            {"title": None}, synchronize_session=False)
+        db.commit()
+
+        for sort in ("title", "published"):
+            for order in ("asc", "desc"):
+                def fetch(cursor, limit):
+                    rows, next_cursor, prev_cursor = crud.get_user_books_page(
+                        db, user_id, sort=sort, order=order, cursor=cursor, limit=limit)
+                    return [book.book_id for book in rows], next_cursor, prev_cursor
+
+                everything = fetch(None, 100)[0]
+                values = [db.get(models.Book, book_id).__dict__[sort] for book_id in everything]
+                nulls = [value is None for value in values]
+                # NULL в конце при asc и в начале при desc
+                assert nulls == sorted(nulls, reverse=order == "desc")
+
+                forward, backward = _pages(fetch, 2)
+                assert sum(forward, []) == everything
+                assert backward == forward
+
+
+def _cursor(payload) -> str:
+    raw = json.dumps(payload).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+@pytest.mark.parametrize("sort,value,book_id", [
+    ("title", {"$gt": ""}, 1),
+    ("title", 5, 1),
+    ("published", "abc", 1),
+    ("published", True, 1),
+    ("published", 1990.5, 1),
+    ("added_date", None, 1),
+    ("added_date", "не дата", 1),
+    ("status_changed", 5, 1),
+    ("title", "Книга", "1"),
+])
+def test_invalid_cursor_value_is_rejected(client, auth_headers, sort, value, book_id):
+    cursor = _cursor({"s": sort, "o": "asc", "d": "next", "v": value, "id": book_id})
+    response = client.get("/api/books/", headers=auth_headers,
+                          params={"sort": sort, "order": "asc", "cursor": cursor})
+    assert response.status_code == 400, response.text
+
+
+def test_malformed_cursor_is_rejected(client, auth_headers):
+    for cursor in ("не base64", _cursor([1, 2]), _cursor({"s": "title", "o": "desc", "d": "next", "v": "", "id": 1})):
+        response = client.get("/api/books/", headers=auth_headers,
+                              params={"sort": "title", "order": "asc", "cursor": cursor})
+        assert response.status_code == 400, response.text
@@ -0,0 +1,26 @@
+from conftest import add_books, query_count
+
+
+def test_profiled_request_counts_only_its_own_queries(client, auth_headers):
+    import auth
+    import models
+    import profiling
+    from database import SessionLocal
+
+    user_id = client.get("/api/auth/me", headers=auth_headers).json()["user_id"]
+    with SessionLocal() as db:
+        db.query(models.User).filter(models.User.user_id == user_id).update({"is_admin": True})
+        db.commit()
+    add_books(client, auth_headers, 3)
+
+    plain = client.get("/api/books/", headers=auth_headers)
+    # Пользователь читается из БД при проверке прав администратора; обработчик
+    # получает его уже из кэша авторизации
+    auth.token_cache.clear()
+    auth.user_cache.clear()
+    profiled = client.get("/api/books/", headers=auth_headers, params={"profile": 1})
+    assert profiled.status_code == 200
+    profile_id = profiled.headers[profiling.PROFILE_HEADER]
+    assert query_count(profiled) == query_count(plain)
+    assert profiling.load_summary(profile_id)["queries"] == query_count(plain)
+    assert profiling.folded_path(profile_id) is not None
@@ -0,0 +1,86 @@
+from datetime import date
+
+import pytest
+
+import sqlstats
+from conftest import add_books, query_count
+
+# Число SQL-запросов эндпоинтов книг и отчетов не зависит от числа книг:
+# замер на маленькой библиотеке и после ее пополнения должен совпадать.
+# Весь набор идет с QUERY_BUDGET_STRICT, превышение бюджета - ошибка запроса.
+
+SMALL, LARGE = 3, 25
+
+
+def _books(client, headers):
+    response = client.get("/api/books/?limit=100&sort=title&order=asc", headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def _list_books(client, headers):
+    response = client.get("/api/books/?limit=100", headers=headers)
+    assert len(response.json()) == len(_books(client, headers))
+    return response
+
+
+def _read_book(client, headers):
+    book_id = _books(client, headers)[-1]["book_id"]
+    return client.get(f"/api/books/{book_id}", headers=headers)
+
+
+def _search_books(client, headers):
+    return client.get("/api/books/search?q=море&limit=100", headers=headers)
+
+
+def _collection_report(client, headers):
+    today = date.today().isoformat()
+    return client.post("/api/reports/generate", headers=headers, json={
+        "report_type": "collection_growth", "period_from": "2000-01-01", "period_to": today,
+    })
+
+
+def _book_card_report(client, headers):
+    # Последняя книга: при каждом замере карточка другая, кэш отчетов не срабатывает
+    book_id = max(book["book_id"] for book in _books(client, headers))
+    return client.post("/api/reports/generate", headers=headers, json={
+        "report_type": "book_card", "book_id": book_id,
+    })
+
+
+def _book_cards_export(client, headers):
+    return client.post("/api/reports/book-cards", headers=headers, json={"format": "zip"})
+
+
+ENDPOINTS = {
+    "GET /api/books/": _list_books,
+    "GET /api/books/{book_id}": _read_book,
+    "GET /api/books/search": _search_books,
+    "POST /api/reports/generate collection_growth": _collection_report,
+    "POST /api/reports/generate book_card": _book_card_report,
+    "POST /api/reports/book-cards": _book_cards_export,
+}
+
+
+@pytest.mark.parametrize("name", ENDPOINTS)
+def test_query_count_does_not_grow_with_library(client, auth_headers, name):
+    request = ENDPOINTS[name]
+    add_books(client, auth_headers, SMALL)
+    # Прогрев справочников и кэша пользователя
+    _books(client, auth_headers)
+
+    response = request(client, auth_headers)
+    assert response.status_code == 200, response.text
+    small = query_count(response)
+
+    add_books(client, auth_headers, LARGE - SMALL, offset=SMALL)
+    _books(client, auth_headers)
+    response = request(client, auth_headers)
+    assert response.status_code == 200, response.text
+    large = query_count(response)
+
+    assert small == large, f"{name}: {small} запросов при {SMALL} книгах, {large} при {LARGE}"
+    method, route = name.split()[:2]
+    budget = sqlstats.budget_for(method, route)
+    if budget is not None:
+        assert large <= budget
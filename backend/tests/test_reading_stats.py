@@ -0,0 +1,70 @@
+from conftest import add_books
+
+
+def _rollup(user_id: int):
+    """Свертка user_reading_stats и ее пересчет по истории аналитики"""
+    import crud
+    import models
+    from database import SessionLocal
+
+    with SessionLocal() as db:
+        stored = {
+            row.status_id: (row.books, row.pages, row.days_total, row.days_count)
+            for row in db.query(models.UserReadingStats).filter(models.UserReadingStats.user_id == user_id)
+        }
+        computed = {
+            status_id: (books, int(pages), int(round(days_total)), days_count)
+            for _, status_id, books, pages, days_total, days_count in crud.compute_reading_stats(db, user_id)
+        }
+    return stored, computed
+
+
+def _statuses(client, headers):
+    return {status["name"]: status["status_id"] for status in client.get("/api/statuses/", headers=headers).json()}
+
+
+def test_rollup_deltas_match_rebuild(client, auth_headers):
+    user_id = client.get("/api/auth/me", headers=auth_headers).json()["user_id"]
+    statuses = _statuses(client, auth_headers)
+    add_books(client, auth_headers, 4)
+    book_ids = sorted(book["book_id"] for book in client.get("/api/books/", headers=auth_headers).json())
+
+    stored, computed = _rollup(user_id)
+    assert stored == computed and stored
+
+    # Смена статуса, меньше страниц, чем раньше, и даты чтения
+    for book_id, payload in zip(book_ids, (
+        {"status_id": statuses["Читаю"], "pages_read": 5, "start_date": "2026-01-01"},
+        {"status_id": statuses["Прочитано"], "pages_read": 300,
+         "start_date": "2026-01-01", "end_date": "2026-01-20"},
+        {"status_id": statuses["В планах"]},
+    )):
+        response = client.post(f"/api/books/{book_id}/status/", headers=auth_headers, json=payload)
+        assert response.status_code == 200, response.text
+        stored, computed = _rollup(user_id)
+        assert stored == computed
+
+    # Удаление книг вплоть до пустой свертки: строки без книг не остаются
+    for book_id in book_ids:
+        response = client.delete(f"/api/books/{book_id}", headers=auth_headers)
+        assert response.status_code == 200, response.text
+        stored, computed = _rollup(user_id)
+        assert stored == computed
+    assert stored == {}
+
+
+def test_user_book_keeps_max_pages(client, auth_headers):
+    statuses = _statuses(client, auth_headers)
+    add_books(client, auth_headers, 1, offset=5)
+    [book] = client.get("/api/books/", headers=auth_headers).json()
+    assert book["pages_read"] == 50
+
+    for pages in (20, None, 80):
+        response = client.post(
+            f"/api/books/{book['book_id']}/status/", headers=auth_headers,
+            json={"status_id": statuses["Читаю"], "pages_read": pages},
+        )
+        assert response.status_code == 200, response.text
+    [book] = client.get("/api/books/", headers=auth_headers).json()
+    assert book["pages_read"] == 80
+    assert book["current_status"]["name"] == "Читаю"
@@ -0,0 +1,56 @@
+import os
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+
+def _replica_session(tmp_path):
+    # Пустая БД вместо отстающей реплики: все, что прочитано из нее, - ошибка
+    engine = create_engine(f"sqlite:///{os.path.join(tmp_path, 'replica.db')}")
+    import models
+    models.Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine, info={"replica": True})(), engine
+
+
+def test_sync_misses_on_replica_session_read_primary(client, tmp_path):
+    import refcache
+
+    replica, engine = _replica_session(tmp_path)
+    try:
+        refcache.statuses.invalidate()
+        names = {status.name for status in refcache.statuses.all(replica)}
+        assert {"В планах", "Читаю", "Прочитано"} <= names
+
+        refcache.statuses.invalidate()
+        status = refcache.statuses.by_name(replica, "Читаю")
+        assert status is not None
+        refcache.statuses.invalidate()
+        assert refcache.statuses.get_many(replica, [status.status_id]) == {status.status_id: status}
+    finally:
+        replica.close()
+        engine.dispose()
+
+
+def test_event_from_other_process_reloads_from_primary(client, tmp_path):
+    import json
+
+    import cache_bus
+    import models
+    import refcache
+    from database import SessionLocal
+
+    replica, engine = _replica_session(tmp_path)
+    try:
+        before = {genre.name for genre in refcache.genres.all(replica)}
+        # Жанр, добавленный другим процессом: реплика его еще не видит
+        with SessionLocal() as primary:
+            primary.add(models.Genre(name="Жанр другого процесса"))
+            primary.commit()
+        assert {genre.name for genre in refcache.genres.all(replica)} == before
+
+        cache_bus._receive(json.dumps({"origin": "other", "entity": "genres", "key": None}))
+        names = {genre.name for genre in refcache.genres.all(replica)}
+        assert names == before | {"Жанр другого процесса"}
+    finally:
+        replica.close()
+        engine.dispose()
@@ -0,0 +1,73 @@
+import pytest
+
+import sqlstats
+from config import settings
+from conftest import add_books, query_count
+
+
+def test_server_timing_reports_book_list_queries(client, auth_headers):
+    add_books(client, auth_headers, 5)
+    client.get("/api/books/", headers=auth_headers)
+
+    response = client.get("/api/books/", headers=auth_headers)
+    assert response.status_code == 200
+    assert len(response.json()) == 5
+    # Страница книг с user_book, авторы и жанры запросами IN
+    assert query_count(response) == 3
+
+
+def test_strict_budget_fails_request(client, auth_headers, monkeypatch):
+    add_books(client, auth_headers, 2)
+    monkeypatch.setitem(settings.QUERY_BUDGETS, "GET /api/books/", 1)
+    monkeypatch.setattr(settings, "QUERY_BUDGET_STRICT", True)
+
+    with pytest.raises(sqlstats.QueryBudgetExceeded, match="GET /api/books/"):
+        client.get("/api/books/", headers=auth_headers)
+
+
+def test_budget_is_reported_without_strict_mode(monkeypatch):
+    monkeypatch.setitem(settings.QUERY_BUDGETS, "GET /api/books/", 1)
+    monkeypatch.setattr(settings, "QUERY_BUDGET_STRICT", False)
+    stats = sqlstats.QueryStats()
+    stats.record("SELECT 1", 0.001)
+    stats.record("SELECT 2", 0.001)
+
+    assert sqlstats.check_budget(stats, "GET", "/api/books/") == 1
+    assert sqlstats.check_budget(stats, "GET", "/api/books/search") is None
+
+
+def test_budget_overrun_after_response_start_is_recorded(monkeypatch):
+    from types import SimpleNamespace
+
+    import anyio
+
+    import metrics
+    from middleware import RequestMetricsMiddleware
+
+    monkeypatch.setitem(settings.QUERY_BUDGETS, "GET /stream", 1)
+    monkeypatch.setattr(settings, "QUERY_BUDGET_STRICT", True)
+    route_key = ("GET", "/stream")
+    exceeded_before = metrics.db_query_budget_exceeded_total._values.get(route_key, 0)
+
+    async def app(scope, receive, send):
+        # Потоковое тело: запросы к БД идут уже после отправки заголовков
+        scope["route"] = SimpleNamespace(path="/stream")
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        for statement in ("SELECT 1", "SELECT 2", "SELECT 3"):
+            sqlstats.current().record(statement, 0.001)
+            await send({"type": "http.response.body", "body": b"x", "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    scope = {"type": "http", "method": "GET", "path": "/stream", "headers": []}
+    anyio.run(RequestMetricsMiddleware(app), scope, receive, send)
+
+    assert [message["type"] for message in messages].count("http.response.body") == 4
+    assert metrics.db_query_budget_exceeded_total._values[route_key] == exceeded_before + 1
@@ -41,7 +41,6 @@ const ReadingStatus = () => {
     totalPages: 0,
     avgReadingTime: 0,
   });
-  const [userBooks, setUserBooks] = useState([]);
   const [statuses, setStatuses] = useState([]);
 
   useEffect(() => {
@@ -58,32 +57,18 @@ const ReadingStatus = () => {
       const statusesData = await bookService.getStatuses();
       setStatuses(statusesData);
       
-      // Загружаем книги пользователя
-      const booksData = await bookService.getUserBooks(0, 100, '');
-      setUserBooks(booksData);
-      
-      // Считаем статистику
-      const statsData = await calculateStats(booksData, statusesData);
-      setStats(statsData);
-      
-      // Подготавливаем данные для таблицы
-      const statusCounts = {};
-      statusesData.forEach(status => {
-        statusCounts[status.name] = 0;
+      // Готовая статистика с сервера (свертка по текущим статусам книг)
+      const statsData = await analyticsService.getUserStats(user.user_id);
+      setStats({
+        planned: statsData.planned || 0,
+        reading: statsData.reading || 0,
+        completed: statsData.completed || 0,
+        totalPages: statsData.total_pages || 0,
+        avgReadingTime: statsData.avg_reading_time || 0,
       });
       
-      // Считаем книги по статусам
-      for (const book of booksData) {
-        try {
-          const status = await bookService.getBookStatus(book.book_id);
-          if (status && status.name in statusCounts) {
-            statusCounts[status.name]++;
-          }
-        } catch (err) {
-          console.warn(`Не удалось получить статус для книги ${book.book_id}`);
-        }
-      }
-      
+      // Подготавливаем данные для таблицы
+      const statusCounts = statsData.by_status || {};
       const analyticsData = statusesData.map(status => ({
         status: status.name,
         count: statusCounts[status.name] || 0
@@ -100,83 +85,6 @@ const ReadingStatus = () => {
     }
   };
 
-  const calculateStats = async (books, statuses) => {
-    try {
-      let planned = 0;
-      let reading = 0;
-      let completed = 0;
-      let totalPages = 0;
-      
-      // Инициализируем маппинг статусов для быстрого поиска
-      const statusMap = {};
-      statuses.forEach(status => {
-        statusMap[status.status_id] = status.name;
-      });
-      
-      // Получаем аналитику пользователя
-      const userAnalytics = await bookService.getUserAnalytics(user.user_id);
-      
-      // Считаем статистику из аналитики
-      if (userAnalytics && userAnalytics.length > 0) {
-        // Считаем книги по статусам из последней аналитики
-        const latestAnalytics = {};
-        userAnalytics.forEach(analytic => {
-          if (!latestAnalytics[analytic.book_id] || 
-              new Date(analytic.created_date) > new Date(latestAnalytics[analytic.book_id].created_date)) {
-            latestAnalytics[analytic.book_id] = analytic;
-          }
-        });
-        
-        Object.values(latestAnalytics).forEach(analytic => {
-          const statusName = statusMap[analytic.status_id];
-          if (statusName === 'В планах') planned++;
-          else if (statusName === 'Читаю') reading++;
-          else if (statusName === 'Прочитано') completed++;
-          
-          if (analytic.pages_read) {
-            totalPages += analytic.pages_read;
-          }
-        });
-      }
-      
-      // Если аналитики нет, пытаемся получить статусы для каждой книги
-      if (planned === 0 && reading === 0 && completed === 0) {
-        for (const book of books) {
-          try {
-            const status = await bookService.getBookStatus(book.book_id);
-            if (status) {
-              if (status.name === 'В планах') planned++;
-              else if (status.name === 'Читаю') reading++;
-              else if (status.name === 'Прочитано') completed++;
-            }
-          } catch (err) {
-            console.warn(`Не удалось получить статус для книги ${book.book_id}`);
-          }
-        }
-      }
-      
-      // Рассчитываем среднее время чтения (упрощенно)
-      const avgReadingTime = completed > 0 ? Math.round((planned + reading + completed) / 3) : 0;
-      
-      return {
-        planned,
-        reading,
-        completed,
-        totalPages,
-        avgReadingTime,
-      };
-    } catch (err) {
-      console.error('Ошибка расчета статистики:', err);
-      return {
-        planned: 0,
-        reading: 0,
-        completed: 0,
-        totalPages: 0,
-        avgReadingTime: 0,
-      };
-    }
-  };
-
   const getProgressPercentage = () => {
     const total = stats.planned + stats.reading + stats.completed;
     if (total === 0) return 0;